@@ -595,3 +595,106 @@ def get_deployment_logs(deployment_id: int):
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+# ==================== Internal API Endpoints (for repo-worker) ====================
+
+
+def _collect_images(node, images: set[str]) -> None:
+    """Collect container image references from manifests or Helm values.
+
+    Handles ``image: <ref>`` strings (Kubernetes containers) and the common
+    Helm ``image: {registry, repository, tag, digest}`` mapping.
+    """
+    if isinstance(node, list):
+        for item in node:
+            _collect_images(item, images)
+        return
+    if not isinstance(node, dict):
+        return
+
+    for key, value in node.items():
+        if key == "image" and isinstance(value, str) and value.strip():
+            images.add(value.strip())
+        elif key == "image" and isinstance(value, dict) and value.get("repository"):
+            reference = value["repository"]
+            if value.get("registry"):
+                reference = f"{value['registry']}/{reference}"
+            if value.get("digest"):
+                reference = f"{reference}@{value['digest']}"
+            elif value.get("tag"):
+                reference = f"{reference}:{value['tag']}"
+            images.add(reference)
+        else:
+            _collect_images(value, images)
+
+
+@deployments_bp.route("/internal/images", methods=["GET"])
+def get_internal_deployed_images():
+    """Internal API: Image references of deployments changed since a cursor.
+
+    Called by repo-worker to keep its pin set of images running on managed
+    clusters. Deployments are returned in (updated_at, id) order; pass the
+    returned ``next`` values back as ``since`` / ``after_id`` to continue.
+    Deleted deployments are included (status ``deleted``) so their images
+    can be unpinned.
+
+    Security: This endpoint should be protected by internal service authentication
+    (e.g., internal JWT token or network policy in K8s).
+
+    Returns:
+        JSON response with deployments, their images and the next cursor.
+    """
+    # TODO: Add internal service authentication check
+    # For now, we trust that this endpoint is only accessible internally
+    try:
+        limit = min(max(request.args.get("limit", 500, type=int), 1), 1000)
+        after_id = request.args.get("after_id", 0, type=int)
+        since = None
+        if request.args.get("since"):
+            since = datetime.fromisoformat(request.args["since"])
+
+        db = _get_db()
+        query = db.deployed_apps.id > 0
+        if since is not None:
+            query &= (db.deployed_apps.updated_at > since) | (
+                (db.deployed_apps.updated_at == since) & (db.deployed_apps.id > after_id)
+            )
+
+        rows = db(query).select(
+            orderby=db.deployed_apps.updated_at | db.deployed_apps.id,
+            limitby=(0, limit),
+        )
+
+        deployments = []
+        for row in rows:
+            images: set[str] = set()
+            _collect_images(row.deployed_manifests, images)
+            _collect_images(row.deployed_values, images)
+            deployments.append({
+                "id": row.id,
+                "cluster_id": row.cluster_id,
+                "namespace": row.k8s_namespace,
+                "status": row.status,
+                "images": sorted(images),
+                "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+            })
+
+        next_cursor = None
+        if rows:
+            last = rows.last()
+            next_cursor = {
+                "since": last.updated_at.isoformat() if last.updated_at else None,
+                "after_id": last.id,
+            }
+
+        return jsonify({
+            "deployments": deployments,
+            "next": next_cursor,
+            "has_more": len(rows) == limit,
+        }), 200
+
+    except ValueError:
+        return jsonify({"error": "since must be an ISO 8601 timestamp"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -5,6 +5,8 @@ Docker registries, including listing, creating, updating, deleting, and
 syncing repositories.
 """
 
+import hashlib
+import json
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional
@@ -938,6 +940,10 @@ def get_internal_registries():
     This endpoint is called by repo-worker to get registry configurations
     including decrypted credentials for upstream authentication.
 
+    The response carries an ETag over the fields that affect proxying
+    (not connection test results), so repo-worker can poll with
+    If-None-Match and gets 304 Not Modified until something changes.
+
     Security: This endpoint should be protected by internal service authentication
     (e.g., internal JWT token or network policy in K8s).
 
@@ -954,7 +960,39 @@ def get_internal_registries():
         _serialize_docker_registry(r, include_secrets=True) for r in registries
     ]
 
+    version = hashlib.sha256(
+        json.dumps(
+            [
+                {key: r.get(key) for key in _PROXY_CONFIG_FIELDS}
+                for r in registries_data
+            ],
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()[:16]
+    etag = f'"{version}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        return "", 304, {"ETag": etag}
+
     return jsonify({
         "registries": registries_data,
         "total": len(registries_data),
-    }), 200
+        "version": version,
+    }), 200, {"ETag": etag}
+
+
+# Registry fields repo-worker builds upstream clients from
+_PROXY_CONFIG_FIELDS = (
+    "name",
+    "url",
+    "is_enabled",
+    "auth_type",
+    "auth_username",
+    "auth_password",
+    "aws_region",
+    "aws_access_key",
+    "aws_secret_key",
+    "gcp_service_account_json",
+    "azure_client_id",
+    "azure_tenant_id",
+    "azure_client_secret",
+)
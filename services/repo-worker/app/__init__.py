@@ -4,12 +4,16 @@ Repo-Worker: Multi-architecture Helm and Docker Repository Service
 A Python async service providing:
 - Local Docker registry (OCI Distribution API)
 - Pull-through proxy/cache for external registries
-- Helm chart repository
+- Helm chart repository (with pull-through proxy for external repos)
 - S3-compatible storage backend (MinIO default)
 """
 
-from quart import Quart
+from quart import Quart, g, request
+import asyncio
 import logging
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.config import Config
 
@@ -18,6 +22,11 @@ def create_app(config: Config | None = None) -> Quart:
     """Create and configure the Quart application."""
     app = Quart(__name__)
 
+    # Bundle imports are streamed without the default body limits
+    from app.transfer.routes import TransferRequest
+
+    app.request_class = TransferRequest
+
     if config is None:
         config = Config.from_env()
 
@@ -33,15 +42,200 @@ def create_app(config: Config | None = None) -> Quart:
     # Register blueprints
     from app.registry.routes import registry_bp
     from app.helm.routes import helm_bp
+    from app.transfer.routes import transfer_bp
+    from app.pins.routes import pins_bp
+    from app.analytics.routes import analytics_bp
 
     app.register_blueprint(registry_bp)
     app.register_blueprint(helm_bp)
+    app.register_blueprint(transfer_bp)
+    app.register_blueprint(pins_bp)
+    app.register_blueprint(analytics_bp)
+
+    # Background tasks
+    background_tasks: list[asyncio.Task] = []
+
+    @app.before_serving
+    async def start_background_tasks():
+        """Start periodic maintenance tasks."""
+        from app.analytics.collector import get_analytics
+        from app.metrics import monitor_event_loop_lag
+        from app.pins.pinset import get_pins
+        from app.proxy.proxy import get_proxy
+        from app.proxy.upstream_sync import UpstreamSync
+        from app.replication import get_replicator
+        from app.storage.metadata import resync_loop
+        from app.storage.s3 import get_storage
+        from app.storage.scrubber import Scrubber
+
+        background_tasks.append(asyncio.create_task(monitor_event_loop_lag()))
+
+        proxy = get_proxy()
+        if proxy is not None and proxy.peers is not None:
+            background_tasks.append(asyncio.create_task(proxy.peers.refresh_loop()))
+
+        if proxy is not None and config.upstream_sync.enabled:
+            sync = UpstreamSync(proxy, config.upstream_sync, config.auth.flask_backend_url)
+            app.extensions["upstream_sync"] = sync
+            background_tasks.append(asyncio.create_task(sync.run()))
+
+        replicator = get_replicator()
+        if replicator is not None:
+            background_tasks.append(asyncio.create_task(replicator.run()))
+
+        pins = get_pins()
+        if pins is not None:
+            background_tasks.append(asyncio.create_task(pins.run()))
+
+        analytics = get_analytics()
+        if analytics is not None:
+            background_tasks.append(asyncio.create_task(analytics.run()))
+
+        interval = config.metadata_store.resync_interval_seconds
+        if config.metadata_store.enabled and interval > 0:
+            storage = get_storage()
+            if storage.metadata is not None:
+                background_tasks.append(
+                    asyncio.create_task(resync_loop(storage.metadata, storage, interval))
+                )
+
+        if config.scrubber.enabled:
+            scrubber = Scrubber(get_storage(), config.scrubber, proxy)
+            background_tasks.append(asyncio.create_task(scrubber.run()))
+
+    @app.after_serving
+    async def stop_background_tasks():
+        """Cancel periodic maintenance tasks."""
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        background_tasks.clear()
+
+        from app.analytics.collector import get_analytics
+        from app.pins.pinset import get_pins
+        from app.proxy.proxy import get_proxy
+        from app.tracing import shutdown_tracing
+
+        proxy = get_proxy()
+        if proxy is not None and proxy.peers is not None:
+            await proxy.peers.close()
+
+        pins = get_pins()
+        if pins is not None:
+            await pins.close()
+
+        analytics = get_analytics()
+        if analytics is not None:
+            await analytics.close()
+
+        sync = app.extensions.pop("upstream_sync", None)
+        if sync is not None:
+            await sync.close()
+
+        shutdown_tracing()
+
+    # Request metrics (labelled by route template, never by image name)
+    @app.before_request
+    async def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    async def record_request_metrics(response):
+        from app.metrics import HTTP_LATENCY, HTTP_REQUESTS
+
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        started = getattr(g, "request_started", None)
+        if started is not None:
+            HTTP_LATENCY.labels(route, request.method).observe(
+                time.perf_counter() - started
+            )
+        HTTP_REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        return response
+
+    # Tracing: one server span per request, continuing an incoming traceparent
+    from app.tracing import end_request_span, setup_tracing, start_request_span
+
+    if setup_tracing(config.tracing):
+        @app.before_request
+        async def start_request_span_hook():
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            g.trace_span = start_request_span(route, request.method, request.headers)
+
+        @app.after_request
+        async def record_span_status(response):
+            g.trace_status = response.status_code
+            return response
+
+        @app.teardown_request
+        async def end_request_span_hook(exc):
+            started = g.pop("trace_span", None)
+            if started is not None:
+                end_request_span(started, g.pop("trace_status", None), exc)
+
+    # Admission control: bound concurrency per route class, shed the excess
+    if config.admission.enabled:
+        from quart.wrappers.response import IterableBody
+
+        from app.admission import AdmissionController, HeldBody, Overloaded, route_class
+
+        admission = AdmissionController(config.admission)
+        app.extensions["admission"] = admission
+
+        @app.before_request
+        async def admit_request():
+            name = route_class(request.endpoint)
+            if name is None:
+                return None
+            try:
+                await admission.acquire(name)
+            except Overloaded as e:
+                return (
+                    {"errors": [{"code": "TOOMANYREQUESTS", "message": e.reason}]},
+                    e.status,
+                    {"Retry-After": str(config.admission.retry_after_seconds)},
+                )
+            g.admission_class = name
+            return None
+
+        @app.after_request
+        async def hold_admission_for_body(response):
+            # Streamed bodies are sent after teardown; keep the slot until then
+            name = g.get("admission_class")
+            if name is not None and isinstance(response.response, IterableBody):
+                response.response.iter = HeldBody(
+                    response.response.iter, lambda: admission.release(name)
+                )
+                g.pop("admission_class")
+            return response
+
+        @app.teardown_request
+        async def release_admission(exc):
+            name = g.pop("admission_class", None)
+            if name is not None:
+                admission.release(name)
+
+    # Bandwidth shaping for blob downloads
+    if config.bandwidth.enabled:
+        from app.bandwidth import BandwidthShaper
+
+        app.extensions["bandwidth"] = BandwidthShaper(config.bandwidth)
+
+    @app.route("/metrics")
+    async def metrics():
+        """Prometheus metrics endpoint."""
+        return generate_latest(), 200, {"Content-Type": CONTENT_TYPE_LATEST}
 
     # Register health endpoints
     @app.route("/healthz")
     async def healthz():
         """Health check endpoint."""
-        return {"status": "healthy"}, 200
+        from app.proxy.proxy import get_proxy
+
+        health = {"status": "healthy"}
+        proxy = get_proxy()
+        if proxy is not None and proxy.upstream_config_version is not None:
+            health["upstream_config_version"] = proxy.upstream_config_version
+        return health, 200
 
     @app.route("/readyz")
     async def readyz():
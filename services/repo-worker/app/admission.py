@@ -0,0 +1,185 @@
+"""Admission control and load shedding for incoming requests.
+
+Every routed request belongs to a route class (manifest, catalog,
+helm_index, blob_read, blob_write) with its own concurrency limit and
+bounded wait queue, plus a global limit across all classes. A request that
+finds its class saturated waits in that class's FIFO queue:
+
+- queue already full: rejected at once with 429
+- not admitted within ``max_wait_seconds``: rejected with 503
+
+Both carry ``Retry-After``. When a slot frees up, queued requests are
+admitted in class priority order, so manifest lookups keep flowing while
+blob bodies queue behind them.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+
+from app.config import AdmissionConfig
+from app.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, REQUESTS_SHED
+
+logger = logging.getLogger(__name__)
+
+# Route classes in priority order (first is admitted first)
+ROUTE_CLASSES = ("manifest", "catalog", "helm_index", "blob_read", "blob_write")
+
+# Blueprint endpoint -> route class. Unlisted endpoints (health checks,
+# metrics, /v2/) are never limited.
+_ENDPOINT_CLASSES = {
+    "registry.manifest_exists": "manifest",
+    "registry.get_manifest": "manifest",
+    "registry.put_manifest": "manifest",
+    "registry.delete_manifest": "manifest",
+    "registry.blob_exists": "manifest",
+    "registry.get_blob": "blob_read",
+    "registry.peer_blob": "blob_read",
+    "registry.delete_blob": "blob_write",
+    "registry.initiate_blob_upload": "blob_write",
+    "registry.upload_blob_chunk": "blob_write",
+    "registry.complete_blob_upload": "blob_write",
+    "registry.cancel_blob_upload": "blob_write",
+    "registry.list_tags": "catalog",
+    "registry.catalog": "catalog",
+    "helm.get_index": "helm_index",
+    "helm.get_chart_index": "helm_index",
+    "helm.get_proxy_index": "helm_index",
+    "helm.download_chart": "blob_read",
+    "helm.download_proxy_chart": "blob_read",
+    "helm.upload_chart": "blob_write",
+    "helm.delete_chart": "blob_write",
+    "helm.list_charts": "catalog",
+    "helm.get_chart_versions": "catalog",
+    "helm.get_chart_info": "catalog",
+    "transfer.export_layout": "blob_read",
+    "transfer.import_bundle": "blob_write",
+}
+
+
+def route_class(endpoint: Optional[str]) -> Optional[str]:
+    """Get the route class of a request endpoint, or None if unlimited."""
+    return _ENDPOINT_CLASSES.get(endpoint or "")
+
+
+class Overloaded(Exception):
+    """Request rejected by admission control."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+class HeldBody:
+    """Streamed response body that holds an admission slot until sent.
+
+    Quart tears the request down before a streamed body is sent, so the
+    slot of a streamed response is released here instead: when the body
+    is exhausted or closed (also on client disconnect).
+    """
+
+    def __init__(self, body: AsyncIterator[bytes], release: Callable[[], None]):
+        self._body = body
+        self._release = release
+        self._released = False
+
+    def __aiter__(self) -> "HeldBody":
+        return self
+
+    async def __anext__(self) -> bytes:
+        try:
+            return await self._body.__anext__()
+        except BaseException:
+            self.release()
+            raise
+
+    async def aclose(self) -> None:
+        try:
+            if hasattr(self._body, "aclose"):
+                await self._body.aclose()
+        finally:
+            self.release()
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._release()
+
+    def __del__(self):
+        # Fallback if the body was dropped without being sent or closed
+        self.release()
+
+
+class AdmissionController:
+    """Per route class concurrency limits with bounded priority queues."""
+
+    def __init__(self, config: AdmissionConfig):
+        self.config = config
+        self._active = {name: 0 for name in ROUTE_CLASSES}
+        self._total = 0
+        self._waiters: dict[str, deque[asyncio.Future]] = {
+            name: deque() for name in ROUTE_CLASSES
+        }
+
+    def _has_capacity(self, name: str) -> bool:
+        return (
+            self._total < self.config.max_concurrent
+            and self._active[name] < self.config.classes[name].concurrency
+        )
+
+    def _admit(self, name: str) -> None:
+        self._active[name] += 1
+        self._total += 1
+        ADMISSION_IN_FLIGHT.labels(name).set(self._active[name])
+
+    async def acquire(self, name: str) -> None:
+        """Wait for a slot in a route class.
+
+        Raises:
+            Overloaded: If the class queue is full (429) or the request
+                waited longer than max_wait_seconds (503)
+        """
+        if self._has_capacity(name) and not self._waiters[name]:
+            self._admit(name)
+            return
+
+        waiters = self._waiters[name]
+        if len(waiters) >= self.config.classes[name].queue:
+            REQUESTS_SHED.labels(name, "queue_full").inc()
+            raise Overloaded(429, f"{name} queue full")
+
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        ADMISSION_QUEUE_DEPTH.labels(name).set(len(waiters))
+        try:
+            await asyncio.wait_for(future, self.config.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Slot was handed to us just as we gave up
+                self.release(name)
+            elif future in waiters:
+                waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                REQUESTS_SHED.labels(name, "timeout").inc()
+                raise Overloaded(503, f"{name} overloaded") from None
+            raise
+        finally:
+            ADMISSION_QUEUE_DEPTH.labels(name).set(len(waiters))
+
+    def release(self, name: str) -> None:
+        """Free a slot and admit queued requests in priority order."""
+        self._active[name] -= 1
+        self._total -= 1
+        ADMISSION_IN_FLIGHT.labels(name).set(self._active[name])
+
+        for candidate in ROUTE_CLASSES:
+            waiters = self._waiters[candidate]
+            while waiters and self._has_capacity(candidate):
+                future = waiters.popleft()
+                if future.done():
+                    continue
+                self._admit(candidate)
+                future.set_result(None)
+            ADMISSION_QUEUE_DEPTH.labels(candidate).set(len(waiters))
@@ -0,0 +1,6 @@
+"""Pull-through cache analytics."""
+
+from app.analytics.collector import CacheAnalytics, get_analytics, record_lookup, set_analytics
+from app.analytics.routes import analytics_bp
+
+__all__ = ["CacheAnalytics", "analytics_bp", "get_analytics", "record_lookup", "set_analytics"]
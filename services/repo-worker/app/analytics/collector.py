@@ -0,0 +1,239 @@
+"""Per-upstream and per-image statistics for the pull-through cache.
+
+Prometheus metrics cannot carry image names, so capacity planning
+questions (which images are pulled most, how much traffic the cache
+saves per upstream) are answered from these counters instead.
+
+Recording happens on the event loop without awaiting, so it needs no
+lock and costs a couple of dict lookups per request. Each process keeps
+its totals for the current UTC day and periodically writes them to
+``_analytics/<day>/<instance>.json``. An instance is one process
+(host and pid), so a restarted worker starts a new file instead of
+overwriting the old one, and the totals of all files can be summed.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import TYPE_CHECKING, Optional
+
+from app.config import AnalyticsConfig
+
+if TYPE_CHECKING:
+    from app.storage.s3 import S3Storage
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_PREFIX = "_analytics/"
+
+# Images seen after max_images is reached in a day
+OTHER_IMAGES = "(other)"
+
+# Counter positions in a per-image row
+FIELDS = ("pulls", "hits", "misses", "cache_bytes", "upstream_bytes", "peer_bytes")
+PULLS, HITS, MISSES, CACHE_BYTES, UPSTREAM_BYTES, PEER_BYTES = range(len(FIELDS))
+
+# Global analytics instance (None when analytics are disabled)
+_analytics: Optional["CacheAnalytics"] = None
+
+
+def get_analytics() -> Optional["CacheAnalytics"]:
+    """Get the global cache analytics, or None if disabled."""
+    return _analytics
+
+
+def set_analytics(analytics: Optional["CacheAnalytics"]) -> None:
+    """Set the global cache analytics."""
+    global _analytics
+    _analytics = analytics
+
+
+def record_lookup(
+    upstream: str,
+    image: str,
+    kind: str,
+    hit: bool,
+    size: int = 0,
+    source: Optional[str] = None,
+) -> None:
+    """Count a proxy cache lookup when analytics are enabled."""
+    if _analytics is not None:
+        _analytics.record(upstream, image, kind, hit, size, source)
+
+
+def _today() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def _summary(row: list[int]) -> dict:
+    summary = dict(zip(FIELDS, row))
+    lookups = row[HITS] + row[MISSES]
+    summary["hit_ratio"] = round(row[HITS] / lookups, 4) if lookups else None
+    return summary
+
+
+class CacheAnalytics:
+    """Aggregates cache lookups in memory and flushes daily totals."""
+
+    def __init__(self, storage: "S3Storage", config: AnalyticsConfig):
+        self.storage = storage
+        self.config = config
+        self.instance = f"{socket.gethostname()}-{os.getpid()}"
+        self._day = _today()
+        self._stats: dict[str, dict[str, list[int]]] = {}
+        self._images = 0
+        self._flush_lock = asyncio.Lock()
+
+    def record(
+        self,
+        upstream: str,
+        image: str,
+        kind: str,
+        hit: bool,
+        size: int = 0,
+        source: Optional[str] = None,
+    ) -> None:
+        """Count one lookup; a manifest lookup is one pull of the image."""
+        images = self._stats.get(upstream)
+        if images is None:
+            images = self._stats[upstream] = {}
+        row = images.get(image)
+        if row is None:
+            if self._images >= self.config.max_images:
+                image = OTHER_IMAGES
+                row = images.get(image)
+            if row is None:
+                row = images[image] = [0] * len(FIELDS)
+                self._images += 1
+
+        if kind == "manifest":
+            row[PULLS] += 1
+        row[HITS if hit else MISSES] += 1
+        if size:
+            if hit:
+                row[CACHE_BYTES] += size
+            else:
+                row[PEER_BYTES if source == "peer" else UPSTREAM_BYTES] += size
+
+    async def run(self) -> None:
+        """Flush totals periodically until cancelled."""
+        while True:
+            await asyncio.sleep(self.config.flush_interval_seconds)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Flushing cache analytics failed: {e}")
+
+    async def close(self) -> None:
+        """Write the final totals."""
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Flushing cache analytics failed: {e}")
+
+    async def flush(self) -> None:
+        """Write this instance's totals for the day, starting a new day if due."""
+        async with self._flush_lock:
+            day, stats = self._day, self._stats
+            if _today() != day:
+                self._day, self._stats, self._images = _today(), {}, 0
+            if not stats:
+                return
+
+            await self.storage.write_object(
+                f"{ANALYTICS_PREFIX}{day}/{self.instance}.json",
+                json.dumps({"day": day, "upstreams": stats}).encode(),
+                "application/json",
+            )
+            if self._day != day:
+                await self._prune()
+
+    async def _prune(self) -> None:
+        """Delete days older than the retention period."""
+        cutoff = time.strftime(
+            "%Y-%m-%d", time.gmtime(time.time() - self.config.retention_days * 86400)
+        )
+        async for key in self.storage.list_keys(ANALYTICS_PREFIX):
+            if key[len(ANALYTICS_PREFIX):].split("/", 1)[0] < cutoff:
+                await self.storage.delete_object(key)
+
+    # =========================================================================
+    # Reports
+    # =========================================================================
+
+    async def load(self, days: int) -> tuple[dict[str, dict[str, list[int]]], int]:
+        """Sum the totals of every instance over the last ``days`` days.
+
+        Returns:
+            (upstream -> image -> counters, number of files read)
+        """
+        await self.flush()
+        now = time.time()
+        wanted = {
+            time.strftime("%Y-%m-%d", time.gmtime(now - offset * 86400))
+            for offset in range(days)
+        }
+
+        keys = []
+        for day in sorted(wanted):
+            keys += [key async for key in self.storage.list_keys(f"{ANALYTICS_PREFIX}{day}/")]
+        contents = await asyncio.gather(*[self.storage.read_object(key) for key in keys])
+
+        merged: dict[str, dict[str, list[int]]] = {}
+        for key, content in zip(keys, contents):
+            if content is None:
+                continue
+            try:
+                upstreams = json.loads(content)["upstreams"]
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable analytics file {key}: {e}")
+                continue
+            for upstream, images in upstreams.items():
+                totals = merged.setdefault(upstream, {})
+                for image, row in images.items():
+                    current = totals.setdefault(image, [0] * len(FIELDS))
+                    for i, value in enumerate(row[:len(FIELDS)]):
+                        current[i] += value
+        return merged, len(keys)
+
+    async def report(self, days: int = 1, top: int = 0, upstream: str = "") -> dict:
+        """Per-upstream totals and the top images by pulls and by bytes."""
+        merged, files = await self.load(days)
+        if upstream:
+            merged = {upstream: merged.get(upstream, {})}
+        top = top or self.config.top_n
+
+        upstreams = []
+        images = []
+        total = [0] * len(FIELDS)
+        for name, rows in merged.items():
+            upstream_total = [sum(column) for column in zip(*rows.values())] or [0] * len(FIELDS)
+            upstreams.append({"upstream": name, **_summary(upstream_total)})
+            total = [a + b for a, b in zip(total, upstream_total)]
+            images += [(name, image, row) for image, row in rows.items()]
+        upstreams.sort(key=lambda entry: entry["pulls"], reverse=True)
+
+        def ranked(key) -> list[dict]:
+            ordered = sorted(images, key=key, reverse=True)[:top]
+            return [
+                {"upstream": name, "image": image, **_summary(row)}
+                for name, image, row in ordered
+            ]
+
+        return {
+            "days": days,
+            "instance_days": files,
+            "totals": _summary(total),
+            "upstreams": upstreams,
+            "top_images": {
+                "by_pulls": ranked(lambda item: item[2][PULLS]),
+                "by_bytes": ranked(
+                    lambda item: item[2][CACHE_BYTES] + item[2][UPSTREAM_BYTES] + item[2][PEER_BYTES]
+                ),
+            },
+        }
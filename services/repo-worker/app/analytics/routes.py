@@ -0,0 +1,27 @@
+"""Cache analytics admin API routes."""
+
+from quart import Blueprint, request
+
+from app.analytics.collector import get_analytics
+from app.auth.middleware import admin_required
+
+analytics_bp = Blueprint("analytics", __name__, url_prefix="/api/v1/analytics")
+
+
+@analytics_bp.route("/cache", methods=["GET"])
+@admin_required
+async def cache_report():
+    """Cache statistics of all replicas, e.g. ``?days=7&top=50&upstream=dockerhub``."""
+    analytics = get_analytics()
+    if analytics is None:
+        return {"error": "cache analytics are disabled"}, 404
+    try:
+        days = int(request.args.get("days", 1))
+        top = int(request.args.get("top", 0))
+    except ValueError:
+        return {"error": "days and top must be integers"}, 400
+    if not 1 <= days <= analytics.config.retention_days or not 0 <= top <= 1000:
+        return {
+            "error": f"days must be 1-{analytics.config.retention_days}, top 0-1000"
+        }, 400
+    return await analytics.report(days, top, request.args.get("upstream", ""))
@@ -0,0 +1,71 @@
+"""Cache of verified tokens for the auth middleware.
+
+A ``docker pull`` sends every request with the same Authorization header,
+so the decoded payload is cached under a hash of the raw header until the
+token's ``exp``. Rejected headers are remembered briefly so a client
+retrying with a bad token does not cost a JWT verification each time.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.auth.jwt import TokenPayload
+from app.metrics import AUTH_TOKEN_CACHE
+
+
+class TokenCache:
+    """Bounded LRU of verified token payloads keyed by header hash."""
+
+    def __init__(self, max_entries: int = 4096, failure_ttl: int = 5):
+        self.max_entries = max_entries
+        self.failure_ttl = failure_ttl
+        self._entries: OrderedDict[bytes, tuple[Optional[TokenPayload], float]] = (
+            OrderedDict()
+        )
+
+    @staticmethod
+    def _key(auth_header: str) -> bytes:
+        return hashlib.sha256(auth_header.encode()).digest()
+
+    def lookup(self, auth_header: str) -> tuple[bool, Optional[TokenPayload]]:
+        """Look up a header.
+
+        Returns:
+            (found, payload) - payload is None for a cached rejection
+        """
+        key = self._key(auth_header)
+        entry = self._entries.get(key)
+        if entry is None:
+            AUTH_TOKEN_CACHE.labels("miss").inc()
+            return False, None
+
+        payload, expires = entry
+        if expires <= time.time():
+            del self._entries[key]
+            AUTH_TOKEN_CACHE.labels("miss").inc()
+            return False, None
+
+        self._entries.move_to_end(key)
+        AUTH_TOKEN_CACHE.labels("hit" if payload else "rejected").inc()
+        return True, payload
+
+    def store(self, auth_header: str, payload: Optional[TokenPayload]) -> None:
+        """Cache a verification result until token expiry (or failure TTL)."""
+        if payload is not None:
+            expires = float(payload.exp) if payload.exp else 0.0
+        else:
+            expires = time.time() + self.failure_ttl
+        if expires <= time.time() or self.max_entries <= 0:
+            return
+
+        key = self._key(auth_header)
+        self._entries[key] = (payload, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self._entries.clear()
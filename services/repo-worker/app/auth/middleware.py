@@ -6,6 +6,7 @@ from typing import Optional
 
 from quart import Response, current_app, g, request
 
+from app.auth.cache import TokenCache
 from app.auth.jwt import TokenPayload, decode_token, extract_token_from_header
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,47 @@ def get_current_user() -> Optional[TokenPayload]:
     return getattr(g, "current_user", None)
 
 
+def _get_token_cache(config) -> TokenCache:
+    """Get the verified-token cache for the current app."""
+    cache = current_app.extensions.get("token_cache")
+    if cache is None:
+        cache = TokenCache(
+            config.auth.token_cache_entries, config.auth.token_failure_ttl_seconds
+        )
+        current_app.extensions["token_cache"] = cache
+    return cache
+
+
+def _authenticate(auth_header: str, config) -> Optional[TokenPayload]:
+    """Verify an Authorization header, using the token cache when possible."""
+    cache = _get_token_cache(config)
+    found, payload = cache.lookup(auth_header)
+    if found:
+        return payload
+
+    token = extract_token_from_header(auth_header)
+    payload = decode_token(token, config.auth.jwt_secret_key) if token else None
+    cache.store(auth_header, payload)
+    return payload
+
+
+def identify_user() -> Optional[TokenPayload]:
+    """Identify the caller on routes that do not require authentication.
+
+    Returns the current user if the route authenticated one, otherwise the
+    payload of a valid Authorization header, or None.
+    """
+    user = get_current_user()
+    if user is not None:
+        return user
+
+    config = current_app.config.get("CONFIG")
+    auth_header = request.headers.get("Authorization", "")
+    if not config or not config.auth.enabled or not auth_header:
+        return None
+    return _authenticate(auth_header, config)
+
+
 def auth_required(require_push: bool = False):
     """Decorator to require authentication.
 
@@ -41,12 +83,10 @@ def auth_required(require_push: bool = False):
 
             # Extract and validate token
             auth_header = request.headers.get("Authorization", "")
-            token = extract_token_from_header(auth_header)
-
-            if not token:
+            if not auth_header:
                 return _unauthorized_response("No valid authentication token provided")
 
-            payload = decode_token(token, config.auth.jwt_secret_key)
+            payload = _authenticate(auth_header, config)
             if not payload:
                 return _unauthorized_response("Invalid or expired token")
 
@@ -0,0 +1,169 @@
+"""Bandwidth shaping and weighted fair queuing for blob downloads.
+
+Two mechanisms, both applied per chunk of a streamed blob:
+
+- Per-client token buckets: each client (authenticated user, otherwise
+  client IP) gets its class's ``rate_mbps`` with ``burst_mb`` of burst.
+- Weighted fair queuing: when ``total_mbps`` is set, every chunk also
+  needs link time from a shared scheduler. Chunks are ordered by
+  start-time fair queuing tags (bytes / class weight), so while the link
+  is contended each active class gets throughput in proportion to its
+  weight and a bulk CI pull cannot starve cluster nodes.
+"""
+
+import asyncio
+import fnmatch
+import heapq
+import ipaddress
+import itertools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from app.config import BandwidthClass, BandwidthConfig
+from app.metrics import BANDWIDTH_BYTES, BANDWIDTH_WAIT
+
+# Client buckets kept before idle ones are evicted
+_MAX_CLIENTS = 10000
+
+_DEFAULT_CLASS = BandwidthClass(name="default")
+
+
+@dataclass
+class Client:
+    """Identity a blob download is shaped by."""
+    key: str  # user:<id> or ip:<address>
+    address: str = ""
+    user_agent: str = ""
+    roles: tuple[str, ...] = ()
+
+
+class TokenBucket:
+    """Token bucket that lets the balance go negative and waits it off."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: int) -> float:
+        """Take tokens, returning how long to wait before sending."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class FairLink:
+    """Shares link capacity between classes by weight (start-time fair queuing)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._virtual = 0.0
+        self._finish: dict[str, float] = {}
+        self._queue: list[tuple[float, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+
+    async def transmit(self, class_name: str, weight: int, amount: int) -> None:
+        """Wait until a chunk of ``amount`` bytes may be sent."""
+        start = max(self._virtual, self._finish.get(class_name, 0.0))
+        self._finish[class_name] = start + amount / max(weight, 1)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (start, next(self._seq), amount, future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run())
+        await future
+
+    async def _run(self) -> None:
+        """Grant chunks in tag order, pacing grants to the link rate."""
+        next_free = time.monotonic()
+        while self._queue:
+            # Wait for the link before choosing, so every flow with data
+            # ready competes for the next grant
+            delay = next_free - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            start, _, amount, future = heapq.heappop(self._queue)
+            self._virtual = start
+            if future.done():
+                continue
+            future.set_result(None)
+            next_free = max(next_free, time.monotonic()) + amount / self.rate
+        # Idle link: the next burst starts a fresh round
+        self._finish.clear()
+
+
+class BandwidthShaper:
+    """Applies per-client rate limits and fair queuing to blob streams."""
+
+    def __init__(self, config: BandwidthConfig):
+        self.config = config
+        self.chunk_size = max(config.chunk_kb, 1) * 1024
+        self._buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+        self._link = FairLink(config.total_mbps * 125_000) if config.total_mbps > 0 else None
+        self._networks = {
+            cls.name: [ipaddress.ip_network(cidr, strict=False) for cidr in cls.cidrs]
+            for cls in config.classes
+        }
+
+    def classify(self, client: Client) -> BandwidthClass:
+        """Get the first class matching a client."""
+        for cls in self.config.classes:
+            if not (cls.user_agents or cls.cidrs or cls.roles):
+                return cls
+            if any(fnmatch.fnmatch(client.user_agent, p) for p in cls.user_agents):
+                return cls
+            if set(cls.roles) & set(client.roles):
+                return cls
+            if client.address and self._networks[cls.name]:
+                try:
+                    address = ipaddress.ip_address(client.address)
+                except ValueError:
+                    continue
+                if any(address in network for network in self._networks[cls.name]):
+                    return cls
+        return _DEFAULT_CLASS
+
+    def _bucket(self, cls: BandwidthClass, client: Client) -> Optional[TokenBucket]:
+        """Get the client's token bucket, or None if its class is unlimited."""
+        if cls.rate_mbps <= 0:
+            return None
+        key = (cls.name, client.key)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(cls.rate_mbps * 125_000, cls.burst_mb * 1024 * 1024)
+            self._buckets[key] = bucket
+            while len(self._buckets) > _MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    async def shape(
+        self, stream: AsyncIterator[bytes], client: Client
+    ) -> AsyncIterator[bytes]:
+        """Yield a blob stream re-chunked and paced for a client."""
+        cls = self.classify(client)
+        bucket = self._bucket(cls, client)
+        async for chunk in stream:
+            for offset in range(0, len(chunk), self.chunk_size):
+                piece = chunk[offset:offset + self.chunk_size]
+                waited = time.monotonic()
+                if bucket is not None:
+                    delay = bucket.reserve(len(piece))
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if self._link is not None:
+                    await self._link.transmit(cls.name, cls.weight, len(piece))
+                BANDWIDTH_WAIT.labels(cls.name).inc(time.monotonic() - waited)
+                BANDWIDTH_BYTES.labels(cls.name).inc(len(piece))
+                yield piece
+
+
+async def iter_bytes(content: bytes, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+    """Async iterator over an in-memory blob."""
+    for offset in range(0, len(content), chunk_size):
+        yield content[offset:offset + chunk_size]
@@ -17,6 +17,41 @@ class S3Config:
     use_ssl: bool = False
 
 
+@dataclass
+class S3PoolLimit:
+    """Adaptive concurrency bounds for one pool of S3 operations."""
+    initial: int
+    min: int
+    max: int
+    latency_target_ms: int  # Slower responses count as congestion (0 = ignore)
+
+
+def _default_s3_pools() -> dict[str, S3PoolLimit]:
+    """Per pool bounds; listings are expensive for the object store."""
+    return {
+        "read": S3PoolLimit(initial=32, min=4, max=256, latency_target_ms=1000),
+        "write": S3PoolLimit(initial=16, min=2, max=128, latency_target_ms=0),
+        "list": S3PoolLimit(initial=4, min=1, max=32, latency_target_ms=3000),
+    }
+
+
+@dataclass
+class S3ConcurrencyConfig:
+    """AIMD concurrency limits for S3 calls, adapted to throttling and latency."""
+    enabled: bool = True
+    backoff_ratio: float = 0.7  # Multiplicative decrease on congestion
+    pools: dict[str, S3PoolLimit] = field(default_factory=_default_s3_pools)
+
+
+@dataclass
+class MetadataStoreConfig:
+    """Embedded SQLite store for tags, charts and proxy cache metadata."""
+    enabled: bool = False
+    path: str = "/data/repo-worker/metadata.db"  # Persistent volume
+    rebuild_on_start: bool = True  # Populate from the bucket if empty
+    resync_interval_seconds: int = 300  # Periodic rebuild (0 = disabled)
+
+
 @dataclass
 class CacheConfig:
     """Caching configuration."""
@@ -24,6 +59,237 @@ class CacheConfig:
     max_size_gb: int = 100
     mutable_tag_patterns: List[str] = field(default_factory=lambda: ["latest", "*nightly*"])
     mutable_tag_check_interval: str = "5m"
+    prefetch_on_head: bool = False
+    memory_entries: int = 1024  # Proxied manifests held in memory per worker
+
+
+@dataclass
+class NegativeCacheConfig:
+    """Negative caching of failed upstream lookups."""
+    enabled: bool = True
+    max_entries: int = 10000
+    not_found_ttl_seconds: int = 30  # 404
+    auth_ttl_seconds: int = 60  # 401, 403
+    throttled_ttl_seconds: int = 10  # 429, 5xx
+    shared_path: str = ""  # SQLite file shared by workers on a node
+
+
+@dataclass
+class SegmentedDownloadConfig:
+    """Parallel ranged downloads of large upstream blobs."""
+    enabled: bool = False
+    threshold_mb: int = 256  # Blobs at least this large are segmented
+    segment_size_mb: int = 16  # Also the S3 multipart part size (min 5)
+    concurrency: int = 4  # Segments in flight per blob
+    max_retries: int = 3  # Per-segment retries before giving up
+
+
+@dataclass
+class PeerConfig:
+    """Peer cache cluster: replicas share proxied blobs via a hash ring."""
+    enabled: bool = False
+    self_url: str = ""  # How peers reach this replica, e.g. http://10.0.0.5:5050
+    peers: List[str] = field(default_factory=list)  # Static peer base URLs
+    dns_name: str = ""  # Resolves to every replica (headless service)
+    port: int = 5050  # Port used for DNS-discovered peers
+    refresh_seconds: int = 30  # DNS re-resolution interval
+    virtual_nodes: int = 100  # Ring points per replica
+    timeout_seconds: int = 10  # Connect/read timeout before going upstream
+
+
+@dataclass
+class ReplicationTarget:
+    """A secondary OCI registry or S3 bucket local repositories are copied to."""
+    name: str
+    type: str = "registry"  # registry, s3
+    url: str = ""  # registry base URL
+    username: str = ""
+    password: str = ""
+    s3: S3Config = field(default_factory=S3Config)  # type: s3
+    repositories: List[str] = field(default_factory=lambda: ["*"])  # fnmatch
+
+
+@dataclass
+class ReplicationConfig:
+    """Asynchronous replication of local repositories."""
+    enabled: bool = False
+    concurrency: int = 4  # Manifests replicated at once (also blob copies)
+    max_retries: int = 5
+    max_backoff_seconds: int = 300
+    reconcile_interval_seconds: int = 3600  # Full tag comparison (0 = never)
+    queue_size: int = 10000  # Pending events; overflow is left to reconcile
+    targets: List[ReplicationTarget] = field(default_factory=list)
+
+
+@dataclass
+class TracingConfig:
+    """OpenTelemetry tracing (requires opentelemetry-sdk)."""
+    enabled: bool = False
+    sample_ratio: float = 1.0  # For requests without a sampled traceparent
+    exporter: str = "file"  # file, memory, otlp
+    file_path: str = "/tmp/repo-worker-spans.jsonl"
+    otlp_endpoint: str = ""  # Default: OTEL_EXPORTER_OTLP_ENDPOINT
+    service_name: str = "repo-worker"
+
+
+@dataclass
+class AnalyticsConfig:
+    """Per-upstream and per-image pull-through cache statistics."""
+    enabled: bool = False
+    flush_interval_seconds: int = 60  # Daily totals written to the bucket
+    max_images: int = 10000  # Per day; further images count as "(other)"
+    top_n: int = 20  # Default size of the top images lists
+    retention_days: int = 30
+
+
+@dataclass
+class PinConfig:
+    """Pin set of images running on managed clusters (kept from eviction/GC)."""
+    enabled: bool = False
+    sync_interval_seconds: int = 60  # Incremental deployed_apps fetch
+    registry_hosts: List[str] = field(default_factory=list)  # Hosts clusters pull us by
+    timeout_seconds: int = 10
+
+
+@dataclass
+class ScrubberConfig:
+    """Background re-verification of stored blobs against their digests."""
+    enabled: bool = False
+    max_mbps: float = 20.0  # Read budget for blob bytes (and descriptor HEADs)
+    cpu_percent: int = 10  # Share of one core spent hashing
+    pass_interval_hours: int = 24  # Pause between the end of a pass and the next
+    check_descriptors: bool = True  # Compare manifest descriptor sizes too
+    refetch_proxy: bool = True  # Re-pull quarantined proxy blobs from upstream
+    cursor_save_seconds: int = 30  # How often progress is persisted
+
+
+@dataclass
+class UpstreamSchedulerConfig:
+    """Rate-limit-aware upstream request scheduling."""
+    max_concurrent: int = 10  # Concurrent requests per upstream
+    low_quota_threshold: int = 10  # Defer background work at/below this
+    max_wait_seconds: int = 30  # Longest a client request waits out a 429
+    max_backoff_seconds: int = 300  # Cap when no Retry-After is given
+
+
+@dataclass
+class UpstreamSyncConfig:
+    """Upstream registries synced from flask-backend without a restart."""
+    enabled: bool = False
+    interval_seconds: int = 30  # Conditional (ETag) poll interval
+    timeout_seconds: int = 10
+
+
+@dataclass
+class AdmissionClassLimit:
+    """Concurrency and wait queue bounds for one class of routes."""
+    concurrency: int
+    queue: int
+
+
+def _default_admission_classes() -> dict[str, AdmissionClassLimit]:
+    """Per route class limits; manifests are cheap and served first."""
+    return {
+        "manifest": AdmissionClassLimit(concurrency=256, queue=1024),
+        "catalog": AdmissionClassLimit(concurrency=8, queue=32),
+        "helm_index": AdmissionClassLimit(concurrency=16, queue=64),
+        "blob_read": AdmissionClassLimit(concurrency=64, queue=256),
+        "blob_write": AdmissionClassLimit(concurrency=32, queue=64),
+    }
+
+
+@dataclass
+class AdmissionConfig:
+    """Admission control and load shedding for incoming requests."""
+    enabled: bool = False
+    max_concurrent: int = 384  # Across all route classes
+    max_wait_seconds: float = 5.0  # Queued longer than this -> 503
+    retry_after_seconds: int = 2  # Retry-After sent with 429/503
+    classes: dict[str, AdmissionClassLimit] = field(
+        default_factory=_default_admission_classes
+    )
+
+
+@dataclass
+class BandwidthClass:
+    """Clients sharing a per-client rate limit and a fair-queuing weight.
+
+    A client belongs to the first class whose user agent pattern, CIDR or
+    role matches; a class without matchers catches everyone else.
+    """
+    name: str
+    rate_mbps: float = 0  # Per client (user or IP), 0 = unlimited
+    burst_mb: float = 32  # Bucket size: bytes a client may send at once
+    weight: int = 1  # Share of total_mbps while the link is contended
+    user_agents: List[str] = field(default_factory=list)  # fnmatch patterns
+    cidrs: List[str] = field(default_factory=list)
+    roles: List[str] = field(default_factory=list)
+
+
+def _default_bandwidth_classes() -> List[BandwidthClass]:
+    """Cluster nodes get priority over CI and bulk clients."""
+    return [
+        BandwidthClass(
+            name="nodes", weight=4, user_agents=["containerd/*", "cri-o/*", "kubelet/*"]
+        ),
+        BandwidthClass(
+            name="ci",
+            rate_mbps=400,
+            weight=1,
+            user_agents=["docker/*", "buildkit/*", "skopeo/*", "crane/*", "podman/*"],
+        ),
+        BandwidthClass(name="default", weight=2),
+    ]
+
+
+@dataclass
+class BandwidthConfig:
+    """Bandwidth shaping and weighted fair queuing for blob downloads."""
+    enabled: bool = False
+    total_mbps: float = 0  # Link capacity shared by class weight (0 = unshared)
+    chunk_kb: int = 256  # Scheduling granularity
+    trust_forwarded_for: bool = False  # Key clients by X-Forwarded-For
+    classes: List[BandwidthClass] = field(default_factory=_default_bandwidth_classes)
+
+
+@dataclass
+class HelmUpstream:
+    """External Helm repository served through the Helm pull-through proxy."""
+    name: str
+    url: str
+    username: str = ""
+    password: str = ""
+
+
+def _builtin_helm_upstreams() -> List[HelmUpstream]:
+    """Public Helm repositories enabled in the marketplace by default."""
+    return [
+        HelmUpstream(name="bitnami", url="https://charts.bitnami.com/bitnami"),
+        HelmUpstream(name="ingress-nginx", url="https://kubernetes.github.io/ingress-nginx"),
+        HelmUpstream(name="jetstack", url="https://charts.jetstack.io"),
+        HelmUpstream(
+            name="prometheus-community",
+            url="https://prometheus-community.github.io/helm-charts",
+        ),
+        HelmUpstream(name="grafana", url="https://grafana.github.io/helm-charts"),
+        HelmUpstream(name="elastic", url="https://helm.elastic.co"),
+        HelmUpstream(name="hashicorp", url="https://helm.releases.hashicorp.com"),
+    ]
+
+
+@dataclass
+class HelmConfig:
+    """Helm chart repository configuration."""
+    # Versions per chart published in index.yaml (0 = all). Full history is
+    # always available from /index/<chart>.yaml.
+    index_max_versions: int = 0
+
+    # Pull-through proxy for external repositories (/helm-proxy/<repo>/)
+    proxy_enabled: bool = False
+    proxy_index_ttl_seconds: int = 300  # Revalidate upstream index.yaml after
+    proxy_repositories: List[HelmUpstream] = field(
+        default_factory=_builtin_helm_upstreams
+    )
 
 
 @dataclass
@@ -33,6 +299,8 @@ class AuthConfig:
     flask_backend_url: str = "http://flask-backend:5000"
     jwt_secret_key: str = ""
     anonymous_pull: bool = True
+    token_cache_entries: int = 4096  # Verified tokens kept until their exp
+    token_failure_ttl_seconds: int = 5  # Rejected headers remembered briefly
 
 
 @dataclass
@@ -56,15 +324,52 @@ class Config:
     debug: bool = False
     workers: int = 4
 
+    # Admission control
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+
+    # Blob download bandwidth shaping
+    bandwidth: BandwidthConfig = field(default_factory=BandwidthConfig)
+
     # Storage (S3-compatible required)
     s3: S3Config = field(default_factory=S3Config)
+    s3_concurrency: S3ConcurrencyConfig = field(default_factory=S3ConcurrencyConfig)
+    metadata_store: MetadataStoreConfig = field(default_factory=MetadataStoreConfig)
 
     # Caching
     cache: CacheConfig = field(default_factory=CacheConfig)
+    negative_cache: NegativeCacheConfig = field(default_factory=NegativeCacheConfig)
+    segmented_download: SegmentedDownloadConfig = field(
+        default_factory=SegmentedDownloadConfig
+    )
+    peers: PeerConfig = field(default_factory=PeerConfig)
+
+    # Replication of local repositories
+    replication: ReplicationConfig = field(default_factory=ReplicationConfig)
+
+    # Request tracing
+    tracing: TracingConfig = field(default_factory=TracingConfig)
+
+    # Pull-through cache statistics
+    analytics: AnalyticsConfig = field(default_factory=AnalyticsConfig)
+
+    # Pinned images of managed clusters
+    pins: PinConfig = field(default_factory=PinConfig)
+
+    # Background integrity scrubber
+    scrubber: ScrubberConfig = field(default_factory=ScrubberConfig)
+
+    # Helm repository
+    helm: HelmConfig = field(default_factory=HelmConfig)
 
     # Authentication
     auth: AuthConfig = field(default_factory=AuthConfig)
 
+    # Upstream request scheduling
+    upstream_scheduler: UpstreamSchedulerConfig = field(
+        default_factory=UpstreamSchedulerConfig
+    )
+    upstream_sync: UpstreamSyncConfig = field(default_factory=UpstreamSyncConfig)
+
     # Built-in upstream registries
     builtin_upstreams: List[UpstreamRegistry] = field(default_factory=list)
 
@@ -79,6 +384,22 @@ class Config:
         config.debug = os.getenv("DEBUG", "false").lower() == "true"
         config.workers = int(os.getenv("WORKERS", config.workers))
 
+        # Admission control config
+        config.admission.enabled = (
+            os.getenv("ADMISSION_CONTROL_ENABLED", "false").lower() == "true"
+        )
+        config.admission.max_concurrent = int(
+            os.getenv("ADMISSION_MAX_CONCURRENT", config.admission.max_concurrent)
+        )
+
+        # Bandwidth shaping config
+        config.bandwidth.enabled = (
+            os.getenv("BANDWIDTH_SHAPING_ENABLED", "false").lower() == "true"
+        )
+        config.bandwidth.total_mbps = float(
+            os.getenv("BANDWIDTH_TOTAL_MBPS", config.bandwidth.total_mbps)
+        )
+
         # S3 config
         config.s3.endpoint = os.getenv("S3_ENDPOINT", config.s3.endpoint)
         config.s3.bucket = os.getenv("S3_BUCKET", config.s3.bucket)
@@ -86,6 +407,66 @@ class Config:
         config.s3.access_key = os.getenv("S3_ACCESS_KEY", config.s3.access_key)
         config.s3.secret_key = os.getenv("S3_SECRET_KEY", config.s3.secret_key)
         config.s3.use_ssl = os.getenv("S3_USE_SSL", "false").lower() == "true"
+        config.s3_concurrency.enabled = (
+            os.getenv("S3_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+        )
+
+        # Metadata store config
+        config.metadata_store.enabled = (
+            os.getenv("METADATA_STORE_ENABLED", "false").lower() == "true"
+        )
+        config.metadata_store.path = os.getenv(
+            "METADATA_STORE_PATH", config.metadata_store.path
+        )
+        config.metadata_store.resync_interval_seconds = int(
+            os.getenv(
+                "METADATA_STORE_RESYNC_INTERVAL",
+                config.metadata_store.resync_interval_seconds,
+            )
+        )
+
+        # Replication config (targets are configured in YAML)
+        config.replication.enabled = (
+            os.getenv("REPLICATION_ENABLED", "false").lower() == "true"
+        )
+
+        # Tracing config
+        config.tracing.enabled = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+        config.tracing.sample_ratio = float(
+            os.getenv("TRACING_SAMPLE_RATIO", config.tracing.sample_ratio)
+        )
+        config.tracing.exporter = os.getenv("TRACING_EXPORTER", config.tracing.exporter)
+        config.tracing.file_path = os.getenv("TRACING_FILE_PATH", config.tracing.file_path)
+
+        # Cache analytics config
+        config.analytics.enabled = (
+            os.getenv("CACHE_ANALYTICS_ENABLED", "false").lower() == "true"
+        )
+
+        # Pin set config
+        config.pins.enabled = os.getenv("PINS_ENABLED", "false").lower() == "true"
+        if os.getenv("PINS_REGISTRY_HOSTS"):
+            config.pins.registry_hosts = [
+                host.strip()
+                for host in os.environ["PINS_REGISTRY_HOSTS"].split(",")
+                if host.strip()
+            ]
+
+        # Scrubber config
+        config.scrubber.enabled = (
+            os.getenv("SCRUBBER_ENABLED", "false").lower() == "true"
+        )
+        config.scrubber.max_mbps = float(
+            os.getenv("SCRUBBER_MAX_MBPS", config.scrubber.max_mbps)
+        )
+
+        # Helm config
+        config.helm.index_max_versions = int(
+            os.getenv("HELM_INDEX_MAX_VERSIONS", config.helm.index_max_versions)
+        )
+        config.helm.proxy_enabled = (
+            os.getenv("HELM_PROXY_ENABLED", "false").lower() == "true"
+        )
 
         # Auth config
         config.auth.enabled = os.getenv("AUTH_ENABLED", "true").lower() == "true"
@@ -98,6 +479,52 @@ class Config:
         # Cache config
         config.cache.enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
         config.cache.max_size_gb = int(os.getenv("CACHE_MAX_SIZE_GB", config.cache.max_size_gb))
+        config.cache.prefetch_on_head = (
+            os.getenv("CACHE_PREFETCH_ON_HEAD", "false").lower() == "true"
+        )
+
+        # Negative cache config
+        config.negative_cache.enabled = (
+            os.getenv("NEGATIVE_CACHE_ENABLED", "true").lower() == "true"
+        )
+        config.negative_cache.shared_path = os.getenv(
+            "NEGATIVE_CACHE_PATH", config.negative_cache.shared_path
+        )
+
+        # Segmented download config
+        config.segmented_download.enabled = (
+            os.getenv("SEGMENTED_DOWNLOAD_ENABLED", "false").lower() == "true"
+        )
+        config.segmented_download.threshold_mb = int(
+            os.getenv(
+                "SEGMENTED_DOWNLOAD_THRESHOLD_MB", config.segmented_download.threshold_mb
+            )
+        )
+
+        # Peer cache config
+        config.peers.enabled = os.getenv("PEER_CACHE_ENABLED", "false").lower() == "true"
+        config.peers.self_url = os.getenv("PEER_SELF_URL", config.peers.self_url)
+        config.peers.dns_name = os.getenv("PEER_DNS_NAME", config.peers.dns_name)
+        if os.getenv("PEER_URLS"):
+            config.peers.peers = [
+                url.strip() for url in os.environ["PEER_URLS"].split(",") if url.strip()
+            ]
+
+        # Upstream sync config
+        config.upstream_sync.enabled = (
+            os.getenv("UPSTREAM_SYNC_ENABLED", "false").lower() == "true"
+        )
+
+        # Upstream scheduler config
+        config.upstream_scheduler.max_concurrent = int(
+            os.getenv("UPSTREAM_MAX_CONCURRENT", config.upstream_scheduler.max_concurrent)
+        )
+        config.upstream_scheduler.low_quota_threshold = int(
+            os.getenv(
+                "UPSTREAM_LOW_QUOTA_THRESHOLD",
+                config.upstream_scheduler.low_quota_threshold,
+            )
+        )
 
         # Initialize built-in upstreams
         config.builtin_upstreams = cls._get_builtin_upstreams()
@@ -118,6 +545,56 @@ class Config:
             config.debug = data["server"].get("debug", config.debug)
             config.workers = data["server"].get("workers", config.workers)
 
+        if "admission" in data:
+            admission_data = data["admission"]
+            defaults = config.admission
+            classes = dict(defaults.classes)
+            for name, limits in (admission_data.get("classes") or {}).items():
+                if name not in classes:
+                    raise ValueError(f"Unknown admission route class: {name}")
+                classes[name] = AdmissionClassLimit(
+                    concurrency=limits.get("concurrency", classes[name].concurrency),
+                    queue=limits.get("queue", classes[name].queue),
+                )
+            config.admission = AdmissionConfig(
+                enabled=admission_data.get("enabled", defaults.enabled),
+                max_concurrent=admission_data.get("max_concurrent", defaults.max_concurrent),
+                max_wait_seconds=admission_data.get(
+                    "max_wait_seconds", defaults.max_wait_seconds
+                ),
+                retry_after_seconds=admission_data.get(
+                    "retry_after_seconds", defaults.retry_after_seconds
+                ),
+                classes=classes,
+            )
+
+        if "bandwidth" in data:
+            bandwidth_data = data["bandwidth"]
+            defaults = config.bandwidth
+            classes = defaults.classes
+            if "classes" in bandwidth_data:
+                classes = [
+                    BandwidthClass(
+                        name=item["name"],
+                        rate_mbps=item.get("rate_mbps", 0),
+                        burst_mb=item.get("burst_mb", 32),
+                        weight=item.get("weight", 1),
+                        user_agents=item.get("user_agents", []),
+                        cidrs=item.get("cidrs", []),
+                        roles=item.get("roles", []),
+                    )
+                    for item in bandwidth_data["classes"]
+                ]
+            config.bandwidth = BandwidthConfig(
+                enabled=bandwidth_data.get("enabled", defaults.enabled),
+                total_mbps=bandwidth_data.get("total_mbps", defaults.total_mbps),
+                chunk_kb=bandwidth_data.get("chunk_kb", defaults.chunk_kb),
+                trust_forwarded_for=bandwidth_data.get(
+                    "trust_forwarded_for", defaults.trust_forwarded_for
+                ),
+                classes=classes,
+            )
+
         if "storage" in data and "s3" in data["storage"]:
             s3_data = data["storage"]["s3"]
             config.s3 = S3Config(
@@ -129,6 +606,41 @@ class Config:
                 use_ssl=s3_data.get("use_ssl", config.s3.use_ssl),
             )
 
+        if "storage" in data and "concurrency" in data["storage"]:
+            concurrency_data = data["storage"]["concurrency"]
+            defaults = config.s3_concurrency
+            pools = dict(defaults.pools)
+            for name, limits in (concurrency_data.get("pools") or {}).items():
+                if name not in pools:
+                    raise ValueError(f"Unknown S3 concurrency pool: {name}")
+                pools[name] = S3PoolLimit(
+                    initial=limits.get("initial", pools[name].initial),
+                    min=limits.get("min", pools[name].min),
+                    max=limits.get("max", pools[name].max),
+                    latency_target_ms=limits.get(
+                        "latency_target_ms", pools[name].latency_target_ms
+                    ),
+                )
+            config.s3_concurrency = S3ConcurrencyConfig(
+                enabled=concurrency_data.get("enabled", defaults.enabled),
+                backoff_ratio=concurrency_data.get("backoff_ratio", defaults.backoff_ratio),
+                pools=pools,
+            )
+
+        if "storage" in data and "metadata" in data["storage"]:
+            metadata_data = data["storage"]["metadata"]
+            defaults = config.metadata_store
+            config.metadata_store = MetadataStoreConfig(
+                enabled=metadata_data.get("enabled", defaults.enabled),
+                path=metadata_data.get("path", defaults.path),
+                rebuild_on_start=metadata_data.get(
+                    "rebuild_on_start", defaults.rebuild_on_start
+                ),
+                resync_interval_seconds=metadata_data.get(
+                    "resync_interval_seconds", defaults.resync_interval_seconds
+                ),
+            )
+
         if "cache" in data:
             cache_data = data["cache"]
             config.cache = CacheConfig(
@@ -140,6 +652,182 @@ class Config:
                 mutable_tag_check_interval=cache_data.get(
                     "mutable_tag_check_interval", config.cache.mutable_tag_check_interval
                 ),
+                prefetch_on_head=cache_data.get(
+                    "prefetch_on_head", config.cache.prefetch_on_head
+                ),
+                memory_entries=cache_data.get(
+                    "memory_entries", config.cache.memory_entries
+                ),
+            )
+
+        if "cache" in data and "negative" in data["cache"]:
+            negative_data = data["cache"]["negative"]
+            defaults = config.negative_cache
+            config.negative_cache = NegativeCacheConfig(
+                enabled=negative_data.get("enabled", defaults.enabled),
+                max_entries=negative_data.get("max_entries", defaults.max_entries),
+                not_found_ttl_seconds=negative_data.get(
+                    "not_found_ttl_seconds", defaults.not_found_ttl_seconds
+                ),
+                auth_ttl_seconds=negative_data.get(
+                    "auth_ttl_seconds", defaults.auth_ttl_seconds
+                ),
+                throttled_ttl_seconds=negative_data.get(
+                    "throttled_ttl_seconds", defaults.throttled_ttl_seconds
+                ),
+                shared_path=negative_data.get("shared_path", defaults.shared_path),
+            )
+
+        if "cache" in data and "segmented_download" in data["cache"]:
+            segmented_data = data["cache"]["segmented_download"]
+            defaults = config.segmented_download
+            config.segmented_download = SegmentedDownloadConfig(
+                enabled=segmented_data.get("enabled", defaults.enabled),
+                threshold_mb=segmented_data.get("threshold_mb", defaults.threshold_mb),
+                segment_size_mb=segmented_data.get(
+                    "segment_size_mb", defaults.segment_size_mb
+                ),
+                concurrency=segmented_data.get("concurrency", defaults.concurrency),
+                max_retries=segmented_data.get("max_retries", defaults.max_retries),
+            )
+
+        if "cache" in data and "peers" in data["cache"]:
+            peers_data = data["cache"]["peers"]
+            defaults = config.peers
+            config.peers = PeerConfig(
+                enabled=peers_data.get("enabled", defaults.enabled),
+                self_url=os.getenv(
+                    peers_data.get("self_url_env", "PEER_SELF_URL"), defaults.self_url
+                ),
+                peers=peers_data.get("peers", defaults.peers),
+                dns_name=peers_data.get("dns_name", defaults.dns_name),
+                port=peers_data.get("port", defaults.port),
+                refresh_seconds=peers_data.get("refresh_seconds", defaults.refresh_seconds),
+                virtual_nodes=peers_data.get("virtual_nodes", defaults.virtual_nodes),
+                timeout_seconds=peers_data.get("timeout_seconds", defaults.timeout_seconds),
+            )
+
+        if "replication" in data:
+            replication_data = data["replication"]
+            defaults = config.replication
+            targets = [
+                ReplicationTarget(
+                    name=target["name"],
+                    type=target.get("type", "registry"),
+                    url=target.get("url", ""),
+                    username=target.get("username", ""),
+                    password=os.getenv(target.get("password_env", ""), ""),
+                    s3=S3Config(
+                        endpoint=target.get("endpoint", config.s3.endpoint),
+                        bucket=target.get("bucket", ""),
+                        region=target.get("region", ""),
+                        access_key=os.getenv(target.get("access_key_env", ""), ""),
+                        secret_key=os.getenv(target.get("secret_key_env", ""), ""),
+                        use_ssl=target.get("use_ssl", False),
+                    ),
+                    repositories=target.get("repositories", ["*"]),
+                )
+                for target in replication_data.get("targets") or []
+            ]
+            for target in targets:
+                if target.type not in ("registry", "s3"):
+                    raise ValueError(
+                        f"Unknown replication target type for {target.name}: {target.type}"
+                    )
+            config.replication = ReplicationConfig(
+                enabled=replication_data.get("enabled", defaults.enabled),
+                concurrency=replication_data.get("concurrency", defaults.concurrency),
+                max_retries=replication_data.get("max_retries", defaults.max_retries),
+                max_backoff_seconds=replication_data.get(
+                    "max_backoff_seconds", defaults.max_backoff_seconds
+                ),
+                reconcile_interval_seconds=replication_data.get(
+                    "reconcile_interval_seconds", defaults.reconcile_interval_seconds
+                ),
+                queue_size=replication_data.get("queue_size", defaults.queue_size),
+                targets=targets,
+            )
+
+        if "tracing" in data:
+            tracing_data = data["tracing"]
+            defaults = config.tracing
+            config.tracing = TracingConfig(
+                enabled=tracing_data.get("enabled", defaults.enabled),
+                sample_ratio=tracing_data.get("sample_ratio", defaults.sample_ratio),
+                exporter=tracing_data.get("exporter", defaults.exporter),
+                file_path=tracing_data.get("file_path", defaults.file_path),
+                otlp_endpoint=tracing_data.get("otlp_endpoint", defaults.otlp_endpoint),
+                service_name=tracing_data.get("service_name", defaults.service_name),
+            )
+
+        if "analytics" in data:
+            analytics_data = data["analytics"]
+            defaults = config.analytics
+            config.analytics = AnalyticsConfig(
+                enabled=analytics_data.get("enabled", defaults.enabled),
+                flush_interval_seconds=analytics_data.get(
+                    "flush_interval_seconds", defaults.flush_interval_seconds
+                ),
+                max_images=analytics_data.get("max_images", defaults.max_images),
+                top_n=analytics_data.get("top_n", defaults.top_n),
+                retention_days=analytics_data.get("retention_days", defaults.retention_days),
+            )
+
+        if "pins" in data:
+            pins_data = data["pins"]
+            defaults = config.pins
+            config.pins = PinConfig(
+                enabled=pins_data.get("enabled", defaults.enabled),
+                sync_interval_seconds=pins_data.get(
+                    "sync_interval_seconds", defaults.sync_interval_seconds
+                ),
+                registry_hosts=pins_data.get("registry_hosts", defaults.registry_hosts),
+                timeout_seconds=pins_data.get("timeout_seconds", defaults.timeout_seconds),
+            )
+
+        if "scrubber" in data:
+            scrubber_data = data["scrubber"]
+            defaults = config.scrubber
+            config.scrubber = ScrubberConfig(
+                enabled=scrubber_data.get("enabled", defaults.enabled),
+                max_mbps=scrubber_data.get("max_mbps", defaults.max_mbps),
+                cpu_percent=scrubber_data.get("cpu_percent", defaults.cpu_percent),
+                pass_interval_hours=scrubber_data.get(
+                    "pass_interval_hours", defaults.pass_interval_hours
+                ),
+                check_descriptors=scrubber_data.get(
+                    "check_descriptors", defaults.check_descriptors
+                ),
+                refetch_proxy=scrubber_data.get("refetch_proxy", defaults.refetch_proxy),
+                cursor_save_seconds=scrubber_data.get(
+                    "cursor_save_seconds", defaults.cursor_save_seconds
+                ),
+            )
+
+        if "helm" in data:
+            helm_data = data["helm"]
+            proxy_data = helm_data.get("proxy", {})
+            defaults = config.helm
+            repositories = defaults.proxy_repositories
+            if "repositories" in proxy_data:
+                repositories = [
+                    HelmUpstream(
+                        name=repo["name"],
+                        url=repo["url"],
+                        username=repo.get("username", ""),
+                        password=os.getenv(repo.get("password_env", ""), ""),
+                    )
+                    for repo in proxy_data["repositories"]
+                ]
+            config.helm = HelmConfig(
+                index_max_versions=helm_data.get(
+                    "index_max_versions", defaults.index_max_versions
+                ),
+                proxy_enabled=proxy_data.get("enabled", defaults.proxy_enabled),
+                proxy_index_ttl_seconds=proxy_data.get(
+                    "index_ttl_seconds", defaults.proxy_index_ttl_seconds
+                ),
+                proxy_repositories=repositories,
             )
 
         if "auth" in data:
@@ -153,6 +841,39 @@ class Config:
                     auth_data.get("jwt_secret_env", "JWT_SECRET_KEY"), ""
                 ),
                 anonymous_pull=auth_data.get("anonymous_pull", config.auth.anonymous_pull),
+                token_cache_entries=auth_data.get(
+                    "token_cache_entries", config.auth.token_cache_entries
+                ),
+                token_failure_ttl_seconds=auth_data.get(
+                    "token_failure_ttl_seconds", config.auth.token_failure_ttl_seconds
+                ),
+            )
+
+        if "upstreams" in data and "sync" in data["upstreams"]:
+            sync_data = data["upstreams"]["sync"]
+            defaults = config.upstream_sync
+            config.upstream_sync = UpstreamSyncConfig(
+                enabled=sync_data.get("enabled", defaults.enabled),
+                interval_seconds=sync_data.get("interval_seconds", defaults.interval_seconds),
+                timeout_seconds=sync_data.get("timeout_seconds", defaults.timeout_seconds),
+            )
+
+        if "upstreams" in data and "scheduler" in data["upstreams"]:
+            scheduler_data = data["upstreams"]["scheduler"]
+            defaults = config.upstream_scheduler
+            config.upstream_scheduler = UpstreamSchedulerConfig(
+                max_concurrent=scheduler_data.get(
+                    "max_concurrent", defaults.max_concurrent
+                ),
+                low_quota_threshold=scheduler_data.get(
+                    "low_quota_threshold", defaults.low_quota_threshold
+                ),
+                max_wait_seconds=scheduler_data.get(
+                    "max_wait_seconds", defaults.max_wait_seconds
+                ),
+                max_backoff_seconds=scheduler_data.get(
+                    "max_backoff_seconds", defaults.max_backoff_seconds
+                ),
             )
 
         # Initialize built-in upstreams
@@ -0,0 +1,199 @@
+"""Helm charts stored as OCI artifacts.
+
+Charts are kept in the shared content-addressed blob store using the Helm
+OCI layout (https://helm.sh/docs/topics/registries/): a config blob holding
+the chart metadata as JSON, a chart content layer holding the tarball, and
+a manifest tagged with the chart version. This is what ``helm push
+oci://...`` produces, so pushes through the OCI routes and uploads to the
+classic chart API end up in the same place.
+
+The classic ``index.yaml`` view is built from per-version metadata records
+(see ``S3Storage.put_chart_metadata``) written whenever a chart manifest is
+stored, so index generation never has to walk manifests or open tarballs.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import tarfile
+from datetime import datetime, timezone
+from typing import BinaryIO, Optional
+
+import yaml
+
+from app.storage.s3 import S3Storage
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+HELM_CONFIG_MEDIA_TYPE = "application/vnd.cncf.helm.config.v1+json"
+HELM_CHART_MEDIA_TYPE = "application/vnd.cncf.helm.chart.content.v1.tar+gzip"
+OCI_MANIFEST_MEDIA_TYPE = "application/vnd.oci.image.manifest.v1+json"
+
+# Repository namespace for charts uploaded through the classic chart API
+CHART_REPOSITORY_PREFIX = "charts"
+
+# Keys added to Chart.yaml in metadata records; not part of the OCI config
+_RECORD_FIELDS = ("digest", "created", "readme", "valuesSchema", "ociRepository")
+
+
+class _HashingReader:
+    """File wrapper that hashes and counts everything read through it."""
+
+    def __init__(self, fileobj: BinaryIO):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.fileobj.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+
+def extract_chart_metadata(fileobj: BinaryIO) -> Optional[dict]:
+    """Extract chart metadata from a chart tarball in a single streaming pass.
+
+    Decompression stops as soon as Chart.yaml, values.schema.json and the
+    README have been seen; the rest of the archive is only hashed. The
+    result is Chart.yaml plus ``digest``, ``created`` and, when present,
+    ``valuesSchema`` and ``readme``.
+    """
+    reader = _HashingReader(fileobj)
+    metadata: Optional[dict] = None
+    extras: dict = {}
+    with span("helm.extract_chart"):
+        try:
+            with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+                for member in tar:
+                    # Only files in the chart root (e.g. mychart/Chart.yaml)
+                    parts = member.name.split("/")
+                    if not member.isfile() or len(parts) > 2:
+                        continue
+                    filename = parts[-1]
+                    if filename == "Chart.yaml":
+                        metadata = yaml.safe_load(tar.extractfile(member).read())
+                    elif filename == "values.schema.json":
+                        extras["valuesSchema"] = json.loads(tar.extractfile(member).read())
+                    elif filename.upper().startswith("README"):
+                        extras["readme"] = tar.extractfile(member).read().decode(
+                            "utf-8", errors="replace"
+                        )
+                    if metadata is not None and len(extras) == 2:
+                        break
+            while reader.read(1024 * 1024):
+                pass
+        except (tarfile.TarError, yaml.YAMLError, ValueError, OSError) as e:
+            logger.error(f"Failed to extract chart metadata: {e}")
+            return None
+
+    if not isinstance(metadata, dict):
+        return None
+    metadata.update(extras)
+    metadata["digest"] = f"sha256:{reader.sha256.hexdigest()}"
+    metadata["created"] = datetime.now(timezone.utc).isoformat()
+    return metadata
+
+
+def chart_tag(version: str) -> str:
+    """OCI tag for a chart version (tags cannot contain '+')."""
+    return version.replace("+", "_")
+
+
+def build_chart_manifest(
+    config_digest: str, config_size: int, layer_digest: str, layer_size: int
+) -> bytes:
+    """Build the OCI manifest for a chart, as ``helm push`` does."""
+    return json.dumps({
+        "schemaVersion": 2,
+        "mediaType": OCI_MANIFEST_MEDIA_TYPE,
+        "config": {
+            "mediaType": HELM_CONFIG_MEDIA_TYPE,
+            "digest": config_digest,
+            "size": config_size,
+        },
+        "layers": [{
+            "mediaType": HELM_CHART_MEDIA_TYPE,
+            "digest": layer_digest,
+            "size": layer_size,
+        }],
+    }).encode()
+
+
+def chart_layer_digest(manifest: bytes) -> Optional[str]:
+    """Get the chart content layer digest if a manifest is a Helm chart."""
+    try:
+        document = json.loads(manifest)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(document, dict):
+        return None
+    if (document.get("config") or {}).get("mediaType") != HELM_CONFIG_MEDIA_TYPE:
+        return None
+    for layer in document.get("layers") or []:
+        if layer.get("mediaType") == HELM_CHART_MEDIA_TYPE:
+            return layer.get("digest")
+    return None
+
+
+async def publish_chart(storage: S3Storage, metadata: dict, fileobj: BinaryIO) -> str:
+    """Store an uploaded chart as an OCI artifact and record it in the index.
+
+    Args:
+        storage: Storage backend
+        metadata: Result of extract_chart_metadata for the file
+        fileobj: Seekable chart tarball
+
+    Returns:
+        The repository the chart manifest was stored under
+    """
+    layer_digest = metadata["digest"]
+    layer_size = fileobj.seek(0, io.SEEK_END)
+    fileobj.seek(0)
+    if not await storage.blob_exists(layer_digest):
+        await storage.put_blob_file(layer_digest, fileobj)
+
+    config = json.dumps(
+        {k: v for k, v in metadata.items() if k not in _RECORD_FIELDS}
+    ).encode()
+    config_digest = f"sha256:{hashlib.sha256(config).hexdigest()}"
+    if not await storage.blob_exists(config_digest):
+        await storage.put_blob(config_digest, config)
+
+    repository = f"{CHART_REPOSITORY_PREFIX}/{metadata['name']}"
+    manifest = build_chart_manifest(config_digest, len(config), layer_digest, layer_size)
+    await storage.put_manifest(repository, chart_tag(metadata["version"]), manifest)
+
+    await storage.put_chart_metadata(
+        metadata["name"], metadata["version"], {**metadata, "ociRepository": repository}
+    )
+    return repository
+
+
+async def record_oci_chart(storage: S3Storage, repository: str, manifest: bytes) -> bool:
+    """Add a chart pushed through the OCI routes to the classic index.
+
+    Returns:
+        True if the manifest was a Helm chart and was recorded
+    """
+    layer_digest = chart_layer_digest(manifest)
+    if layer_digest is None:
+        return False
+
+    content = await storage.get_blob(layer_digest)
+    if content is None:
+        logger.warning(f"Chart layer {layer_digest} for {repository} is missing")
+        return False
+
+    metadata = extract_chart_metadata(io.BytesIO(content))
+    if not metadata or not metadata.get("name") or not metadata.get("version"):
+        logger.warning(f"Chart pushed to {repository} has no usable Chart.yaml")
+        return False
+
+    await storage.put_chart_metadata(
+        metadata["name"], metadata["version"], {**metadata, "ociRepository": repository}
+    )
+    logger.info(f"Recorded OCI chart {metadata['name']} {metadata['version']} from {repository}")
+    return True
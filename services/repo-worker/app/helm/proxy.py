@@ -0,0 +1,285 @@
+"""Pull-through proxy for external Helm repositories.
+
+Serves ``/helm-proxy/<repo>/index.yaml`` and the charts it lists from a
+cache in front of public repositories (bitnami, jetstack, ...):
+
+- index.yaml is stored with the upstream ``ETag``/``Last-Modified`` and
+  revalidated with a conditional GET once ``proxy_index_ttl_seconds`` have
+  passed. Revalidation runs in the background while the cached copy is
+  served, and a stale index keeps being served while the upstream is down.
+- Chart URLs inside the index are rewritten to relative
+  ``charts/<file>.tgz`` URLs, which Helm resolves against the proxy.
+- Chart tarballs are stored as content-addressed blobs under the digest
+  the upstream index publishes, so they are cached forever and verified
+  on download.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+import yaml
+
+from app.config import Config, HelmUpstream
+from app.metrics import record_proxy_lookup, upstream_trace_config
+from app.storage.s3 import S3Storage
+from app.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Cache entries live under the regular proxy cache with a reserved upstream
+_CACHE_UPSTREAM = "_helm"
+
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# Global Helm proxy instance
+_helm_proxy: Optional["HelmProxy"] = None
+
+
+def get_helm_proxy() -> Optional["HelmProxy"]:
+    """Get the global Helm proxy, or None if the Helm proxy is disabled."""
+    return _helm_proxy
+
+
+def set_helm_proxy(proxy: Optional["HelmProxy"]) -> None:
+    """Set the global Helm proxy instance."""
+    global _helm_proxy
+    _helm_proxy = proxy
+
+
+class HelmIndex:
+    """A cached, rewritten upstream index and where its charts come from."""
+
+    def __init__(
+        self,
+        content: bytes,
+        charts: dict[str, tuple[str, str]],
+        etag: str = "",
+        last_modified: str = "",
+        last_check: float = 0.0,
+    ):
+        self.content = content
+        self.charts = charts  # filename -> (upstream URL, sha256 hex or "")
+        self.etag = etag
+        self.last_modified = last_modified
+        self.last_check = last_check
+
+    def to_meta(self) -> dict[str, str]:
+        """Serialize validators for S3 user metadata (string values only)."""
+        return {
+            "etag": self.etag,
+            "last-modified": self.last_modified,
+            "last-check": repr(self.last_check),
+        }
+
+
+def rewrite_index(content: bytes, base_url: str) -> tuple[bytes, dict[str, tuple[str, str]]]:
+    """Point every chart URL in an index at the proxy.
+
+    Returns:
+        (rewritten index, {filename: (absolute upstream URL, digest)})
+    """
+    index = yaml.load(content, Loader=_Loader) or {}
+    charts: dict[str, tuple[str, str]] = {}
+    for versions in (index.get("entries") or {}).values():
+        for entry in versions or []:
+            urls = entry.get("urls") or []
+            if not urls:
+                continue
+            upstream_url = urljoin(base_url.rstrip("/") + "/", urls[0])
+            filename = upstream_url.rsplit("/", 1)[-1].split("?", 1)[0]
+            charts[filename] = (upstream_url, entry.get("digest", ""))
+            entry["urls"] = [f"charts/{filename}"]
+    return yaml.dump(index, Dumper=_Dumper, default_flow_style=False).encode(), charts
+
+
+class HelmProxy:
+    """Caching proxy in front of external Helm repositories."""
+
+    def __init__(self, storage: S3Storage, config: Config):
+        self.storage = storage
+        self.config = config
+        self.timeout = aiohttp.ClientTimeout(total=300)
+        self.repositories = {repo.name: repo for repo in config.helm.proxy_repositories}
+        self._indexes: dict[str, HelmIndex] = {}
+        self._refresh_tasks: dict[str, asyncio.Task] = {}
+        self._trace_configs = {
+            name: upstream_trace_config(f"helm/{name}") for name in self.repositories
+        }
+
+    def _headers(self, repo: HelmUpstream) -> dict[str, str]:
+        """Basic auth header for a private repository."""
+        if not repo.username:
+            return {}
+        credentials = base64.b64encode(f"{repo.username}:{repo.password}".encode())
+        return {"Authorization": f"Basic {credentials.decode()}"}
+
+    def _session(self, name: str) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            timeout=self.timeout, trace_configs=[self._trace_configs[name]]
+        )
+
+    # =========================================================================
+    # Index
+    # =========================================================================
+
+    async def get_index(self, name: str) -> Optional[bytes]:
+        """Get a repository's rewritten index.yaml.
+
+        Returns None for unknown repositories, or when the index was never
+        fetched and the upstream cannot be reached.
+        """
+        repo = self.repositories.get(name)
+        if repo is None:
+            return None
+
+        index = await self._load_index(name)
+        if index is None:
+            record_proxy_lookup("helm_index", hit=False)
+            try:
+                index = await self._fetch_index(repo, None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, yaml.YAMLError) as e:
+                logger.warning(f"Failed to fetch Helm index for {name}: {e}")
+                return None
+            return index.content if index else None
+
+        record_proxy_lookup("helm_index", hit=True, size=len(index.content))
+        if (
+            time.time() - index.last_check >= self.config.helm.proxy_index_ttl_seconds
+            and name not in self._refresh_tasks
+        ):
+            task = asyncio.create_task(self._refresh(repo, index))
+            self._refresh_tasks[name] = task
+            task.add_done_callback(lambda _: self._refresh_tasks.pop(name, None))
+        return index.content
+
+    async def _load_index(self, name: str) -> Optional[HelmIndex]:
+        """Get the cached index from memory or storage."""
+        index = self._indexes.get(name)
+        if index is not None:
+            return index
+
+        cached = await self.storage.get_cache_entry(_CACHE_UPSTREAM, name, "index.yaml")
+        charts = await self.storage.get_cache_entry(_CACHE_UPSTREAM, name, "charts.json")
+        if cached is None or charts is None:
+            return None
+
+        content, _, meta = cached
+        index = HelmIndex(
+            content,
+            {k: tuple(v) for k, v in json.loads(charts[0]).items()},
+            etag=meta.get("etag", ""),
+            last_modified=meta.get("last-modified", ""),
+            last_check=float(meta.get("last-check", 0)),
+        )
+        self._indexes[name] = index
+        return index
+
+    async def _refresh(self, repo: HelmUpstream, index: HelmIndex) -> None:
+        """Revalidate a cached index, keeping it if the upstream is down."""
+        try:
+            await self._fetch_index(repo, index)
+        except (aiohttp.ClientError, asyncio.TimeoutError, yaml.YAMLError) as e:
+            logger.warning(f"Serving stale Helm index for {repo.name}: {e}")
+
+    async def _fetch_index(
+        self, repo: HelmUpstream, cached: Optional[HelmIndex]
+    ) -> Optional[HelmIndex]:
+        """Fetch index.yaml, conditionally if a cached copy exists."""
+        headers = self._headers(repo)
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        url = f"{repo.url.rstrip('/')}/index.yaml"
+        async with self._session(repo.name) as session:
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 304 and cached is not None:
+                    cached.last_check = time.time()
+                    await self.storage.update_cache_entry_meta(
+                        _CACHE_UPSTREAM, repo.name, "index.yaml",
+                        "application/x-yaml", cached.to_meta(),
+                    )
+                    return cached
+                if resp.status == 404:
+                    return None
+                resp.raise_for_status()
+                raw = await resp.read()
+                etag = resp.headers.get("ETag", "")
+                last_modified = resp.headers.get("Last-Modified", "")
+
+        content, charts = await asyncio.to_thread(rewrite_index, raw, repo.url)
+        index = HelmIndex(content, charts, etag, last_modified, time.time())
+
+        await self.storage.put_cache_entry(
+            _CACHE_UPSTREAM, repo.name, "charts.json",
+            json.dumps(charts).encode(), "application/json", {},
+        )
+        await self.storage.put_cache_entry(
+            _CACHE_UPSTREAM, repo.name, "index.yaml",
+            content, "application/x-yaml", index.to_meta(),
+        )
+        self._indexes[repo.name] = index
+        logger.info(f"Cached Helm index for {repo.name}: {len(charts)} chart versions")
+        return index
+
+    # =========================================================================
+    # Charts
+    # =========================================================================
+
+    async def get_chart(self, name: str, filename: str) -> Optional[bytes]:
+        """Get a chart tarball listed in a proxied index.
+
+        Raises:
+            ValueError: If the downloaded chart does not match its digest
+            aiohttp.ClientError: If the upstream fails or cannot be reached
+            asyncio.TimeoutError: If the upstream does not answer in time
+        """
+        repo = self.repositories.get(name)
+        if repo is None:
+            return None
+        index = await self._load_index(name)
+        if index is None:
+            if await self.get_index(name) is None:
+                return None
+            index = self._indexes[name]
+
+        source = index.charts.get(filename)
+        if source is None:
+            return None
+        url, digest = source
+
+        blob_digest = f"sha256:{digest}" if digest else ""
+        if blob_digest:
+            content = await self.storage.get_blob(blob_digest)
+            if content is not None:
+                record_proxy_lookup("helm_chart", hit=True, size=len(content))
+                return content
+
+        async with self._session(name) as session:
+            # Only send credentials to the repository's own host
+            same_origin = urlsplit(url)[:2] == urlsplit(repo.url)[:2]
+            headers = self._headers(repo) if same_origin else {}
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 404:
+                    return None
+                resp.raise_for_status()
+                content = await resp.read()
+        record_proxy_lookup("helm_chart", hit=False, size=len(content))
+
+        if blob_digest:
+            with span("hash.sha256", size=len(content)):
+                computed = hashlib.sha256(content).hexdigest()
+            if computed != digest:
+                raise ValueError(f"Digest mismatch for {filename}: expected {digest}")
+            await self.storage.put_blob(blob_digest, content)
+        return content
@@ -3,16 +3,20 @@
 Implements the Helm Chart Repository API for chart storage and retrieval.
 """
 
+import asyncio
+import hashlib
 import io
 import logging
-import tarfile
 from datetime import datetime, timezone
-from typing import Optional
 
+import aiohttp
 import yaml
 from quart import Blueprint, Response, current_app, request
 
 from app.auth.middleware import auth_required
+from app.helm.charts import extract_chart_metadata, publish_chart
+from app.helm.proxy import get_helm_proxy
+from app.semver import sort_versions
 from app.storage.s3 import get_storage
 
 logger = logging.getLogger(__name__)
@@ -27,50 +31,84 @@ helm_bp = Blueprint("helm", __name__)
 
 @helm_bp.route("/index.yaml", methods=["GET"])
 async def get_index():
-    """Get Helm repository index.yaml."""
+    """Get Helm repository index.yaml.
+
+    With ``helm.index_max_versions`` set, only the newest versions of each
+    chart are published here; older ones stay in the per-chart index.
+    """
     storage = get_storage()
+    config = current_app.config.get("CONFIG")
+    max_versions = config.helm.index_max_versions if config else 0
 
-    # Get all charts
     charts = await storage.list_charts()
+    entries = {}
+    for chart_name, versions in charts.items():
+        versions = sort_versions(versions, newest_first=True)
+        if max_versions > 0:
+            versions = versions[:max_versions]
+        entries[chart_name] = await _index_entries(storage, chart_name, versions)
 
-    # Build index
-    index = {
-        "apiVersion": "v1",
-        "generated": datetime.now(timezone.utc).isoformat(),
-        "entries": {},
-    }
+    return _index_response(entries)
+
+
+@helm_bp.route("/index/<chart>.yaml", methods=["GET"])
+async def get_chart_index(chart: str):
+    """Get an index document holding every version of a single chart."""
+    storage = get_storage()
+
+    charts = await storage.list_charts()
+    if chart not in charts:
+        return Response(status=404)
+
+    versions = sort_versions(charts[chart], newest_first=True)
+    return _index_response({chart: await _index_entries(storage, chart, versions)})
 
-    for chart_name, versions in charts.items():
-        index["entries"][chart_name] = []
 
-        for version in versions:
-            # Get chart metadata
+async def _index_entries(storage, chart_name: str, versions: list[str]) -> list[dict]:
+    """Build index entries for chart versions, newest first."""
+    entries = []
+    for version in versions:
+        # Get chart metadata, only opening the tarball if it isn't stored
+        metadata = await storage.get_chart_metadata(chart_name, version)
+        if metadata is None:
             chart_content = await storage.get_chart(chart_name, version)
             if chart_content:
-                metadata = _extract_chart_metadata(chart_content)
+                metadata = extract_chart_metadata(io.BytesIO(chart_content))
                 if metadata:
-                    entry = {
-                        "apiVersion": metadata.get("apiVersion", "v2"),
-                        "name": chart_name,
-                        "version": version,
-                        "description": metadata.get("description", ""),
-                        "urls": [f"/charts/{chart_name}-{version}.tgz"],
-                        "created": datetime.now(timezone.utc).isoformat(),
-                    }
-                    if "appVersion" in metadata:
-                        entry["appVersion"] = metadata["appVersion"]
-                    if "icon" in metadata:
-                        entry["icon"] = metadata["icon"]
-                    if "keywords" in metadata:
-                        entry["keywords"] = metadata["keywords"]
-                    if "home" in metadata:
-                        entry["home"] = metadata["home"]
-                    if "sources" in metadata:
-                        entry["sources"] = metadata["sources"]
-
-                    index["entries"][chart_name].append(entry)
-
-    # Return as YAML
+                    await storage.put_chart_metadata(chart_name, version, metadata)
+        if metadata:
+            entry = {
+                "apiVersion": metadata.get("apiVersion", "v2"),
+                "name": chart_name,
+                "version": version,
+                "description": metadata.get("description", ""),
+                "urls": [f"/charts/{chart_name}-{version}.tgz"],
+                "created": metadata.get("created", datetime.now(timezone.utc).isoformat()),
+            }
+            if "digest" in metadata:
+                entry["digest"] = metadata["digest"]
+            if "appVersion" in metadata:
+                entry["appVersion"] = metadata["appVersion"]
+            if "icon" in metadata:
+                entry["icon"] = metadata["icon"]
+            if "keywords" in metadata:
+                entry["keywords"] = metadata["keywords"]
+            if "home" in metadata:
+                entry["home"] = metadata["home"]
+            if "sources" in metadata:
+                entry["sources"] = metadata["sources"]
+
+            entries.append(entry)
+    return entries
+
+
+def _index_response(entries: dict[str, list[dict]]) -> Response:
+    """Render index entries as a Helm index.yaml document."""
+    index = {
+        "apiVersion": "v1",
+        "generated": datetime.now(timezone.utc).isoformat(),
+        "entries": entries,
+    }
     return Response(
         yaml.dump(index, default_flow_style=False),
         content_type="application/x-yaml",
@@ -100,11 +138,78 @@ async def download_chart(filename: str):
     chart_name, version = parts
 
     storage = get_storage()
+
+    # A chart version can be re-uploaded, so clients revalidate by content
+    # hash. The sidecar digest answers revalidation without reading the
+    # chart; only charts stored without metadata are hashed here.
+    metadata = await storage.get_chart_metadata(chart_name, version)
+    etag = (metadata or {}).get("digest", "")
+    if etag and request.if_none_match.contains_weak(etag):
+        return Response(
+            status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+        )
+
     content = await storage.get_chart(chart_name, version)
 
     if content is None:
         return Response(status=404)
 
+    if not etag:
+        etag = f"sha256:{hashlib.sha256(content).hexdigest()}"
+        if request.if_none_match.contains_weak(etag):
+            return Response(
+                status=304, headers={"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+            )
+    cache_headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+
+    return Response(
+        content,
+        content_type="application/gzip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(len(content)),
+            **cache_headers,
+        },
+    )
+
+
+# =============================================================================
+# Helm Pull-Through Proxy
+# =============================================================================
+
+
+@helm_bp.route("/helm-proxy/<repo>/index.yaml", methods=["GET"])
+async def get_proxy_index(repo: str):
+    """Get a proxied external repository's index.yaml."""
+    proxy = get_helm_proxy()
+    if proxy is None:
+        return Response(status=404)
+
+    content = await proxy.get_index(repo)
+    if content is None:
+        return Response(status=404)
+
+    return Response(content, content_type="application/x-yaml")
+
+
+@helm_bp.route("/helm-proxy/<repo>/charts/<filename>", methods=["GET"])
+async def download_proxy_chart(repo: str, filename: str):
+    """Download a chart from a proxied external repository."""
+    proxy = get_helm_proxy()
+    if proxy is None:
+        return Response(status=404)
+
+    try:
+        content = await proxy.get_chart(repo, filename)
+    except ValueError as e:
+        logger.error(f"Rejected proxied chart {repo}/{filename}: {e}")
+        return Response("Chart digest mismatch", status=502)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Failed to fetch proxied chart {repo}/{filename}: {e}")
+        return Response("Upstream chart repository unavailable", status=502)
+    if content is None:
+        return Response(status=404)
+
     return Response(
         content,
         content_type="application/gzip",
@@ -129,11 +234,9 @@ async def upload_chart():
     if "chart" not in files:
         return Response("No chart file provided", status=400)
 
+    # Scan the spooled upload for metadata, then stream it to storage
     chart_file = files["chart"]
-    content = chart_file.read()
-
-    # Extract chart metadata
-    metadata = _extract_chart_metadata(content)
+    metadata = extract_chart_metadata(chart_file.stream)
     if not metadata:
         return Response("Invalid chart: could not extract metadata", status=400)
 
@@ -143,9 +246,9 @@ async def upload_chart():
     if not chart_name or not version:
         return Response("Invalid chart: missing name or version", status=400)
 
-    # Store chart
+    # Store chart as an OCI artifact in the shared blob store
     storage = get_storage()
-    await storage.put_chart(chart_name, version, content)
+    await publish_chart(storage, metadata, chart_file.stream)
 
     return {
         "saved": True,
@@ -192,15 +295,21 @@ async def get_chart_versions(name: str):
 async def get_chart_info(name: str, version: str):
     """Get chart metadata."""
     storage = get_storage()
+    metadata = await storage.get_chart_metadata(name, version)
+    if metadata is not None:
+        return metadata
+
     content = await storage.get_chart(name, version)
 
     if content is None:
         return Response(status=404)
 
-    metadata = _extract_chart_metadata(content)
+    metadata = extract_chart_metadata(io.BytesIO(content))
     if not metadata:
         return Response("Could not extract metadata", status=500)
 
+    # Charts stored before sidecars existed are opened once, then never again
+    await storage.put_chart_metadata(name, version, metadata)
     return metadata
 
 
@@ -216,21 +325,3 @@ async def delete_chart(name: str, version: str):
 
     return {"deleted": True}, 200
 
-
-# =============================================================================
-# Helper Functions
-# =============================================================================
-
-
-def _extract_chart_metadata(content: bytes) -> Optional[dict]:
-    """Extract Chart.yaml metadata from a chart tarball."""
-    try:
-        with tarfile.open(fileobj=io.BytesIO(content), mode="r:gz") as tar:
-            for member in tar.getmembers():
-                if member.name.endswith("/Chart.yaml") or member.name == "Chart.yaml":
-                    f = tar.extractfile(member)
-                    if f:
-                        return yaml.safe_load(f.read())
-    except (tarfile.TarError, yaml.YAMLError) as e:
-        logger.error(f"Failed to extract chart metadata: {e}")
-    return None
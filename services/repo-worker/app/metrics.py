@@ -0,0 +1,380 @@
+"""Prometheus metrics for repo-worker service.
+
+Labels are limited to bounded sets (route templates, S3 operations,
+upstream names, status codes); image names and digests are never used
+as label values.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# HTTP requests
+# =============================================================================
+
+HTTP_REQUESTS = Counter(
+    "repo_worker_http_requests_total",
+    "HTTP requests handled, by route template",
+    ["route", "method", "status"],
+)
+
+HTTP_LATENCY = Histogram(
+    "repo_worker_http_request_duration_seconds",
+    "HTTP request latency until the response is returned, by route template",
+    ["route", "method"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "repo_worker_admission_in_flight",
+    "Requests admitted and running, by route class",
+    ["route_class"],
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "repo_worker_admission_queue_depth",
+    "Requests waiting for admission, by route class",
+    ["route_class"],
+)
+
+REQUESTS_SHED = Counter(
+    "repo_worker_requests_shed_total",
+    "Requests rejected by admission control",
+    ["route_class", "reason"],  # reason: queue_full (429), timeout (503)
+)
+
+AUTH_TOKEN_CACHE = Counter(
+    "repo_worker_auth_token_cache_total",
+    "Verified-token cache lookups",
+    ["result"],  # hit, rejected (cached failure), miss
+)
+
+UPLOADS_IN_PROGRESS = Gauge(
+    "repo_worker_blob_uploads_in_progress",
+    "Chunked blob upload sessions currently open",
+)
+
+BANDWIDTH_BYTES = Counter(
+    "repo_worker_bandwidth_bytes_total",
+    "Blob bytes sent through the bandwidth shaper, by client class",
+    ["bandwidth_class"],
+)
+
+BANDWIDTH_WAIT = Counter(
+    "repo_worker_bandwidth_wait_seconds_total",
+    "Time blob streams spent waiting on rate limits and fair queuing",
+    ["bandwidth_class"],
+)
+
+# =============================================================================
+# Storage
+# =============================================================================
+
+S3_LATENCY = Histogram(
+    "repo_worker_s3_operation_duration_seconds",
+    "S3 API call latency by operation",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+S3_ERRORS = Counter(
+    "repo_worker_s3_errors_total",
+    "S3 API calls that returned an error status",
+    ["operation", "status"],
+)
+
+# =============================================================================
+# Upstream registries
+# =============================================================================
+
+UPSTREAM_LATENCY = Histogram(
+    "repo_worker_upstream_request_duration_seconds",
+    "Upstream registry request latency (including token exchange)",
+    ["upstream", "method"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+UPSTREAM_RESPONSES = Counter(
+    "repo_worker_upstream_responses_total",
+    "Upstream registry responses by status code",
+    ["upstream", "status"],
+)
+
+UPSTREAM_SUPPRESSED = Counter(
+    "repo_worker_upstream_suppressed_total",
+    "Upstream requests suppressed by the negative cache",
+    ["upstream", "reason"],
+)
+
+UPSTREAM_QUOTA_LIMIT = Gauge(
+    "repo_worker_upstream_quota_limit",
+    "Pull quota limit reported by the upstream RateLimit-Limit header",
+    ["upstream"],
+)
+
+UPSTREAM_QUOTA_REMAINING = Gauge(
+    "repo_worker_upstream_quota_remaining",
+    "Pull quota remaining reported by the upstream RateLimit-Remaining header",
+    ["upstream"],
+)
+
+UPSTREAM_QUEUE_DEPTH = Gauge(
+    "repo_worker_upstream_queue_depth",
+    "Requests waiting for an upstream scheduler slot",
+    ["upstream"],
+)
+
+UPSTREAM_THROTTLED = Counter(
+    "repo_worker_upstream_throttled_total",
+    "429 responses received from the upstream",
+    ["upstream"],
+)
+
+UPSTREAMS_CONFIGURED = Gauge(
+    "repo_worker_upstreams_configured",
+    "Upstream registries the proxy currently serves",
+)
+
+UPSTREAM_CONFIG_RELOADS = Counter(
+    "repo_worker_upstream_config_reloads_total",
+    "Upstream registry configuration polls of flask-backend",
+    ["result"],  # applied, unchanged, failed
+)
+
+# =============================================================================
+# Pull-through proxy cache
+# =============================================================================
+
+PROXY_CACHE_REQUESTS = Counter(
+    "repo_worker_proxy_cache_requests_total",
+    "Pull-through proxy cache lookups (hit ratio = hit / (hit + miss))",
+    ["kind", "result"],  # kind: manifest|blob|helm_index|helm_chart, result: hit|miss
+)
+
+PROXY_BYTES_SERVED = Counter(
+    "repo_worker_proxy_bytes_served_total",
+    "Bytes served for proxied content, from cache or fetched from upstream",
+    ["kind", "source"],  # source: cache|upstream|peer
+)
+
+PEER_REQUESTS = Counter(
+    "repo_worker_peer_requests_total",
+    "Blob lookups forwarded to the owning peer replica",
+    ["result"],  # hit, miss (owner has no such blob), error (fell back upstream)
+)
+
+PEER_MEMBERS = Gauge(
+    "repo_worker_peer_members",
+    "Replicas on the peer cache hash ring, including this one",
+)
+
+# =============================================================================
+# S3 concurrency
+# =============================================================================
+
+S3_CONCURRENCY_LIMIT = Gauge(
+    "repo_worker_s3_concurrency_limit",
+    "Current adaptive limit of S3 calls in flight",
+    ["pool"],  # read, write, list
+)
+
+S3_IN_FLIGHT = Gauge(
+    "repo_worker_s3_in_flight",
+    "S3 calls currently in flight",
+    ["pool"],
+)
+
+S3_QUEUE_TIME = Histogram(
+    "repo_worker_s3_queue_seconds",
+    "Time S3 calls waited for a concurrency slot",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+)
+
+S3_THROTTLED = Counter(
+    "repo_worker_s3_throttled_total",
+    "S3 responses signalling overload (503 SlowDown, 429)",
+    ["pool"],
+)
+
+# =============================================================================
+# Replication
+# =============================================================================
+
+REPLICATION_QUEUE_DEPTH = Gauge(
+    "repo_worker_replication_queue_depth",
+    "Manifest events waiting to be replicated",
+)
+
+REPLICATION_EVENTS = Counter(
+    "repo_worker_replication_events_total",
+    "Manifest replications by target and outcome",
+    ["target", "result"],  # replicated, failed, dropped (queue full)
+)
+
+REPLICATION_BLOBS = Counter(
+    "repo_worker_replication_blobs_total",
+    "Blobs handled while replicating, by how they reached the target",
+    ["target", "mode"],  # present, server_copy, streamed
+)
+
+REPLICATION_LAG = Histogram(
+    "repo_worker_replication_lag_seconds",
+    "Time from a manifest push (or reconcile) until the target has it",
+    ["target"],
+    buckets=(0.5, 1, 5, 15, 30, 60, 300, 900, 3600),
+)
+
+REPLICATION_LAST_SUCCESS = Gauge(
+    "repo_worker_replication_last_success_timestamp_seconds",
+    "Unix time of the last successful replication to a target",
+    ["target"],
+)
+
+# =============================================================================
+# Pinned images
+# =============================================================================
+
+PINNED_IMAGES = Gauge(
+    "repo_worker_pinned_images",
+    "Image references in the pin set",
+    ["source"],  # deployment, manual
+)
+
+PINNED_DIGESTS = Gauge(
+    "repo_worker_pinned_digests",
+    "Manifest and blob digests protected from eviction and GC",
+)
+
+PINNED_MISSING = Gauge(
+    "repo_worker_pinned_missing",
+    "Pinned content not in the cache yet",
+    ["kind"],  # manifest, blob
+)
+
+PIN_SYNCS = Counter(
+    "repo_worker_pin_syncs_total",
+    "Deployed image fetches from flask-backend",
+    ["result"],  # ok, failed
+)
+
+# =============================================================================
+# Integrity scrubber
+# =============================================================================
+
+SCRUB_BYTES = Counter(
+    "repo_worker_scrub_bytes_total",
+    "Blob bytes read and re-hashed by the scrubber",
+)
+
+SCRUB_BLOBS = Counter(
+    "repo_worker_scrub_blobs_total",
+    "Blobs checked by the scrubber",
+    ["result"],  # ok, quarantined, vanished, read_error
+)
+
+SCRUB_ERRORS = Counter(
+    "repo_worker_scrub_errors_total",
+    "Integrity problems found by the scrubber",
+    ["kind"],  # digest_mismatch, size_mismatch, missing_blob
+)
+
+SCRUB_REFETCHES = Counter(
+    "repo_worker_scrub_refetches_total",
+    "Quarantined proxy blobs pulled again from their upstream",
+    ["result"],  # ok, failed
+)
+
+SCRUB_LAST_PASS = Gauge(
+    "repo_worker_scrub_last_pass_timestamp_seconds",
+    "Unix time the scrubber last finished a full pass",
+)
+
+# =============================================================================
+# Runtime
+# =============================================================================
+
+EVENT_LOOP_LAG = Histogram(
+    "repo_worker_event_loop_lag_seconds",
+    "Delay between a scheduled wake-up and the event loop running it",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def record_proxy_lookup(
+    kind: str, hit: bool, size: int = 0, source: Optional[str] = None
+) -> None:
+    """Record a proxy cache lookup and the bytes it served.
+
+    Misses are attributed to the upstream unless another ``source`` (a
+    peer replica) served them.
+    """
+    PROXY_CACHE_REQUESTS.labels(kind, "hit" if hit else "miss").inc()
+    if size:
+        PROXY_BYTES_SERVED.labels(
+            kind, "cache" if hit else (source or "upstream")
+        ).inc(size)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Measure how late the event loop wakes up from a fixed sleep."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - start - interval, 0.0))
+
+
+# =============================================================================
+# Instrumentation hooks
+# =============================================================================
+
+
+def _s3_before_call(model, context, **kwargs) -> None:
+    """botocore before-call hook: remember when the S3 call started."""
+    context["repo_worker_start"] = time.perf_counter()
+
+
+def _s3_after_call(http_response, model, context, **kwargs) -> None:
+    """botocore after-call hook: record S3 call latency and errors."""
+    start = context.get("repo_worker_start")
+    if start is not None:
+        S3_LATENCY.labels(model.name).observe(time.perf_counter() - start)
+    status = getattr(http_response, "status_code", 200)
+    if status >= 400:
+        S3_ERRORS.labels(model.name, str(status)).inc()
+
+
+def instrument_s3_session(session) -> None:
+    """Register latency hooks for every S3 client created from a session."""
+    session.register("before-call.s3", _s3_before_call)
+    session.register("after-call.s3", _s3_after_call)
+
+
+def upstream_trace_config(upstream: str):
+    """Build an aiohttp TraceConfig recording latency/status for an upstream."""
+    import aiohttp
+
+    async def on_request_start(session, ctx, params):
+        ctx.start = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        UPSTREAM_LATENCY.labels(upstream, params.method).observe(
+            time.perf_counter() - ctx.start
+        )
+        UPSTREAM_RESPONSES.labels(upstream, str(params.response.status)).inc()
+
+    async def on_request_exception(session, ctx, params):
+        UPSTREAM_RESPONSES.labels(upstream, "error").inc()
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
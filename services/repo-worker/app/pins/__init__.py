@@ -0,0 +1,6 @@
+"""Pinned images of managed clusters, protected from cache eviction and GC."""
+
+from app.pins.pinset import PinSet, get_pins, set_pins
+from app.pins.routes import pins_bp
+
+__all__ = ["PinSet", "get_pins", "pins_bp", "set_pins"]
@@ -0,0 +1,328 @@
+"""Pin set of images running on managed clusters.
+
+Cold pulls during a node scale-up are the worst time to discover that a
+layer is no longer cached. The pin set is the list of image references
+deployed on managed clusters (flask-backend ``deployed_apps``) plus
+manual pins, resolved to every manifest and blob digest they need:
+
+- Eviction or GC must skip anything ``is_pinned`` reports.
+- Pinned content that is not cached yet is listed by ``missing`` so it
+  can be warmed before it is needed.
+
+Deployments are fetched incrementally with a (updated_at, id) cursor;
+the first sync after start fetches everything. Manual pins are kept in
+the bucket (``_pins/manual.json``) so every replica sees them.
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+import aiohttp
+
+from app.config import PinConfig
+from app.metrics import PIN_SYNCS, PINNED_DIGESTS, PINNED_IMAGES, PINNED_MISSING
+
+if TYPE_CHECKING:
+    from app.proxy.proxy import ProxyHandler
+    from app.storage.s3 import S3Storage
+
+logger = logging.getLogger(__name__)
+
+MANUAL_PINS_KEY = "_pins/manual.json"
+
+_IMAGES_PATH = "/api/v1/marketplace/deployments/internal/images"
+
+# Global pin set instance (None when pinning is disabled)
+_pins: Optional["PinSet"] = None
+
+
+def get_pins() -> Optional["PinSet"]:
+    """Get the global pin set, or None if pinning is disabled."""
+    return _pins
+
+
+def set_pins(pins: Optional["PinSet"]) -> None:
+    """Set the global pin set."""
+    global _pins
+    _pins = pins
+
+
+def split_image_reference(image: str) -> tuple[Optional[str], str, str]:
+    """Split an image reference into (host or None, path, tag or digest).
+
+    The first path component is a registry host if it contains a dot or a
+    port, or is ``localhost``; a missing tag means ``latest``.
+    """
+    host = None
+    first, _, rest = image.partition("/")
+    if rest and ("." in first or ":" in first or first == "localhost"):
+        host, image = first, rest
+
+    if "@" in image:
+        path, reference = image.split("@", 1)
+    else:
+        path, _, reference = image.rpartition(":")
+        if not path or "/" in reference:
+            path, reference = image, "latest"
+    return host, path, reference
+
+
+@dataclass
+class PinnedImage:
+    """An image reference and what it resolved to."""
+    reference: str  # As deployed, e.g. ghcr.io/org/app:1.2
+    sources: set[str] = field(default_factory=set)  # deployment:<id>, manual
+    repository: str = ""  # Repository name in this registry
+    digests: set[str] = field(default_factory=set)  # Manifests and blobs
+    missing: list[str] = field(default_factory=list)  # Not cached yet
+
+    def to_dict(self) -> dict:
+        return {
+            "reference": self.reference,
+            "sources": sorted(self.sources),
+            "repository": self.repository,
+            "digests": len(self.digests),
+            "missing": self.missing,
+        }
+
+
+class PinSet:
+    """Deployed and manually pinned images, resolved to digests."""
+
+    def __init__(
+        self,
+        storage: "S3Storage",
+        config: PinConfig,
+        backend_url: str,
+        proxy: Optional["ProxyHandler"] = None,
+    ):
+        self.storage = storage
+        self.config = config
+        self.backend_url = backend_url.rstrip("/")
+        self.proxy = proxy
+        self.timeout = aiohttp.ClientTimeout(total=config.timeout_seconds)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._deployments: dict[int, list[str]] = {}
+        self._cursor: Optional[dict] = None
+        self._manual: set[str] = set()
+        self.images: dict[str, PinnedImage] = {}
+        self._digests: set[str] = set()
+
+    def is_pinned(self, digest: str) -> bool:
+        """Whether a manifest or blob digest belongs to a pinned image."""
+        return digest in self._digests
+
+    def missing(self) -> list[PinnedImage]:
+        """Pinned images with content that is not cached yet."""
+        return [image for image in self.images.values() if image.missing]
+
+    async def run(self) -> None:
+        """Sync deployments and re-resolve the pin set periodically."""
+        while True:
+            try:
+                await self.sync()
+                await self.resolve()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pin set refresh failed: {e}")
+            await asyncio.sleep(self.config.sync_interval_seconds)
+
+    async def close(self) -> None:
+        """Close the HTTP session to flask-backend."""
+        if self._session is not None:
+            await self._session.close()
+
+    # =========================================================================
+    # Sources
+    # =========================================================================
+
+    async def sync(self) -> int:
+        """Fetch deployments changed since the last sync.
+
+        Returns:
+            Number of deployments received
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+
+        received = 0
+        while True:
+            params = {}
+            if self._cursor is not None:
+                params = {
+                    "since": self._cursor["since"],
+                    "after_id": str(self._cursor["after_id"]),
+                }
+            try:
+                async with self._session.get(
+                    f"{self.backend_url}{_IMAGES_PATH}", params=params
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                PIN_SYNCS.labels("failed").inc()
+                logger.warning(f"Fetching deployed images failed: {e}")
+                return received
+
+            for deployment in data.get("deployments") or []:
+                if deployment.get("status") == "deleted":
+                    self._deployments.pop(deployment["id"], None)
+                else:
+                    self._deployments[deployment["id"]] = list(deployment.get("images") or [])
+            received += len(data.get("deployments") or [])
+            if data.get("next") and data["next"].get("since"):
+                self._cursor = data["next"]
+            if not data.get("has_more"):
+                break
+
+        PIN_SYNCS.labels("ok").inc()
+        return received
+
+    async def load_manual(self) -> None:
+        """Load manual pins from the bucket."""
+        content = await self.storage.read_object(MANUAL_PINS_KEY)
+        self._manual = set(json.loads(content)) if content else set()
+
+    async def pin(self, reference: str) -> PinnedImage:
+        """Pin an image reference manually and resolve it."""
+        await self.load_manual()
+        self._manual.add(reference)
+        await self._save_manual()
+        image = self.images.get(reference) or PinnedImage(reference)
+        image.sources.add("manual")
+        await self._resolve_image(image)
+        self.images[reference] = image
+        self._digests |= image.digests
+        self._update_metrics()
+        return image
+
+    async def unpin(self, reference: str) -> bool:
+        """Remove a manual pin. Returns False if it was not pinned manually."""
+        await self.load_manual()
+        if reference not in self._manual:
+            return False
+        self._manual.discard(reference)
+        await self._save_manual()
+        await self.resolve()
+        return True
+
+    async def _save_manual(self) -> None:
+        await self.storage.write_object(
+            MANUAL_PINS_KEY, json.dumps(sorted(self._manual)).encode(), "application/json"
+        )
+
+    # =========================================================================
+    # Resolution
+    # =========================================================================
+
+    async def resolve(self) -> None:
+        """Resolve every pinned reference to its manifest and blob digests."""
+        await self.load_manual()
+        images: dict[str, PinnedImage] = {}
+        for deployment_id, references in self._deployments.items():
+            for reference in references:
+                images.setdefault(reference, PinnedImage(reference)).sources.add(
+                    f"deployment:{deployment_id}"
+                )
+        for reference in self._manual:
+            images.setdefault(reference, PinnedImage(reference)).sources.add("manual")
+
+        results = await asyncio.gather(
+            *[self._resolve_image(image) for image in images.values()],
+            return_exceptions=True,
+        )
+        for image, result in zip(images.values(), results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not resolve pinned image {image.reference}: {result}")
+
+        self.images = images
+        self._digests = set().union(*[image.digests for image in images.values()])
+        self._update_metrics()
+
+    def _repository(self, reference: str) -> Optional[tuple[str, str]]:
+        """Map an image reference to (repository in this registry, tag or digest).
+
+        Returns None for images pulled from registries this one does not
+        proxy.
+        """
+        host, path, tag = split_image_reference(reference)
+        if host is not None and host in self.config.registry_hosts:
+            return path, tag
+
+        # Like the container runtime, no host means Docker Hub
+        if host is None:
+            host = "docker.io"
+        if host == "docker.io" and "/" not in path:
+            path = f"library/{path}"
+        upstream = self.proxy.upstream_for_host(host) if self.proxy is not None else None
+        if upstream is None:
+            return None
+        return f"{upstream}/{path}", tag
+
+    async def _get_manifest(self, repository: str, reference: str) -> Optional[tuple[bytes, str]]:
+        """Read a manifest from the local repository or the proxy cache only."""
+        target = self.proxy.parse_proxy_request(repository) if self.proxy else None
+        if target is None:
+            return await self.storage.get_manifest(repository, reference)
+        entry = await self.proxy.cache.get_entry(*target, reference)
+        return (entry.content, entry.digest) if entry is not None else None
+
+    async def _resolve_image(self, image: PinnedImage) -> None:
+        """Collect the digests of one image, noting what is not cached."""
+        image.digests, image.missing = set(), []
+        mapped = self._repository(image.reference)
+        if mapped is None:
+            return
+        image.repository, reference = mapped
+
+        manifest = await self._get_manifest(image.repository, reference)
+        if manifest is None:
+            image.missing.append(reference)
+            return
+        content, digest = manifest
+        image.digests.add(digest)
+
+        blobs: list[str] = []
+        for document in await self._manifest_tree(image, content):
+            if isinstance(document.get("config"), dict):
+                blobs.append(document["config"]["digest"])
+            blobs += [
+                layer["digest"] for layer in document.get("layers") or []
+                if not layer.get("urls")
+            ]
+        image.digests.update(blobs)
+        image.missing += await self.storage.find_missing(image.repository, blobs, [])
+
+    async def _manifest_tree(self, image: PinnedImage, content: bytes) -> list[dict]:
+        """Parse a manifest and the cached children of an index.
+
+        Children of an index that were never pulled are not reported as
+        missing: clusters only pull the platforms they run.
+        """
+        document = json.loads(content)
+        documents = [document]
+        for child in document.get("manifests") or []:
+            manifest = await self._get_manifest(image.repository, child["digest"])
+            if manifest is not None:
+                image.digests.add(child["digest"])
+                documents.append(json.loads(manifest[0]))
+        return documents
+
+    def _update_metrics(self) -> None:
+        PINNED_IMAGES.labels("deployment").set(
+            sum(1 for i in self.images.values() if i.sources != {"manual"})
+        )
+        PINNED_IMAGES.labels("manual").set(
+            sum(1 for i in self.images.values() if "manual" in i.sources)
+        )
+        PINNED_DIGESTS.set(len(self._digests))
+        PINNED_MISSING.labels("manifest").set(
+            sum(1 for i in self.images.values() if i.missing and not i.digests)
+        )
+        PINNED_MISSING.labels("blob").set(
+            sum(len(i.missing) for i in self.images.values() if i.digests)
+        )
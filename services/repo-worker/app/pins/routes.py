@@ -0,0 +1,61 @@
+"""Pin set API routes."""
+
+from quart import Blueprint, request
+
+from app.auth.middleware import admin_required, auth_required
+from app.pins.pinset import get_pins
+
+pins_bp = Blueprint("pins", __name__, url_prefix="/api/v1/pins")
+
+
+def _disabled():
+    return {"error": "pinning is disabled"}, 404
+
+
+@pins_bp.route("", methods=["GET"])
+@auth_required(require_push=True)
+async def list_pins():
+    """List pinned images, where they come from and what is not cached."""
+    pins = get_pins()
+    if pins is None:
+        return _disabled()
+    images = sorted(pins.images.values(), key=lambda image: image.reference)
+    return {"images": [image.to_dict() for image in images], "total": len(images)}
+
+
+@pins_bp.route("/missing", methods=["GET"])
+@auth_required(require_push=True)
+async def list_missing():
+    """List pinned images whose manifest or layers should be warmed."""
+    pins = get_pins()
+    if pins is None:
+        return _disabled()
+    missing = sorted(pins.missing(), key=lambda image: image.reference)
+    return {"images": [image.to_dict() for image in missing], "total": len(missing)}
+
+
+@pins_bp.route("", methods=["POST"])
+@admin_required
+async def add_pin():
+    """Pin an image reference, e.g. ``{"reference": "ghcr.io/org/app:1.2"}``."""
+    pins = get_pins()
+    if pins is None:
+        return _disabled()
+    data = await request.get_json(silent=True) or {}
+    reference = str(data.get("reference", "")).strip()
+    if not reference:
+        return {"error": "reference is required"}, 400
+    image = await pins.pin(reference)
+    return image.to_dict(), 201
+
+
+@pins_bp.route("", methods=["DELETE"])
+@admin_required
+async def remove_pin():
+    """Remove a manual pin given as the ``reference`` query parameter."""
+    pins = get_pins()
+    if pins is None:
+        return _disabled()
+    if not await pins.unpin(request.args.get("reference", "")):
+        return {"error": "not pinned manually"}, 404
+    return {"deleted": True}
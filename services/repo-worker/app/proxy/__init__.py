@@ -1,6 +1,6 @@
 """Pull-through proxy implementation."""
 
-from app.proxy.proxy import ProxyHandler
+from app.proxy.proxy import ProxyHandler, get_proxy, set_proxy
 from app.proxy.upstream import UpstreamRegistry
 
-__all__ = ["ProxyHandler", "UpstreamRegistry"]
+__all__ = ["ProxyHandler", "UpstreamRegistry", "get_proxy", "set_proxy"]
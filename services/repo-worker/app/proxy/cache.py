@@ -8,6 +8,7 @@ Implements stale-while-revalidate caching strategy:
 import asyncio
 import logging
 import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Optional
 
@@ -19,49 +20,83 @@ logger = logging.getLogger(__name__)
 
 @dataclass
 class CacheEntry:
-    """Cached manifest entry metadata."""
+    """Cached manifest entry: content and metadata stored together."""
     digest: str
     mutable: bool
     last_check: float  # Unix timestamp
     last_updated: float  # Unix timestamp
+    content_type: str = ""
+    content: bytes = b""
+
+    def to_meta(self) -> dict[str, str]:
+        """Serialize metadata for S3 user metadata (string values only)."""
+        return {
+            "digest": self.digest,
+            "mutable": "true" if self.mutable else "false",
+            "last-check": repr(self.last_check),
+            "last-updated": repr(self.last_updated),
+        }
+
+    @classmethod
+    def from_stored(cls, content: bytes, content_type: str, meta: dict) -> "CacheEntry":
+        """Build an entry from a stored object and its user metadata."""
+        return cls(
+            digest=meta.get("digest", ""),
+            mutable=meta.get("mutable", "false") == "true",
+            last_check=float(meta.get("last-check", 0)),
+            last_updated=float(meta.get("last-updated", 0)),
+            content_type=content_type,
+            content=content,
+        )
 
 
 class CacheManager:
-    """Manages caching for pull-through proxy."""
+    """Manages caching for pull-through proxy.
+
+    Each proxied manifest is stored as a single object holding the manifest
+    bytes with digest, mutability and check timestamps as object metadata,
+    so a cache hit costs at most one S3 read. Recently used entries are also
+    kept in a bounded in-memory LRU, making repeat hits free.
+    """
 
     def __init__(self, storage: S3Storage, config: Config):
         self.storage = storage
         self.config = config
         self._revalidation_tasks: dict[str, asyncio.Task] = {}
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
 
     def _cache_key(self, upstream: str, name: str, tag: str) -> str:
         """Generate cache key for a proxied image."""
         return f"{upstream}/{name}:{tag}"
 
-    async def get_cached_manifest(
-        self, upstream: str, name: str, tag: str
-    ) -> Optional[tuple[bytes, str]]:
-        """Get cached manifest if available.
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        """Hold an entry in the in-memory LRU, evicting the oldest."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.cache.memory_entries:
+            self._entries.popitem(last=False)
+
+    async def get_entry(
+        self, upstream: str, name: str, reference: str
+    ) -> Optional[CacheEntry]:
+        """Get a cached manifest entry (memory first, then one S3 read).
 
         Returns:
-            (content, digest) if cached, None otherwise
+            CacheEntry with content if cached, None otherwise
         """
-        result = await self.storage.get_manifest(f"_proxy/{upstream}/{name}", tag)
-        return result
+        key = self._cache_key(upstream, name, reference)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
 
-    async def get_cache_meta(
-        self, upstream: str, name: str, tag: str
-    ) -> Optional[CacheEntry]:
-        """Get cache metadata for a proxied image."""
-        meta = await self.storage.get_cache_meta(upstream, name, tag)
-        if meta:
-            return CacheEntry(
-                digest=meta.get("digest", ""),
-                mutable=meta.get("mutable", False),
-                last_check=meta.get("last_check", 0),
-                last_updated=meta.get("last_updated", 0),
-            )
-        return None
+        stored = await self.storage.get_cache_entry(upstream, name, reference)
+        if stored is None:
+            return None
+
+        entry = CacheEntry.from_stored(*stored)
+        self._remember(key, entry)
+        return entry
 
     async def put_cached_manifest(
         self,
@@ -70,35 +105,33 @@ class CacheManager:
         tag: str,
         content: bytes,
         digest: str,
+        content_type: str = "",
     ) -> None:
         """Cache a manifest."""
-        # Store manifest
-        repo_name = f"_proxy/{upstream}/{name}"
-        await self.storage.put_manifest(repo_name, tag, content)
-
-        # Update cache metadata
-        is_mutable = self.config.is_mutable_tag(tag)
         now = time.time()
-        await self.storage.put_cache_meta(
-            upstream,
-            name,
-            tag,
-            {
-                "digest": digest,
-                "mutable": is_mutable,
-                "last_check": now,
-                "last_updated": now,
-            },
+        entry = CacheEntry(
+            digest=digest,
+            mutable=self.config.is_mutable_tag(tag),
+            last_check=now,
+            last_updated=now,
+            content_type=content_type,
+            content=content,
+        )
+        await self.storage.put_cache_entry(
+            upstream, name, tag, content, content_type, entry.to_meta()
         )
+        self._remember(self._cache_key(upstream, name, tag), entry)
 
     async def update_cache_check(
         self, upstream: str, name: str, tag: str
     ) -> None:
         """Update the last_check timestamp for a cache entry."""
-        meta = await self.storage.get_cache_meta(upstream, name, tag)
-        if meta:
-            meta["last_check"] = time.time()
-            await self.storage.put_cache_meta(upstream, name, tag, meta)
+        entry = await self.get_entry(upstream, name, tag)
+        if entry:
+            entry.last_check = time.time()
+            await self.storage.update_cache_entry_meta(
+                upstream, name, tag, entry.content_type, entry.to_meta()
+            )
 
     def should_revalidate(self, cache_entry: CacheEntry) -> bool:
         """Check if a cache entry should be revalidated.
@@ -141,6 +174,16 @@ class CacheManager:
         task = asyncio.create_task(self._revalidate_wrapper(key, revalidate_coro))
         self._revalidation_tasks[key] = task
 
+    def start_prefetch(self, digest: str, prefetch_coro) -> None:
+        """Start async blob prefetch task unless one is already running."""
+        key = f"blob/{digest}"
+        task = self._revalidation_tasks.get(key)
+        if task is not None and not task.done():
+            return
+
+        task = asyncio.create_task(self._revalidate_wrapper(key, prefetch_coro))
+        self._revalidation_tasks[key] = task
+
     async def _revalidate_wrapper(self, key: str, coro) -> None:
         """Wrapper for revalidation that handles cleanup."""
         try:
@@ -169,3 +212,7 @@ class CacheManager:
     async def blob_exists(self, digest: str) -> bool:
         """Check if blob is cached."""
         return await self.storage.blob_exists(digest)
+
+    async def get_blob_size(self, digest: str) -> Optional[int]:
+        """Get cached blob size, or None if not cached."""
+        return await self.storage.get_blob_size(digest)
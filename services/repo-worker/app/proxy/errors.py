@@ -0,0 +1,16 @@
+"""Exceptions raised by upstream registry clients."""
+
+
+class UpstreamError(Exception):
+    """Upstream request failed with a status other than 404."""
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or f"upstream returned HTTP {status}")
+        self.status = status
+
+
+class RateLimited(UpstreamError):
+    """Request was not sent because the upstream quota is exhausted."""
+
+    def __init__(self, message: str = "upstream rate limited"):
+        super().__init__(429, message)
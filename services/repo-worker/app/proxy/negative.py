@@ -0,0 +1,156 @@
+"""Negative cache for failed upstream lookups.
+
+Remembers upstream 404s, auth failures and throttling/server errors for a
+short, per-status-class TTL so crash-looping clients pulling a missing
+image don't hit the upstream (and its rate limit) on every retry.
+
+Entries live in a bounded in-process LRU. When a shared path is configured
+they are also written to a small SQLite database on local disk so that all
+worker processes on a node see the same entries.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import NegativeCacheConfig
+
+logger = logging.getLogger(__name__)
+
+# Purge expired rows from the shared database every N writes
+_PURGE_INTERVAL = 256
+
+
+def status_class(status: int) -> Optional[str]:
+    """Map an upstream HTTP status to a negative cache class.
+
+    Returns None for statuses that are not cached, i.e. anything but
+    404, 401/403, 429 and 5xx.
+    """
+    if status == 404:
+        return "not_found"
+    if status in (401, 403):
+        return "auth"
+    if status == 429 or 500 <= status <= 599:
+        return "throttled"
+    return None
+
+
+class NegativeCache:
+    """Bounded TTL cache of failed upstream lookups."""
+
+    def __init__(self, config: NegativeCacheConfig):
+        self.config = config
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._writes = 0
+        self._db: Optional[sqlite3.Connection] = None
+
+        if config.enabled and config.shared_path:
+            self._db = self._open_shared(config.shared_path)
+
+    @staticmethod
+    def _open_shared(path: str) -> Optional[sqlite3.Connection]:
+        """Open (and create) the node-local shared database."""
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=OFF")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS negative_cache ("
+                "key TEXT PRIMARY KEY, status INTEGER, expires_at REAL)"
+            )
+            return db
+        except sqlite3.Error as e:
+            logger.warning(f"Shared negative cache unavailable at {path}: {e}")
+            return None
+
+    def _key(self, upstream: str, name: str, reference: str) -> str:
+        """Generate cache key for an upstream lookup."""
+        return f"{upstream}/{name}@{reference}"
+
+    def _ttl(self, status: int) -> int:
+        """Get TTL in seconds for a status code."""
+        cls = status_class(status)
+        if cls == "not_found":
+            return self.config.not_found_ttl_seconds
+        if cls == "auth":
+            return self.config.auth_ttl_seconds
+        if cls == "throttled":
+            return self.config.throttled_ttl_seconds
+        return 0
+
+    def get(self, upstream: str, name: str, reference: str) -> Optional[int]:
+        """Get the cached failure status for a lookup, or None if not cached."""
+        if not self.config.enabled:
+            return None
+
+        key = self._key(upstream, name, reference)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            status, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return status
+            del self._entries[key]
+
+        if self._db is not None:
+            try:
+                row = self._db.execute(
+                    "SELECT status, expires_at FROM negative_cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.debug(f"Shared negative cache read failed: {e}")
+                return None
+            if row and row[1] > now:
+                self._remember(key, row[0], row[1])
+                return row[0]
+
+        return None
+
+    def put(self, upstream: str, name: str, reference: str, status: int) -> None:
+        """Record a failed upstream lookup."""
+        if not self.config.enabled:
+            return
+
+        ttl = self._ttl(status)
+        if ttl <= 0:
+            return
+
+        key = self._key(upstream, name, reference)
+        expires_at = time.time() + ttl
+        self._remember(key, status, expires_at)
+
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO negative_cache VALUES (?, ?, ?)",
+                    (key, status, expires_at),
+                )
+                self._writes += 1
+                if self._writes % _PURGE_INTERVAL == 0:
+                    self._purge_shared()
+            except sqlite3.Error as e:
+                logger.debug(f"Shared negative cache write failed: {e}")
+
+    def _remember(self, key: str, status: int, expires_at: float) -> None:
+        """Store an entry in the in-process LRU, evicting the oldest."""
+        self._entries[key] = (status, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+
+    def _purge_shared(self) -> None:
+        """Drop expired rows and cap the shared table size."""
+        self._db.execute("DELETE FROM negative_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            "DELETE FROM negative_cache WHERE key NOT IN ("
+            "SELECT key FROM negative_cache ORDER BY expires_at DESC LIMIT ?)",
+            (self.config.max_entries,),
+        )
@@ -0,0 +1,200 @@
+"""Peer cache cluster: one owner replica per blob digest.
+
+Replicas find each other from a static list or a DNS name (e.g. a headless
+Kubernetes service) and place themselves on a consistent-hash ring. Every
+proxied blob digest has exactly one owner on the ring:
+
+- The owner fetches the blob from the upstream and keeps it in its cache.
+- Any other replica that misses asks the owner first, over the internal
+  ``/internal/peers/blobs/<digest>`` route, and streams the body straight
+  through without storing it.
+
+Only the owner ever contacts the upstream for a digest, and each added
+replica adds cache capacity instead of another copy of the same layers.
+When the owner cannot be reached the replica falls back to the upstream
+itself, so a lost peer costs cache efficiency rather than availability.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import socket
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.config import PeerConfig
+from app.metrics import PEER_MEMBERS, PEER_REQUESTS
+from app.proxy.upstream import BlobInfo
+from app.tracing import client_trace_configs
+
+logger = logging.getLogger(__name__)
+
+# Marks requests sent by a peer so the owner never forwards them again
+PEER_HEADER = "X-Repo-Worker-Peer"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes.
+
+    Adding or removing one of N members only moves about 1/N of the keys.
+    """
+
+    def __init__(self, members: list[str], virtual_nodes: int = 100):
+        self.members = sorted(set(members))
+        points = [
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(virtual_nodes)
+        ]
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._owners = [m for _, m in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Get the member owning a key, or None for an empty ring."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+class PeerCluster:
+    """Membership, ownership and blob transfer between repo-worker replicas."""
+
+    def __init__(self, config: PeerConfig):
+        self.config = config
+        self.self_url = config.self_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=config.timeout_seconds,
+            sock_read=config.timeout_seconds,
+        )
+        self.ring = HashRing([self.self_url], config.virtual_nodes)
+        self._session: Optional[aiohttp.ClientSession] = None
+        if config.peers:
+            self.set_members(config.peers)
+
+    def set_members(self, urls: list[str]) -> None:
+        """Rebuild the ring from peer base URLs (this replica is always on it)."""
+        members = {url.rstrip("/") for url in urls} | {self.self_url}
+        if set(self.ring.members) == members:
+            return
+        self.ring = HashRing(list(members), self.config.virtual_nodes)
+        PEER_MEMBERS.set(len(members))
+        logger.info(f"Peer ring has {len(members)} members: {sorted(members)}")
+
+    async def refresh(self) -> None:
+        """Re-resolve the peer DNS name into ring members."""
+        if not self.config.dns_name:
+            return
+        scheme = urlsplit(self.self_url).scheme or "http"
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                self.config.dns_name, self.config.port, type=socket.SOCK_STREAM
+            )
+        except OSError as e:
+            logger.warning(f"Peer discovery for {self.config.dns_name} failed: {e}")
+            return
+        urls = []
+        for family, _, _, _, sockaddr in infos:
+            host = f"[{sockaddr[0]}]" if family == socket.AF_INET6 else sockaddr[0]
+            urls.append(f"{scheme}://{host}:{self.config.port}")
+        if urls:
+            self.set_members(self.config.peers + urls)
+
+    async def refresh_loop(self) -> None:
+        """Keep DNS-discovered membership current."""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.config.refresh_seconds)
+
+    def owner(self, digest: str) -> Optional[str]:
+        """Get the peer owning a digest, or None if this replica owns it."""
+        owner = self.ring.owner(digest)
+        return None if owner == self.self_url else owner
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout, trace_configs=client_trace_configs()
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+
+    def _request(self, method: str, owner: str, upstream: str, image: str, digest: str):
+        return self._get_session().request(
+            method,
+            f"{owner}/internal/peers/blobs/{digest}",
+            params={"upstream": upstream, "image": image},
+            headers={PEER_HEADER: self.self_url},
+        )
+
+    async def head_blob(
+        self, owner: str, upstream: str, image: str, digest: str
+    ) -> tuple[bool, Optional[BlobInfo]]:
+        """Ask the owner for blob metadata.
+
+        Returns:
+            (answered, info): answered is False if the owner could not be
+            reached and the caller should go to the upstream itself
+        """
+        try:
+            async with self._request("HEAD", owner, upstream, image, digest) as resp:
+                if resp.status == 404:
+                    PEER_REQUESTS.labels("miss").inc()
+                    return True, None
+                resp.raise_for_status()
+                PEER_REQUESTS.labels("hit").inc()
+                return True, BlobInfo(digest=digest, size=resp.content_length or 0)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            PEER_REQUESTS.labels("error").inc()
+            logger.warning(f"Peer {owner} failed HEAD for {digest}: {e}")
+            return False, None
+
+    async def open_blob(
+        self, owner: str, upstream: str, image: str, digest: str
+    ) -> tuple[bool, Optional[tuple[int, AsyncIterator[bytes]]]]:
+        """Start streaming a blob from its owner.
+
+        Returns:
+            (answered, (size, chunks) or None): answered is False if the
+            owner could not be reached and the caller should go to the
+            upstream itself
+        """
+        try:
+            resp = await self._request("GET", owner, upstream, image, digest)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            PEER_REQUESTS.labels("error").inc()
+            logger.warning(f"Peer {owner} failed GET for {digest}: {e}")
+            return False, None
+
+        if resp.status == 404:
+            resp.release()
+            PEER_REQUESTS.labels("miss").inc()
+            return True, None
+        if resp.status != 200 or resp.content_length is None:
+            resp.release()
+            PEER_REQUESTS.labels("error").inc()
+            logger.warning(f"Peer {owner} returned HTTP {resp.status} for {digest}")
+            return False, None
+
+        PEER_REQUESTS.labels("hit").inc()
+        return True, (resp.content_length, self._stream(resp))
+
+    @staticmethod
+    async def _stream(resp: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in resp.content.iter_chunked(65536):
+                yield chunk
+        finally:
+            resp.release()
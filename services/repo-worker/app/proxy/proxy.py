@@ -7,15 +7,46 @@ images from upstream registries.
 import asyncio
 import json
 import logging
-from typing import Optional
+import os
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+from urllib.parse import urlparse
 
+import aiohttp
+
+from app.analytics.collector import record_lookup
+from app.bandwidth import iter_bytes
 from app.config import Config, UpstreamRegistry as UpstreamConfig
+from app.metrics import UPSTREAM_SUPPRESSED, record_proxy_lookup
 from app.proxy.cache import CacheManager
-from app.proxy.upstream import ManifestResult, RegistryAuth, UpstreamRegistry
+from app.proxy.errors import UpstreamError
+from app.proxy.negative import NegativeCache, status_class
+from app.proxy.peers import PeerCluster
+from app.proxy.scheduler import Priority, UpstreamScheduler
+from app.proxy.segmented import SegmentedDownloader
+from app.proxy.upstream import BlobInfo, ManifestResult, RegistryAuth, UpstreamRegistry
 from app.storage.s3 import S3Storage
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Hosts image references use for Docker Hub besides its registry URL
+_DOCKER_HUB_HOSTS = {"docker.io", "index.docker.io", "registry-1.docker.io"}
+
+# Global proxy handler instance (None when proxying is disabled)
+_proxy: Optional["ProxyHandler"] = None
+
+
+def get_proxy() -> Optional["ProxyHandler"]:
+    """Get the global proxy handler, or None if proxying is disabled."""
+    return _proxy
+
+
+def set_proxy(proxy: Optional["ProxyHandler"]) -> None:
+    """Set the global proxy handler."""
+    global _proxy
+    _proxy = proxy
+
 
 class ProxyHandler:
     """Handles pull-through proxy requests with stale-while-revalidate caching."""
@@ -24,16 +55,32 @@ class ProxyHandler:
         self.storage = storage
         self.config = config
         self.cache = CacheManager(storage, config)
+        self.negative_cache = NegativeCache(config.negative_cache)
+        self.segmented = SegmentedDownloader(storage, config.segmented_download)
         self._upstream_clients: dict[str, UpstreamRegistry] = {}
+        self._upstream_configs: dict[str, UpstreamConfig] = {}
+        self.upstream_config_version: Optional[str] = None
+        self._blob_fetches: dict[str, asyncio.Future] = {}
+
+        self.peers: Optional[PeerCluster] = None
+        if config.peers.enabled:
+            if config.peers.self_url:
+                self.peers = PeerCluster(config.peers)
+            else:
+                logger.warning("Peer cache enabled without self_url; running standalone")
 
         # Initialize built-in upstream clients
         for upstream_config in config.builtin_upstreams:
             self._register_upstream(upstream_config)
 
-    def _register_upstream(self, config: UpstreamConfig) -> None:
-        """Register an upstream registry client."""
-        import os
+    @property
+    def upstream_count(self) -> int:
+        """Number of configured upstream registries."""
+        return len(self._upstream_clients)
 
+    @staticmethod
+    def _build_auth(config: UpstreamConfig) -> RegistryAuth:
+        """Build upstream credentials from an upstream configuration."""
         auth = RegistryAuth(auth_type=config.auth_type)
 
         if config.auth_type == "basic":
@@ -41,17 +88,100 @@ class ProxyHandler:
             auth.password = config.password
         elif config.auth_type == "token":
             auth.token = config.token or os.getenv(config.token_env, "")
+        return auth
 
+    def _register_upstream(self, config: UpstreamConfig) -> None:
+        """Register an upstream registry client."""
+        self._upstream_configs[config.name] = config
         self._upstream_clients[config.name] = UpstreamRegistry(
             name=config.name,
             url=config.url,
-            auth=auth,
+            auth=self._build_auth(config),
+            scheduler=UpstreamScheduler(config.name, self.config.upstream_scheduler),
         )
 
+    def apply_upstreams(
+        self, configs: list[UpstreamConfig], version: Optional[str] = None
+    ) -> tuple[list[str], list[str], list[str]]:
+        """Replace the dynamically configured upstreams.
+
+        Built-in upstreams are always kept; an entry with the same name
+        overrides one. Unchanged upstreams keep their client, and with it
+        their token cache and scheduler state; a credentials change is
+        applied to the existing client, a URL change replaces it.
+
+        Returns:
+            Names of the (added, updated, removed) upstreams
+        """
+        desired = {upstream.name: upstream for upstream in self.config.builtin_upstreams}
+        desired.update({upstream.name: upstream for upstream in configs})
+
+        added, updated, removed = [], [], []
+        for name in list(self._upstream_configs):
+            if name not in desired:
+                del self._upstream_configs[name]
+                del self._upstream_clients[name]
+                removed.append(name)
+
+        for name, upstream in desired.items():
+            current = self._upstream_configs.get(name)
+            if current == upstream:
+                continue
+            if current is None or current.url.rstrip("/") != upstream.url.rstrip("/"):
+                self._register_upstream(upstream)
+            else:
+                client = self._upstream_clients[name]
+                client.reset_auth(self._build_auth(upstream))
+                self._upstream_configs[name] = upstream
+            (added if current is None else updated).append(name)
+
+        self.upstream_config_version = version
+        return added, updated, removed
+
     def get_upstream(self, name: str) -> Optional[UpstreamRegistry]:
         """Get upstream registry client by name."""
         return self._upstream_clients.get(name)
 
+    def upstream_for_host(self, host: str) -> Optional[str]:
+        """Get the name of the upstream served from a registry host, if any."""
+        if host in _DOCKER_HUB_HOSTS and "dockerhub" in self._upstream_clients:
+            return "dockerhub"
+        for name, client in self._upstream_clients.items():
+            if urlparse(client.url).netloc == host:
+                return name
+        return None
+
+    async def _call_upstream(
+        self,
+        upstream_name: str,
+        image_name: str,
+        reference: str,
+        call: Callable[[], Awaitable[Optional[T]]],
+    ) -> Optional[T]:
+        """Run an upstream lookup guarded by the negative cache.
+
+        Returns None without contacting the upstream if the same lookup
+        failed recently. Failures (None results and UpstreamError) are
+        recorded with a TTL based on their status class.
+        """
+        status = self.negative_cache.get(upstream_name, image_name, reference)
+        if status is not None:
+            UPSTREAM_SUPPRESSED.labels(upstream_name, status_class(status)).inc()
+            return None
+
+        try:
+            result = await call()
+        except UpstreamError as e:
+            logger.warning(
+                f"Upstream {upstream_name} failed for {image_name}@{reference}: {e}"
+            )
+            self.negative_cache.put(upstream_name, image_name, reference, e.status)
+            return None
+
+        if result is None:
+            self.negative_cache.put(upstream_name, image_name, reference, 404)
+        return result
+
     def parse_proxy_request(self, name: str) -> Optional[tuple[str, str]]:
         """Parse image name to extract upstream registry and image name.
 
@@ -94,34 +224,24 @@ class ProxyHandler:
             logger.error(f"Unknown upstream registry: {upstream_name}")
             return None
 
-        # For digest references, check cache and return if found
-        if reference.startswith("sha256:"):
-            cached = await self.cache.get_cached_manifest(
-                upstream_name, image_name, reference
-            )
-            if cached:
-                return cached
-
-            # Not cached, fetch from upstream
-            result = await upstream.get_manifest(image_name, reference)
-            if result:
-                await self.cache.put_cached_manifest(
-                    upstream_name, image_name, reference, result.content, result.digest
-                )
-                return result.content, result.digest
-            return None
+        # Single read: memory, or one S3 object holding manifest and metadata
+        entry = await self.cache.get_entry(upstream_name, image_name, reference)
 
-        # For tag references, use stale-while-revalidate
-        cache_meta = await self.cache.get_cache_meta(
-            upstream_name, image_name, reference
-        )
-        cached = await self.cache.get_cached_manifest(
-            upstream_name, image_name, reference
-        )
+        if entry:
+            record_proxy_lookup("manifest", hit=True, size=len(entry.content))
+            record_lookup(upstream_name, image_name, "manifest", True, len(entry.content))
 
-        if cached and cache_meta:
-            # Cache hit - serve immediately
-            if self.cache.should_revalidate(cache_meta):
+        # Digest references are immutable - serve from cache if present
+        if entry and reference.startswith("sha256:"):
+            return entry.content, entry.digest
+
+        if entry:
+            # Cache hit - serve immediately. While the upstream quota is low
+            # stale mutable tags are served without revalidating.
+            if (
+                self.cache.should_revalidate(entry)
+                and not upstream.scheduler.quota_low()
+            ):
                 # Start async revalidation for mutable tags
                 if not self.cache.is_revalidating(upstream_name, image_name, reference):
                     self.cache.start_revalidation(
@@ -129,17 +249,24 @@ class ProxyHandler:
                         image_name,
                         reference,
                         self._revalidate(
-                            upstream, upstream_name, image_name, reference, cache_meta.digest
+                            upstream, upstream_name, image_name, reference, entry.digest
                         ),
                     )
 
-            return cached
+            return entry.content, entry.digest
 
         # Cache miss - fetch from upstream
-        result = await upstream.get_manifest(image_name, reference)
+        result = await self._call_upstream(
+            upstream_name, image_name, reference,
+            lambda: upstream.get_manifest(image_name, reference),
+        )
+        size = len(result.content) if result else 0
+        record_proxy_lookup("manifest", hit=False, size=size)
+        record_lookup(upstream_name, image_name, "manifest", False, size)
         if result:
             await self.cache.put_cached_manifest(
-                upstream_name, image_name, reference, result.content, result.digest
+                upstream_name, image_name, reference,
+                result.content, result.digest, result.content_type,
             )
             return result.content, result.digest
 
@@ -170,10 +297,13 @@ class ProxyHandler:
                     f"(old: {cached_digest[:12]}, new: {current_digest[:12]})"
                 )
 
-                result = await upstream.get_manifest(image_name, tag)
+                result = await upstream.get_manifest(
+                    image_name, tag, priority=Priority.BACKGROUND
+                )
                 if result:
                     await self.cache.put_cached_manifest(
-                        upstream_name, image_name, tag, result.content, result.digest
+                        upstream_name, image_name, tag,
+                        result.content, result.digest, result.content_type,
                     )
 
                     # Also cache any new blobs referenced by the manifest
@@ -199,34 +329,37 @@ class ProxyHandler:
         try:
             manifest = json.loads(manifest_content)
 
-            # Collect all blob digests from manifest
-            digests = []
+            # Collect all blob descriptors from manifest
+            descriptors = []
 
             # Config blob
             if "config" in manifest:
-                digests.append(manifest["config"].get("digest"))
+                descriptors.append(manifest["config"])
 
             # Layer blobs
-            for layer in manifest.get("layers", []):
-                digests.append(layer.get("digest"))
+            descriptors.extend(manifest.get("layers", []))
 
             # For manifest lists, we'd recurse into each platform manifest
             # but that's handled when those are requested
 
             # Filter out already cached blobs
-            to_fetch = []
-            for digest in digests:
-                if digest and not await self.cache.blob_exists(digest):
-                    to_fetch.append(digest)
-
-            # Fetch missing blobs in parallel (limited concurrency)
-            semaphore = asyncio.Semaphore(5)
-
+            sizes = {
+                d["digest"]: d["size"]
+                for d in descriptors
+                if d.get("digest") and isinstance(d.get("size"), int)
+            }
+            cached = await asyncio.gather(*[self.cache.blob_exists(d) for d in sizes])
+            to_fetch = [d for d, exists in zip(sizes, cached) if not exists]
+
+            # Stream missing blobs into storage in parallel; each holds at
+            # most one upload part in memory, the upstream scheduler bounds
+            # how many stream at once and the storage limiter bounds S3 writes
             async def fetch_blob(digest: str):
-                async with semaphore:
-                    content = await upstream.get_blob(image_name, digest)
-                    if content:
-                        await self.cache.put_cached_blob(digest, content)
+                await self.storage.put_blob_stream(
+                    digest,
+                    upstream.stream_blob(image_name, digest, priority=Priority.BACKGROUND),
+                    sizes[digest],
+                )
 
             await asyncio.gather(
                 *[fetch_blob(d) for d in to_fetch],
@@ -241,44 +374,213 @@ class ProxyHandler:
     ) -> Optional[bytes]:
         """Get blob from upstream with caching.
 
-        Blobs are content-addressable and cached forever.
+        Blobs are content-addressable and cached forever. Concurrent misses
+        for the same digest share a single upstream fetch.
         """
         # Check cache first
         cached = await self.cache.get_cached_blob(digest)
         if cached:
             return cached
 
-        # Fetch from upstream
+        fetched = await self._fetch_shared(upstream_name, image_name, digest)
+        if fetched is None:
+            return None
+        size, content = fetched
+        if content is None:
+            # Streamed into storage by a segmented download
+            return await self.cache.get_cached_blob(digest)
+        return content
+
+    async def cache_blob(self, upstream_name: str, image_name: str, digest: str) -> bool:
+        """Fetch a blob into the cache without holding it in memory.
+
+        Returns:
+            True if the blob is now cached
+        """
+        return await self._fetch_shared(upstream_name, image_name, digest, buffer=False) is not None
+
+    async def _fetch_shared(
+        self, upstream_name: str, image_name: str, digest: str, buffer: bool = True
+    ) -> Optional[tuple[int, Optional[bytes]]]:
+        """Fetch a blob into the cache; concurrent misses share one fetch."""
         upstream = self.get_upstream(upstream_name)
         if not upstream:
             return None
 
-        content = await upstream.get_blob(image_name, digest)
-        if content:
-            await self.cache.put_cached_blob(digest, content)
-            return content
+        fetch = self._blob_fetches.get(digest)
+        if fetch is None:
+            fetch = asyncio.ensure_future(
+                self._fetch_blob(upstream, upstream_name, image_name, digest, buffer)
+            )
+            self._blob_fetches[digest] = fetch
+            fetch.add_done_callback(lambda _: self._blob_fetches.pop(digest, None))
+        return await asyncio.shield(fetch)
+
+    async def _fetch_blob(
+        self,
+        upstream: UpstreamRegistry,
+        upstream_name: str,
+        image_name: str,
+        digest: str,
+        buffer: bool = True,
+    ) -> Optional[tuple[int, Optional[bytes]]]:
+        """Fetch a blob from the upstream into the cache.
+
+        Blobs above the segmented threshold, and every blob unless
+        ``buffer`` is set, go straight into storage; if the segmented
+        download fails (e.g. the upstream ignores Range), they are
+        streamed into storage over a single request instead.
+
+        Returns:
+            (size, content) with content None if the blob was stored
+            without holding it in memory, or None if the blob is
+            unavailable or did not match its digest
+        """
+        try:
+            if self.segmented.config.enabled or not buffer:
+                info = await self._call_upstream(
+                    upstream_name, image_name, digest,
+                    lambda: upstream.head_blob(image_name, digest),
+                )
+                if info is None:
+                    return None
+                segment = self.segmented.should_segment(info.size)
+                if segment and await self._download_segmented(
+                    upstream, image_name, digest, info.size
+                ):
+                    return info.size, None
+                if segment or not buffer:
+                    stored = await self._call_upstream(
+                        upstream_name, image_name, digest,
+                        lambda: self._stream_into_cache(upstream, image_name, digest, info.size),
+                    )
+                    return (info.size, None) if stored else None
+
+            content = await self._call_upstream(
+                upstream_name, image_name, digest,
+                lambda: upstream.get_blob(image_name, digest),
+            )
+            if content:
+                await self.cache.put_cached_blob(digest, content)
+                return len(content), content
+        except ValueError as e:
+            # Upstream sent content that does not match the digest
+            logger.error(f"Discarded {digest} from {upstream_name}/{image_name}: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Fetching {digest} from {upstream_name}/{image_name} failed: {e}")
 
         return None
 
-    async def blob_exists(
-        self, upstream_name: str, image_name: str, digest: str
+    async def _download_segmented(
+        self, upstream: UpstreamRegistry, image_name: str, digest: str, size: int
     ) -> bool:
-        """Check if blob exists in cache or upstream."""
+        """Try a segmented download, returning False if it did not store the blob."""
+        try:
+            return await self.segmented.download(upstream, image_name, digest, size)
+        except (UpstreamError, ValueError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(
+                f"Segmented download of {digest[:19]} from {upstream.name} failed, "
+                f"falling back to a single stream: {e}"
+            )
+            return False
+
+    async def _stream_into_cache(
+        self, upstream: UpstreamRegistry, image_name: str, digest: str, size: int
+    ) -> bool:
+        """Stream a blob from the upstream into storage without buffering it."""
+        await self.storage.put_blob_stream(
+            digest, upstream.stream_blob(image_name, digest), size
+        )
+        return True
+
+    async def open_blob(
+        self, upstream_name: str, image_name: str, digest: str, forward: bool = True
+    ) -> Optional[tuple[int, AsyncIterator[bytes], str]]:
+        """Get a blob missing from the local cache as a stream.
+
+        With a peer cluster, blobs owned by another replica are streamed
+        from that replica (which fetches and caches them) and not stored
+        here. Otherwise, or if the owner is unreachable or ``forward`` is
+        False (a peer asking), the blob is fetched from the upstream into
+        this replica's cache.
+
+        Returns:
+            (size, chunks, source) with source "peer" or "upstream", or
+            None if the blob does not exist
+        """
+        owner = self.peers.owner(digest) if self.peers and forward else None
+        if owner is not None:
+            answered, result = await self.peers.open_blob(
+                owner, upstream_name, image_name, digest
+            )
+            if answered:
+                if result is None:
+                    return None
+                size, chunks = result
+                return size, chunks, "peer"
+
+        fetched = await self._fetch_shared(upstream_name, image_name, digest)
+        if fetched is None:
+            return None
+        size, content = fetched
+        if content is None:
+            # Large blobs were streamed into storage; stream them back out
+            return size, self.storage.get_blob_stream(digest), "upstream"
+        return size, iter_bytes(content), "upstream"
+
+    async def blob_info(
+        self, upstream_name: str, image_name: str, digest: str, forward: bool = True
+    ) -> Optional[BlobInfo]:
+        """Get blob size and digest from cache or upstream without fetching it.
+
+        Answers HEAD requests from metadata only. If prefetch_on_head is
+        enabled, the blob body is pulled into the cache in the background.
+        Unless ``forward`` is False (a peer asking), digests owned by
+        another replica are looked up on that replica.
+        """
         # Check cache first
-        if await self.cache.blob_exists(digest):
-            return True
+        size = await self.cache.get_blob_size(digest)
+        if size is not None:
+            return BlobInfo(digest=digest, size=size)
+
+        owner = self.peers.owner(digest) if self.peers and forward else None
+        if owner is not None:
+            answered, info = await self.peers.head_blob(
+                owner, upstream_name, image_name, digest
+            )
+            if answered:
+                return info
 
         # Check upstream
         upstream = self.get_upstream(upstream_name)
         if not upstream:
-            return False
+            return None
+
+        info = await self._call_upstream(
+            upstream_name, image_name, digest,
+            lambda: upstream.head_blob(image_name, digest),
+        )
+        if info and self.config.cache.prefetch_on_head:
+            self.cache.start_prefetch(
+                digest, self._prefetch_blob(upstream, image_name, digest)
+            )
+        return info
+
+    async def blob_exists(
+        self, upstream_name: str, image_name: str, digest: str
+    ) -> bool:
+        """Check if blob exists in cache or upstream."""
+        return await self.blob_info(upstream_name, image_name, digest) is not None
 
-        # For existence check, we just try to get the blob
-        # A proper implementation would use HEAD request
-        content = await upstream.get_blob(image_name, digest)
+    async def _prefetch_blob(
+        self, upstream: UpstreamRegistry, image_name: str, digest: str
+    ) -> None:
+        """Fetch a blob into the cache ahead of the client's GET."""
+        if await self.cache.blob_exists(digest):
+            return
+        content = await upstream.get_blob(
+            image_name, digest, priority=Priority.BACKGROUND
+        )
         if content:
-            # Cache it since we fetched it
             await self.cache.put_cached_blob(digest, content)
-            return True
 
-        return False
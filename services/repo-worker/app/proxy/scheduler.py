@@ -0,0 +1,179 @@
+"""Rate-limit-aware request scheduler for upstream registries.
+
+Tracks the pull quota an upstream reports through its ``RateLimit-Limit``
+and ``RateLimit-Remaining`` headers (Docker Hub style, e.g. ``100;w=21600``)
+and orders requests by priority:
+
+- MANIFEST: foreground manifest fetches (a client is waiting)
+- BLOB: foreground blob fetches
+- BACKGROUND: prefetch and stale-while-revalidate checks
+
+429 responses block the upstream until ``Retry-After`` (or an exponential
+backoff when the header is missing). Background work is refused outright
+while the upstream is blocked or its remaining quota is low, so the quota
+that is left goes to clients and stale mutable tags keep being served.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import AsyncIterator, Mapping, Optional
+
+from app.config import UpstreamSchedulerConfig
+from app.metrics import (
+    UPSTREAM_QUEUE_DEPTH,
+    UPSTREAM_QUOTA_LIMIT,
+    UPSTREAM_QUOTA_REMAINING,
+    UPSTREAM_THROTTLED,
+)
+from app.proxy.errors import RateLimited
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Upstream request priority (lower value is served first)."""
+    MANIFEST = 0
+    BLOB = 1
+    BACKGROUND = 2
+
+
+def _parse_quota(value: Optional[str]) -> Optional[int]:
+    """Parse a RateLimit header value like ``100;w=21600``."""
+    if not value:
+        return None
+    try:
+        return int(value.split(";", 1)[0].strip())
+    except ValueError:
+        return None
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse Retry-After as delta-seconds or HTTP-date into seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class UpstreamScheduler:
+    """Priority scheduler and quota tracker for a single upstream credential."""
+
+    def __init__(self, upstream: str, config: UpstreamSchedulerConfig):
+        self.upstream = upstream
+        self.config = config
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.blocked_until = 0.0
+        self._backoff = 0.0
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    # =========================================================================
+    # Quota tracking
+    # =========================================================================
+
+    def observe(self, status: int, headers: Mapping[str, str]) -> None:
+        """Update quota state from an upstream registry response."""
+        limit = _parse_quota(headers.get("RateLimit-Limit"))
+        remaining = _parse_quota(headers.get("RateLimit-Remaining"))
+        if limit is not None:
+            self.limit = limit
+            UPSTREAM_QUOTA_LIMIT.labels(self.upstream).set(limit)
+        if remaining is not None:
+            self.remaining = remaining
+            UPSTREAM_QUOTA_REMAINING.labels(self.upstream).set(remaining)
+
+        if status == 429:
+            retry_after = _parse_retry_after(headers.get("Retry-After"))
+            if retry_after is None:
+                # No hint from upstream: back off exponentially
+                self._backoff = min(
+                    max(self._backoff * 2, 1.0), self.config.max_backoff_seconds
+                )
+                retry_after = self._backoff
+            self.blocked_until = max(self.blocked_until, time.time() + retry_after)
+            UPSTREAM_THROTTLED.labels(self.upstream).inc()
+            logger.warning(
+                f"Upstream {self.upstream} rate limited, backing off {retry_after:.0f}s"
+            )
+        elif status < 500:
+            self._backoff = 0.0
+
+    def quota_low(self) -> bool:
+        """Check if the upstream is blocked or nearly out of quota."""
+        if self.blocked_until > time.time():
+            return True
+        return (
+            self.remaining is not None
+            and self.remaining <= self.config.low_quota_threshold
+        )
+
+    # =========================================================================
+    # Scheduling
+    # =========================================================================
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority) -> AsyncIterator[None]:
+        """Acquire a request slot, honouring priority and rate-limit backoff.
+
+        Raises:
+            RateLimited: Background work while quota is low, or foreground
+                work that would wait longer than max_wait_seconds.
+        """
+        if priority == Priority.BACKGROUND and self.quota_low():
+            raise RateLimited("deferring background request, upstream quota low")
+
+        await self._acquire(priority)
+        try:
+            wait = self.blocked_until - time.time()
+            if wait > 0:
+                if wait > self.config.max_wait_seconds:
+                    raise RateLimited(f"upstream blocked for {wait:.0f}s")
+                await asyncio.sleep(wait)
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: Priority) -> None:
+        """Wait for a free concurrency slot in priority order."""
+        if self._active < self.config.max_concurrent and not self._waiters:
+            self._active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        UPSTREAM_QUEUE_DEPTH.labels(self.upstream).set(len(self._waiters))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed to us just as we were cancelled
+                self._release()
+            else:
+                self._waiters = [w for w in self._waiters if w[2] is not future]
+                heapq.heapify(self._waiters)
+            raise
+        finally:
+            UPSTREAM_QUEUE_DEPTH.labels(self.upstream).set(len(self._waiters))
+
+    def _release(self) -> None:
+        """Hand the slot to the highest-priority waiter or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
@@ -0,0 +1,146 @@
+"""Segmented (parallel ranged) downloads of large upstream blobs.
+
+Large layers are split into fixed-size segments fetched concurrently with
+HTTP Range requests against the upstream (or its redirect target). Each
+segment is written straight into an S3 multipart upload as one part while
+the overall sha256 is computed incrementally in segment order. The upload
+is only completed when the digest matches, so a corrupt download never
+becomes visible as a blob.
+
+A failed segment is retried on its own (re-resolving the redirect target
+if it has expired) instead of restarting the whole layer. Memory use is
+bounded to roughly ``concurrency * segment_size``.
+"""
+
+import asyncio
+import hashlib
+import logging
+
+import aiohttp
+
+from app.config import SegmentedDownloadConfig
+from app.proxy.errors import UpstreamError
+from app.proxy.upstream import UpstreamRegistry
+from app.storage.s3 import S3Storage
+
+logger = logging.getLogger(__name__)
+
+# S3 multipart uploads require every part but the last to be >= 5 MiB
+_MIN_SEGMENT_SIZE = 5 * 1024 * 1024
+
+
+class SegmentedDownloader:
+    """Downloads large upstream blobs into storage with parallel ranges."""
+
+    def __init__(self, storage: S3Storage, config: SegmentedDownloadConfig):
+        self.storage = storage
+        self.config = config
+        self.segment_size = max(config.segment_size_mb * 1024 * 1024, _MIN_SEGMENT_SIZE)
+
+    def should_segment(self, size: int) -> bool:
+        """Check if a blob is large enough for a segmented download."""
+        return self.config.enabled and size >= self.config.threshold_mb * 1024 * 1024
+
+    async def download(
+        self, upstream: UpstreamRegistry, image_name: str, digest: str, size: int
+    ) -> bool:
+        """Download a blob into storage using parallel ranged requests.
+
+        Returns:
+            True if the blob was stored, False if upstream does not have it
+
+        Raises:
+            ValueError: If the downloaded content does not match the digest
+            UpstreamError: If a segment still fails after all retries
+        """
+        location = await upstream.resolve_blob_location(image_name, digest)
+        if location is None:
+            return False
+
+        segments = [
+            (start, min(start + self.segment_size, size) - 1)
+            for start in range(0, size, self.segment_size)
+        ]
+        logger.info(
+            f"Segmented download of {digest[:19]} from {upstream.name}: "
+            f"{size} bytes in {len(segments)} segments"
+        )
+
+        upload_id = await self.storage.start_blob_upload(digest)
+        state = {"location": location}
+        hasher = hashlib.sha256()
+        hashed = [asyncio.Event() for _ in segments]
+        parts: list[tuple[int, str]] = []
+        slots = asyncio.Semaphore(self.config.concurrency)
+
+        async def transfer(index: int, start: int, end: int) -> None:
+            try:
+                data = await self._fetch_segment(
+                    upstream, image_name, digest, state, start, end
+                )
+                # Hash strictly in order; earlier segments hold their slots
+                # until hashed, so this never waits on an unscheduled segment
+                if index > 0:
+                    await hashed[index - 1].wait()
+                hasher.update(data)
+                hashed[index].set()
+
+                etag = await self.storage.put_blob_part(digest, upload_id, index + 1, data)
+                parts.append((index + 1, etag))
+            finally:
+                slots.release()
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for index, (start, end) in enumerate(segments):
+                    await slots.acquire()
+                    group.create_task(transfer(index, start, end))
+
+            computed = f"sha256:{hasher.hexdigest()}"
+            if computed != digest:
+                raise ValueError(f"Digest mismatch: expected {digest}, got {computed}")
+
+            await self.storage.complete_blob_upload(digest, upload_id, parts)
+            return True
+        except BaseException as e:
+            await self.storage.abort_blob_upload(digest, upload_id)
+            if isinstance(e, BaseExceptionGroup):
+                # Surface the first segment failure rather than the group
+                raise e.exceptions[0] from e
+            raise
+
+    async def _fetch_segment(
+        self,
+        upstream: UpstreamRegistry,
+        image_name: str,
+        digest: str,
+        state: dict,
+        start: int,
+        end: int,
+    ) -> bytes:
+        """Fetch one segment, retrying only this range on failure."""
+        expected = end - start + 1
+
+        for attempt in range(self.config.max_retries + 1):
+            try:
+                data = await upstream.get_blob_range(state["location"], start, end)
+                if len(data) != expected:
+                    raise UpstreamError(
+                        206, f"short segment: expected {expected}, got {len(data)}"
+                    )
+                return data
+            except (aiohttp.ClientError, asyncio.TimeoutError, UpstreamError) as e:
+                if attempt >= self.config.max_retries:
+                    raise
+                logger.warning(
+                    f"Segment {start}-{end} of {digest[:19]} failed "
+                    f"(attempt {attempt + 1}): {e}"
+                )
+                if isinstance(e, UpstreamError) and e.status in (401, 403):
+                    # Signed redirect targets expire; resolve a fresh one
+                    location = await upstream.resolve_blob_location(image_name, digest)
+                    if location is not None:
+                        state["location"] = location
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+        raise UpstreamError(502, f"segment {start}-{end} failed")
@@ -7,12 +7,20 @@ with support for various authentication methods.
 import asyncio
 import base64
 import logging
+import time
 from dataclasses import dataclass
 from typing import AsyncIterator, Optional
 
 import aiohttp
+import yarl
 from aiohttp_retry import ExponentialRetry, RetryClient
 
+from app.config import UpstreamSchedulerConfig
+from app.metrics import upstream_trace_config
+from app.proxy.errors import UpstreamError
+from app.proxy.scheduler import Priority, UpstreamScheduler
+from app.tracing import client_trace_configs, trace_methods
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +41,15 @@ class ManifestResult:
     content_type: str
 
 
+@dataclass
+class BlobInfo:
+    """Blob metadata returned by an upstream HEAD request."""
+    digest: str
+    size: int
+    content_type: str = "application/octet-stream"
+
+
+@trace_methods("upstream", lambda self: {"upstream.name": self.name})
 class UpstreamRegistry:
     """Client for interacting with upstream Docker registries."""
 
@@ -42,12 +59,20 @@ class UpstreamRegistry:
         url: str,
         auth: Optional[RegistryAuth] = None,
         timeout: int = 30,
+        scheduler: Optional[UpstreamScheduler] = None,
     ):
         self.name = name
         self.url = url.rstrip("/")
         self.auth = auth or RegistryAuth()
+        self.scheduler = scheduler or UpstreamScheduler(name, UpstreamSchedulerConfig())
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self._token_cache: dict[str, tuple[str, float]] = {}
+        self._trace_config = upstream_trace_config(name)
+
+    def reset_auth(self, auth: RegistryAuth) -> None:
+        """Switch to new credentials, dropping tokens exchanged with the old."""
+        self.auth = auth
+        self._token_cache.clear()
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Create an aiohttp session with retry logic."""
@@ -56,6 +81,7 @@ class UpstreamRegistry:
         session = aiohttp.ClientSession(
             timeout=self.timeout,
             connector=connector,
+            trace_configs=[self._trace_config, *client_trace_configs()],
         )
         return session
 
@@ -82,12 +108,43 @@ class UpstreamRegistry:
         # We need to handle the token exchange flow
         return None
 
-    async def _handle_auth_challenge(
+    async def _pull_auth_headers(
+        self, session: aiohttp.ClientSession, name: str
+    ) -> dict[str, str]:
+        """Get auth headers for a pull, preferring a cached bearer token."""
+        headers = {}
+        token = self._get_cached_token(f"repository:{name}:pull")
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        else:
+            auth_header = await self._get_auth_header(session)
+            if auth_header:
+                headers["Authorization"] = auth_header
+        return headers
+
+    @staticmethod
+    def _raise_for_status(status: int) -> None:
+        """Raise UpstreamError for any failure other than a plain not-found."""
+        if status != 404:
+            raise UpstreamError(status)
+
+    def _get_cached_token(self, scope: str) -> Optional[str]:
+        """Get a previously exchanged bearer token for a scope if still valid."""
+        cached = self._token_cache.get(scope)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        return None
+
+    async def exchange_token(
         self,
         session: aiohttp.ClientSession,
         www_authenticate: str,
     ) -> Optional[str]:
-        """Handle WWW-Authenticate challenge and get token."""
+        """Answer a WWW-Authenticate bearer challenge with a token.
+
+        Uses this registry's credentials against the challenge's realm and
+        caches the token for its scope.
+        """
         # Parse WWW-Authenticate header
         # Format: Bearer realm="...",service="...",scope="..."
         if not www_authenticate.lower().startswith("bearer "):
@@ -123,13 +180,22 @@ class UpstreamRegistry:
             async with session.get(token_url, headers=headers) as resp:
                 if resp.status == 200:
                     data = await resp.json()
-                    return data.get("token") or data.get("access_token")
+                    token = data.get("token") or data.get("access_token")
+                    if token and scope:
+                        # Expire slightly early so we never send a stale token
+                        expires_in = int(data.get("expires_in", 60))
+                        self._token_cache[scope] = (
+                            token, time.time() + max(expires_in - 10, 0)
+                        )
+                    return token
         except Exception as e:
             logger.error(f"Failed to get auth token: {e}")
 
         return None
 
-    async def check_manifest(self, name: str, reference: str) -> Optional[str]:
+    async def check_manifest(
+        self, name: str, reference: str, priority: Priority = Priority.BACKGROUND
+    ) -> Optional[str]:
         """Check if manifest exists and return its digest.
 
         Args:
@@ -141,7 +207,7 @@ class UpstreamRegistry:
         """
         url = f"{self.url}/v2/{name}/manifests/{reference}"
 
-        async with await self._get_session() as session:
+        async with self.scheduler.slot(priority), await self._get_session() as session:
             headers = {
                 "Accept": (
                     "application/vnd.docker.distribution.manifest.v2+json, "
@@ -153,24 +219,30 @@ class UpstreamRegistry:
 
             # First attempt
             async with session.head(url, headers=headers) as resp:
+                self.scheduler.observe(resp.status, resp.headers)
                 if resp.status == 401:
                     # Handle auth challenge
                     www_auth = resp.headers.get("WWW-Authenticate", "")
-                    token = await self._handle_auth_challenge(session, www_auth)
+                    token = await self.exchange_token(session, www_auth)
                     if token:
                         headers["Authorization"] = f"Bearer {token}"
                         async with session.head(url, headers=headers) as auth_resp:
+                            self.scheduler.observe(auth_resp.status, auth_resp.headers)
                             if auth_resp.status == 200:
                                 return auth_resp.headers.get("Docker-Content-Digest")
+                            self._raise_for_status(auth_resp.status)
                             return None
-                    return None
+                    raise UpstreamError(401, "authentication failed")
 
                 if resp.status == 200:
                     return resp.headers.get("Docker-Content-Digest")
 
+                self._raise_for_status(resp.status)
                 return None
 
-    async def get_manifest(self, name: str, reference: str) -> Optional[ManifestResult]:
+    async def get_manifest(
+        self, name: str, reference: str, priority: Priority = Priority.MANIFEST
+    ) -> Optional[ManifestResult]:
         """Fetch manifest from upstream.
 
         Args:
@@ -182,7 +254,7 @@ class UpstreamRegistry:
         """
         url = f"{self.url}/v2/{name}/manifests/{reference}"
 
-        async with await self._get_session() as session:
+        async with self.scheduler.slot(priority), await self._get_session() as session:
             headers = {
                 "Accept": (
                     "application/vnd.docker.distribution.manifest.v2+json, "
@@ -194,13 +266,15 @@ class UpstreamRegistry:
 
             # First attempt
             async with session.get(url, headers=headers) as resp:
+                self.scheduler.observe(resp.status, resp.headers)
                 if resp.status == 401:
                     # Handle auth challenge
                     www_auth = resp.headers.get("WWW-Authenticate", "")
-                    token = await self._handle_auth_challenge(session, www_auth)
+                    token = await self.exchange_token(session, www_auth)
                     if token:
                         headers["Authorization"] = f"Bearer {token}"
                         async with session.get(url, headers=headers) as auth_resp:
+                            self.scheduler.observe(auth_resp.status, auth_resp.headers)
                             if auth_resp.status == 200:
                                 content = await auth_resp.read()
                                 return ManifestResult(
@@ -212,8 +286,9 @@ class UpstreamRegistry:
                                         "Content-Type", ""
                                     ),
                                 )
+                            self._raise_for_status(auth_resp.status)
                             return None
-                    return None
+                    raise UpstreamError(401, "authentication failed")
 
                 if resp.status == 200:
                     content = await resp.read()
@@ -223,9 +298,12 @@ class UpstreamRegistry:
                         content_type=resp.headers.get("Content-Type", ""),
                     )
 
+                self._raise_for_status(resp.status)
                 return None
 
-    async def get_blob(self, name: str, digest: str) -> Optional[bytes]:
+    async def get_blob(
+        self, name: str, digest: str, priority: Priority = Priority.BLOB
+    ) -> Optional[bytes]:
         """Fetch blob from upstream.
 
         Args:
@@ -237,28 +315,146 @@ class UpstreamRegistry:
         """
         url = f"{self.url}/v2/{name}/blobs/{digest}"
 
-        async with await self._get_session() as session:
+        async with self.scheduler.slot(priority), await self._get_session() as session:
             headers = {}
 
             async with session.get(url, headers=headers) as resp:
+                self.scheduler.observe(resp.status, resp.headers)
                 if resp.status == 401:
                     www_auth = resp.headers.get("WWW-Authenticate", "")
-                    token = await self._handle_auth_challenge(session, www_auth)
+                    token = await self.exchange_token(session, www_auth)
                     if token:
                         headers["Authorization"] = f"Bearer {token}"
                         async with session.get(url, headers=headers) as auth_resp:
+                            self.scheduler.observe(auth_resp.status, auth_resp.headers)
                             if auth_resp.status == 200:
                                 return await auth_resp.read()
+                            self._raise_for_status(auth_resp.status)
                             return None
-                    return None
+                    raise UpstreamError(401, "authentication failed")
 
                 if resp.status == 200:
                     return await resp.read()
 
+                self._raise_for_status(resp.status)
                 return None
 
-    async def stream_blob(
+    async def head_blob(
+        self, name: str, digest: str, priority: Priority = Priority.BLOB
+    ) -> Optional[BlobInfo]:
+        """Check blob existence on upstream without transferring its content.
+
+        Uses a HEAD request, reusing a cached bearer token for the
+        repository scope when one is available.
+
+        Args:
+            name: Image name
+            digest: Blob digest
+
+        Returns:
+            BlobInfo if the blob exists, None otherwise
+        """
+        url = f"{self.url}/v2/{name}/blobs/{digest}"
+
+        async with self.scheduler.slot(priority), await self._get_session() as session:
+            headers = await self._pull_auth_headers(session, name)
+
+            async with session.head(url, headers=headers, allow_redirects=True) as resp:
+                self.scheduler.observe(resp.status, resp.headers)
+                if resp.status == 401:
+                    www_auth = resp.headers.get("WWW-Authenticate", "")
+                    token = await self.exchange_token(session, www_auth)
+                    if token:
+                        headers["Authorization"] = f"Bearer {token}"
+                        async with session.head(
+                            url, headers=headers, allow_redirects=True
+                        ) as auth_resp:
+                            self.scheduler.observe(auth_resp.status, auth_resp.headers)
+                            if auth_resp.status == 200:
+                                return self._blob_info(auth_resp, digest)
+                            self._raise_for_status(auth_resp.status)
+                            return None
+                    raise UpstreamError(401, "authentication failed")
+
+                if resp.status == 200:
+                    return self._blob_info(resp, digest)
+
+                self._raise_for_status(resp.status)
+                return None
+
+    @staticmethod
+    def _blob_info(resp: aiohttp.ClientResponse, digest: str) -> BlobInfo:
+        """Build BlobInfo from a successful HEAD response."""
+        return BlobInfo(
+            digest=resp.headers.get("Docker-Content-Digest", digest),
+            size=int(resp.headers.get("Content-Length", 0)),
+            content_type=resp.headers.get("Content-Type", "application/octet-stream"),
+        )
+
+    async def resolve_blob_location(
         self, name: str, digest: str
+    ) -> Optional[tuple[str, dict[str, str]]]:
+        """Resolve the URL and headers to use for ranged blob downloads.
+
+        Registries backed by object storage or a CDN answer blob requests
+        with a redirect; the redirect target is returned (without our
+        registry credentials) so segments go straight to it.
+
+        Returns:
+            (url, headers) if the blob exists, None otherwise
+        """
+        url = f"{self.url}/v2/{name}/blobs/{digest}"
+
+        async with self.scheduler.slot(Priority.BLOB), await self._get_session() as session:
+            headers = await self._pull_auth_headers(session, name)
+
+            for attempt in range(2):
+                async with session.head(url, headers=headers, allow_redirects=False) as resp:
+                    self.scheduler.observe(resp.status, resp.headers)
+                    if resp.status in (301, 302, 303, 307, 308):
+                        location = resp.url.join(yarl.URL(resp.headers["Location"]))
+                        return str(location), {}
+
+                    if resp.status == 200:
+                        return url, headers
+
+                    if resp.status == 401 and attempt == 0:
+                        www_auth = resp.headers.get("WWW-Authenticate", "")
+                        token = await self.exchange_token(session, www_auth)
+                        if token:
+                            headers["Authorization"] = f"Bearer {token}"
+                            continue
+                        raise UpstreamError(401, "authentication failed")
+
+                    self._raise_for_status(resp.status)
+                    return None
+
+        return None
+
+    async def get_blob_range(
+        self, location: tuple[str, dict[str, str]], start: int, end: int
+    ) -> bytes:
+        """Fetch an inclusive byte range of a blob from a resolved location.
+
+        Raises:
+            UpstreamError: If the range could not be fetched
+        """
+        url, headers = location
+        headers = {**headers, "Range": f"bytes={start}-{end}"}
+
+        async with self.scheduler.slot(Priority.BLOB), await self._get_session() as session:
+            async with session.get(url, headers=headers) as resp:
+                if url.startswith(self.url):
+                    self.scheduler.observe(resp.status, resp.headers)
+                if resp.status == 206:
+                    return await resp.read()
+                if resp.status == 200:
+                    # Server ignored Range; a full body is not a usable segment
+                    raise UpstreamError(200, "upstream does not support range requests")
+                raise UpstreamError(resp.status)
+
+    async def stream_blob(
+        self, name: str, digest: str, priority: Priority = Priority.BLOB
     ) -> AsyncIterator[bytes]:
         """Stream blob from upstream.
 
@@ -271,22 +467,29 @@ class UpstreamRegistry:
         """
         url = f"{self.url}/v2/{name}/blobs/{digest}"
 
-        async with await self._get_session() as session:
+        async with self.scheduler.slot(priority), await self._get_session() as session:
             headers = {}
 
             async with session.get(url, headers=headers) as resp:
+                self.scheduler.observe(resp.status, resp.headers)
                 if resp.status == 401:
                     www_auth = resp.headers.get("WWW-Authenticate", "")
-                    token = await self._handle_auth_challenge(session, www_auth)
+                    token = await self.exchange_token(session, www_auth)
                     if token:
                         headers["Authorization"] = f"Bearer {token}"
                         async with session.get(url, headers=headers) as auth_resp:
+                            self.scheduler.observe(auth_resp.status, auth_resp.headers)
                             if auth_resp.status == 200:
                                 async for chunk in auth_resp.content.iter_chunked(65536):
                                     yield chunk
+                                return
+                            self._raise_for_status(auth_resp.status)
                             return
-                    return
+                    raise UpstreamError(401, "authentication failed")
 
                 if resp.status == 200:
                     async for chunk in resp.content.iter_chunked(65536):
                         yield chunk
+                    return
+
+                self._raise_for_status(resp.status)
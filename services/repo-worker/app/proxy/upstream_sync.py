@@ -0,0 +1,142 @@
+"""Upstream registries synced from flask-backend.
+
+Registries added or edited in the WebUI live in the flask-backend
+database. This polls its internal registry list with ``If-None-Match``
+so an unchanged configuration costs one 304, and applies changes to the
+running proxy without a restart (see ``ProxyHandler.apply_upstreams``).
+
+If flask-backend is unreachable the last applied configuration stays in
+place; the built-in upstreams are always available.
+"""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional
+
+import aiohttp
+
+from app.config import UpstreamRegistry as UpstreamConfig, UpstreamSyncConfig
+from app.metrics import UPSTREAM_CONFIG_RELOADS, UPSTREAMS_CONFIGURED
+
+if TYPE_CHECKING:
+    from app.proxy.proxy import ProxyHandler
+
+logger = logging.getLogger(__name__)
+
+_REGISTRIES_PATH = "/api/v1/marketplace/internal/registries"
+
+# Auth types ProxyHandler can build credentials for
+_AUTH_TYPES = ("none", "basic", "token")
+
+
+def upstream_from_registry(registry: dict) -> Optional[UpstreamConfig]:
+    """Map a flask-backend registry entry to an upstream configuration.
+
+    Returns None for disabled entries, entries without a name or URL and
+    entries using an auth type repo-worker cannot handle (cloud IAM such
+    as aws, gcp or azure), which must not be proxied anonymously.
+    """
+    if not registry.get("is_enabled", True):
+        return None
+    name, url = registry.get("name"), registry.get("url")
+    if not name or not url:
+        return None
+    if "://" not in url:
+        url = f"https://{url}"
+
+    auth_type = registry.get("auth_type") or "none"
+    secret = registry.get("auth_password") or ""
+    if auth_type == "bearer":
+        auth_type = "token"
+    if auth_type not in _AUTH_TYPES:
+        logger.warning(f"Skipping upstream {name}: auth type {auth_type} is not supported")
+        return None
+    return UpstreamConfig(
+        name=name,
+        url=url,
+        auth_type=auth_type,
+        username=registry.get("auth_username") or "",
+        password=secret if auth_type == "basic" else "",
+        token=secret if auth_type == "token" else "",
+    )
+
+
+class UpstreamSync:
+    """Polls flask-backend for upstream registries and applies them."""
+
+    def __init__(self, proxy: "ProxyHandler", config: UpstreamSyncConfig, backend_url: str):
+        self.proxy = proxy
+        self.config = config
+        self.backend_url = backend_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=config.timeout_seconds)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._etag: Optional[str] = None
+
+    async def run(self) -> None:
+        """Poll for configuration changes until cancelled."""
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                UPSTREAM_CONFIG_RELOADS.labels("failed").inc()
+                logger.error(f"Upstream configuration sync failed: {e}")
+            await asyncio.sleep(self.config.interval_seconds)
+
+    async def close(self) -> None:
+        """Close the HTTP session to flask-backend."""
+        if self._session is not None:
+            await self._session.close()
+
+    async def poll(self) -> bool:
+        """Fetch the registry list and apply it if it changed.
+
+        Returns:
+            True if a new configuration was applied
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        try:
+            async with self._session.get(
+                f"{self.backend_url}{_REGISTRIES_PATH}", headers=headers
+            ) as response:
+                if response.status == 304:
+                    UPSTREAM_CONFIG_RELOADS.labels("unchanged").inc()
+                    return False
+                response.raise_for_status()
+                data = await response.json()
+                etag = response.headers.get("ETag")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            UPSTREAM_CONFIG_RELOADS.labels("failed").inc()
+            logger.warning(f"Fetching upstream registries failed: {e}")
+            return False
+
+        self.apply(data.get("registries") or [], data.get("version"))
+        self._etag = etag
+        return True
+
+    def apply(self, registries: list[dict], version: Optional[str] = None) -> None:
+        """Apply a registry list to the proxy."""
+        builtin = {upstream.name for upstream in self.proxy.config.builtin_upstreams}
+        upstreams = []
+        for registry in registries:
+            upstream = upstream_from_registry(registry)
+            if upstream is None:
+                continue
+            # Seeded entries without credentials must not drop the
+            # credentials a built-in upstream gets from the environment
+            if upstream.name in builtin and upstream.auth_type == "none":
+                continue
+            upstreams.append(upstream)
+
+        added, updated, removed = self.proxy.apply_upstreams(upstreams, version)
+        UPSTREAM_CONFIG_RELOADS.labels("applied").inc()
+        UPSTREAMS_CONFIGURED.set(self.proxy.upstream_count)
+        if added or updated or removed:
+            logger.info(
+                f"Upstream configuration {version}: added {added}, "
+                f"updated {updated}, removed {removed}"
+            )
@@ -5,12 +5,21 @@ https://github.com/opencontainers/distribution-spec
 """
 
 import hashlib
+import json
 import logging
 import uuid
 from typing import Optional
 
 from quart import Blueprint, Response, current_app, request
 
+from app.analytics.collector import record_lookup
+from app.auth.middleware import identify_user
+from app.bandwidth import Client
+from app.helm.charts import record_oci_chart
+from app.metrics import UPLOADS_IN_PROGRESS, record_proxy_lookup
+from app.proxy.peers import PEER_HEADER
+from app.proxy.proxy import ProxyHandler, get_proxy
+from app.replication import get_replicator
 from app.storage.s3 import get_storage
 
 logger = logging.getLogger(__name__)
@@ -20,6 +29,51 @@ registry_bp = Blueprint("registry", __name__)
 # In-memory upload sessions (for chunked uploads)
 # In production, this should be stored in Redis or similar
 _upload_sessions: dict[str, dict] = {}
+UPLOADS_IN_PROGRESS.set_function(lambda: len(_upload_sessions))
+
+
+# Content addressed by digest never changes, so caches may keep it forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _cache_headers(reference: str, digest: str) -> dict[str, str]:
+    """ETag and Cache-Control for content fetched by digest or by tag."""
+    return {
+        "ETag": f'"{digest}"',
+        "Cache-Control": (
+            IMMUTABLE_CACHE_CONTROL if reference.startswith("sha256:") else "no-cache"
+        ),
+    }
+
+
+def _not_modified(digest: str) -> bool:
+    """Check if the request's If-None-Match already covers this digest."""
+    return request.if_none_match.contains_weak(digest)
+
+
+def _not_modified_response(reference: str, digest: str) -> Response:
+    """304 response for content the client already has."""
+    return Response(
+        status=304,
+        headers={"Docker-Content-Digest": digest, **_cache_headers(reference, digest)},
+    )
+
+
+def _proxy_target(name: str) -> Optional[tuple[ProxyHandler, str, str]]:
+    """Resolve a repository name to (proxy, upstream, image) for pull-through.
+
+    Returns None when proxying is disabled or the name is a local repository.
+    """
+    proxy = get_proxy()
+    if proxy is None:
+        return None
+
+    parsed = proxy.parse_proxy_request(name)
+    if parsed is None:
+        return None
+
+    upstream_name, image_name = parsed
+    return proxy, upstream_name, image_name
 
 
 # =============================================================================
@@ -50,7 +104,18 @@ async def blob_exists(name: str, digest: str):
 
     size = await storage.get_blob_size(digest)
     if size is None:
-        return Response(status=404)
+        # Pull-through: answer from upstream HEAD metadata, never fetch bytes
+        target = _proxy_target(name)
+        if target is None:
+            return Response(status=404)
+        proxy, upstream_name, image_name = target
+        info = await proxy.blob_info(upstream_name, image_name, digest)
+        if info is None:
+            return Response(status=404)
+        size = info.size
+
+    if _not_modified(digest):
+        return _not_modified_response(digest, digest)
 
     return Response(
         status=200,
@@ -58,28 +123,120 @@ async def blob_exists(name: str, digest: str):
             "Content-Length": str(size),
             "Docker-Content-Digest": digest,
             "Content-Type": "application/octet-stream",
+            **_cache_headers(digest, digest),
         },
     )
 
 
 @registry_bp.route("/v2/<path:name>/blobs/<digest>", methods=["GET"])
 async def get_blob(name: str, digest: str):
-    """Get blob content."""
+    """Get blob content, streamed from storage (and shaped when enabled)."""
     storage = get_storage()
 
-    content = await storage.get_blob(digest)
-    if content is None:
-        return Response(status=404)
-
-    return Response(
-        content,
+    size = await storage.get_blob_size(digest)
+    if size is not None and _not_modified(digest):
+        return _not_modified_response(digest, digest)
+
+    target = _proxy_target(name)
+    if size is not None:
+        if target is not None:
+            record_proxy_lookup("blob", hit=True, size=size)
+            record_lookup(target[1], target[2], "blob", True, size)
+        body = storage.get_blob_stream(digest)
+    else:
+        if target is None:
+            return Response(status=404)
+        proxy, upstream_name, image_name = target
+        opened = await proxy.open_blob(upstream_name, image_name, digest)
+        if opened is None:
+            return Response(status=404)
+        size, body, source = opened
+        record_proxy_lookup("blob", hit=False, size=size, source=source)
+        record_lookup(upstream_name, image_name, "blob", False, size, source)
+
+    shaper = current_app.extensions.get("bandwidth")
+    if shaper is not None:
+        body = shaper.shape(body, _client_identity())
+
+    response = Response(
+        body,
         status=200,
         content_type="application/octet-stream",
         headers={
-            "Content-Length": str(len(content)),
+            "Content-Length": str(size),
             "Docker-Content-Digest": digest,
+            **_cache_headers(digest, digest),
         },
     )
+    # A large layer, above all one shaped to a class rate, takes far
+    # longer than RESPONSE_TIMEOUT to send
+    response.timeout = None
+    return response
+
+
+def _client_identity() -> Client:
+    """Identify the client a blob download is shaped for."""
+    shaper_config = current_app.config["CONFIG"].bandwidth
+    if shaper_config.trust_forwarded_for and request.access_route:
+        address = request.access_route[0]
+    else:
+        address = request.remote_addr or ""
+
+    user = identify_user()
+    return Client(
+        key=f"user:{user.user_id}" if user else f"ip:{address}",
+        address=address,
+        user_agent=request.headers.get("User-Agent", ""),
+        roles=tuple(user.roles) if user else (),
+    )
+
+
+# =============================================================================
+# Peer Cache
+# =============================================================================
+
+
+@registry_bp.route("/internal/peers/blobs/<digest>", methods=["GET", "HEAD"])
+async def peer_blob(digest: str):
+    """Serve a proxied blob this replica owns to another replica.
+
+    The owner answers from its cache or fetches from the upstream itself;
+    it never forwards to a further peer.
+    """
+    proxy = get_proxy()
+    upstream_name = request.args.get("upstream", "")
+    image_name = request.args.get("image", "")
+    if proxy is None or proxy.get_upstream(upstream_name) is None or not image_name:
+        return Response(status=404)
+
+    logger.debug(f"Peer {request.headers.get(PEER_HEADER, '?')} requested {digest}")
+    storage = get_storage()
+    if request.method == "HEAD":
+        info = await proxy.blob_info(upstream_name, image_name, digest, forward=False)
+        if info is None:
+            return Response(status=404)
+        return Response(
+            status=200,
+            headers={"Content-Length": str(info.size), "Docker-Content-Digest": digest},
+        )
+
+    size = await storage.get_blob_size(digest)
+    if size is not None:
+        body = storage.get_blob_stream(digest)
+    else:
+        opened = await proxy.open_blob(upstream_name, image_name, digest, forward=False)
+        if opened is None:
+            return Response(status=404)
+        size, body, _ = opened
+
+    response = Response(
+        body,
+        status=200,
+        content_type="application/octet-stream",
+        headers={"Content-Length": str(size), "Docker-Content-Digest": digest},
+    )
+    response.timeout = None
+    return response
 
 
 @registry_bp.route("/v2/<path:name>/blobs/<digest>", methods=["DELETE"])
@@ -217,16 +374,29 @@ async def cancel_blob_upload(name: str, upload_id: str):
 # =============================================================================
 
 
+async def _proxy_manifest(name: str, reference: str) -> Optional[tuple[bytes, str]]:
+    """Fetch a manifest through the pull-through proxy on a local miss."""
+    target = _proxy_target(name)
+    if target is None:
+        return None
+    proxy, upstream_name, image_name = target
+    return await proxy.get_manifest(upstream_name, image_name, reference)
+
+
 @registry_bp.route("/v2/<path:name>/manifests/<reference>", methods=["HEAD"])
 async def manifest_exists(name: str, reference: str):
     """Check if a manifest exists."""
     storage = get_storage()
 
     result = await storage.get_manifest(name, reference)
+    if result is None:
+        result = await _proxy_manifest(name, reference)
     if result is None:
         return Response(status=404)
 
     content, digest = result
+    if _not_modified(digest):
+        return _not_modified_response(reference, digest)
 
     return Response(
         status=200,
@@ -234,6 +404,7 @@ async def manifest_exists(name: str, reference: str):
             "Content-Length": str(len(content)),
             "Docker-Content-Digest": digest,
             "Content-Type": "application/vnd.oci.image.manifest.v1+json",
+            **_cache_headers(reference, digest),
         },
     )
 
@@ -244,10 +415,14 @@ async def get_manifest(name: str, reference: str):
     storage = get_storage()
 
     result = await storage.get_manifest(name, reference)
+    if result is None:
+        result = await _proxy_manifest(name, reference)
     if result is None:
         return Response(status=404)
 
     content, digest = result
+    if _not_modified(digest):
+        return _not_modified_response(reference, digest)
 
     # Determine content type from manifest
     import json
@@ -266,6 +441,7 @@ async def get_manifest(name: str, reference: str):
         headers={
             "Content-Length": str(len(content)),
             "Docker-Content-Digest": digest,
+            **_cache_headers(reference, digest),
         },
     )
 
@@ -277,9 +453,32 @@ async def put_manifest(name: str, reference: str):
     if not content:
         return Response("empty manifest", status=400)
 
+    try:
+        document = json.loads(content)
+    except ValueError:
+        document = None
+    if not isinstance(document, dict):
+        return _oci_error("MANIFEST_INVALID", "manifest invalid", 400)
+
+    # Reject manifests whose config, layers or child manifests were never
+    # pushed, checking all of them at once
     storage = get_storage()
+    blobs, manifests = _manifest_references(document)
+    missing = await storage.find_missing(name, blobs, manifests)
+    if missing:
+        return _oci_error(
+            "MANIFEST_BLOB_UNKNOWN", "blob unknown to registry", 400, missing
+        )
+
     digest = await storage.put_manifest(name, reference, content)
 
+    # `helm push oci://...` - make the chart visible in the classic index
+    await record_oci_chart(storage, name, content)
+
+    replicator = get_replicator()
+    if replicator is not None:
+        replicator.enqueue(name, reference, digest)
+
     location = f"/v2/{name}/manifests/{digest}"
     return Response(
         status=201,
@@ -291,6 +490,40 @@ async def put_manifest(name: str, reference: str):
     )
 
 
+def _manifest_references(document: dict) -> tuple[list[str], list[str]]:
+    """Get the (blob digests, child manifest digests) a manifest references.
+
+    Non-distributable layers (those with ``urls``) are never pushed and
+    are not checked.
+    """
+    descriptors = list(document.get("layers") or [])
+    if isinstance(document.get("config"), dict):
+        descriptors.append(document["config"])
+    blobs = [
+        d["digest"] for d in descriptors
+        if isinstance(d, dict) and "digest" in d and not d.get("urls")
+    ]
+    manifests = [
+        d["digest"] for d in document.get("manifests") or []
+        if isinstance(d, dict) and "digest" in d
+    ]
+    return blobs, manifests
+
+
+def _oci_error(
+    code: str, message: str, status: int, digests: Optional[list[str]] = None
+) -> tuple[dict, int]:
+    """Build an OCI error response, one error per digest if given."""
+    if digests:
+        errors = [
+            {"code": code, "message": message, "detail": {"digest": digest}}
+            for digest in digests
+        ]
+    else:
+        errors = [{"code": code, "message": message}]
+    return {"errors": errors}, status
+
+
 @registry_bp.route("/v2/<path:name>/manifests/<reference>", methods=["DELETE"])
 async def delete_manifest(name: str, reference: str):
     """Delete a manifest."""
@@ -0,0 +1,426 @@
+"""Asynchronous replication of local repositories to secondary targets.
+
+Every manifest pushed to a local repository is queued for each configured
+target whose repository patterns match, and a periodic reconcile compares
+every tag with each target and queues whatever the target is missing, so
+events lost to a restart or a full queue are caught up. Replicating a
+manifest copies, in order:
+
+1. Blobs (config and layers) the target does not have yet; blobs already
+   present are never transferred again.
+2. Child manifests of an image index, by digest.
+3. The manifest itself, under its tag.
+
+Targets are either another OCI registry (blob upload API) or another S3
+bucket. Between buckets on the same S3 service blobs are copied
+server-side with CopyObject, so the data never passes through repo-worker.
+Failed replications are retried with exponential backoff.
+"""
+
+import asyncio
+import base64
+import fnmatch
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urljoin
+
+import aiohttp
+
+from app.config import ReplicationConfig, ReplicationTarget
+from app.helm.charts import OCI_MANIFEST_MEDIA_TYPE
+from app.metrics import (
+    REPLICATION_BLOBS,
+    REPLICATION_EVENTS,
+    REPLICATION_LAG,
+    REPLICATION_LAST_SUCCESS,
+    REPLICATION_QUEUE_DEPTH,
+)
+from app.proxy.errors import UpstreamError
+from app.proxy.upstream import RegistryAuth, UpstreamRegistry
+from app.storage.s3 import S3Storage
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST_ACCEPT = ", ".join([
+    OCI_MANIFEST_MEDIA_TYPE,
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+])
+
+# Global replicator instance (None when replication is disabled)
+_replicator: Optional["Replicator"] = None
+
+
+def get_replicator() -> Optional["Replicator"]:
+    """Get the global replicator, or None if replication is disabled."""
+    return _replicator
+
+
+def set_replicator(replicator: Optional["Replicator"]) -> None:
+    """Set the global replicator instance."""
+    global _replicator
+    _replicator = replicator
+
+
+@dataclass
+class ReplicationEvent:
+    """A manifest a target should have under a reference."""
+    repository: str
+    reference: str  # Tag or digest
+    digest: str
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+# =============================================================================
+# Targets
+# =============================================================================
+
+
+class _Target:
+    """Common behaviour of replication targets."""
+
+    def __init__(self, config: ReplicationTarget):
+        self.config = config
+        self.name = config.name
+
+    def matches(self, repository: str) -> bool:
+        """Check if a repository is replicated to this target."""
+        return any(fnmatch.fnmatch(repository, p) for p in self.config.repositories)
+
+    async def close(self) -> None:
+        """Release connections held by the target."""
+
+
+class S3Target(_Target):
+    """Another bucket using the same layout as the primary storage."""
+
+    def __init__(self, config: ReplicationTarget, source: S3Storage):
+        super().__init__(config)
+        self.source = source
+        self.storage = S3Storage(config.s3)
+
+    async def manifest_digest(self, repository: str, reference: str) -> Optional[str]:
+        result = await self.storage.get_manifest(repository, reference)
+        return result[1] if result else None
+
+    async def has_blob(self, repository: str, digest: str) -> bool:
+        return await self.storage.blob_exists(digest)
+
+    async def copy_blob(self, repository: str, digest: str, size: int) -> str:
+        if await self.storage.copy_blob_from(self.source, digest, size):
+            return "server_copy"
+        await self.storage.put_blob_stream(
+            digest, self.source.get_blob_stream(digest), size
+        )
+        return "streamed"
+
+    async def put_manifest(
+        self, repository: str, reference: str, content: bytes, media_type: str
+    ) -> None:
+        await self.storage.put_manifest(repository, reference, content)
+
+
+class RegistryTarget(_Target):
+    """Another registry, written through the OCI distribution push API."""
+
+    def __init__(self, config: ReplicationTarget, source: S3Storage):
+        super().__init__(config)
+        self.source = source
+        self.url = config.url.rstrip("/")
+        # Token exchange is shared with the pull-through upstream client
+        self.client = UpstreamRegistry(
+            name=config.name,
+            url=config.url,
+            auth=RegistryAuth(
+                auth_type="basic" if config.username else "none",
+                username=config.username,
+                password=config.password,
+            ),
+        )
+        self._tokens: dict[str, str] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    def _auth_headers(self, repository: str) -> dict[str, str]:
+        token = self._tokens.get(repository)
+        if token:
+            return {"Authorization": f"Bearer {token}"}
+        if self.config.username:
+            credentials = f"{self.config.username}:{self.config.password}".encode()
+            return {"Authorization": f"Basic {base64.b64encode(credentials).decode()}"}
+        return {}
+
+    async def _request(
+        self,
+        method: str,
+        repository: str,
+        url: str,
+        headers: Optional[dict[str, str]] = None,
+        data=None,
+        retry_auth: bool = True,
+    ) -> aiohttp.ClientResponse:
+        """Send a request, answering a bearer token challenge once."""
+        session = self._get_session()
+        resp = await session.request(
+            method, url, headers={**self._auth_headers(repository), **(headers or {})},
+            data=data,
+        )
+        if resp.status == 401 and retry_auth:
+            challenge = resp.headers.get("WWW-Authenticate", "")
+            resp.release()
+            token = await self.client.exchange_token(session, challenge)
+            if token is None:
+                raise UpstreamError(401, f"authentication to {self.name} failed")
+            self._tokens[repository] = token
+            return await self._request(method, repository, url, headers, data, False)
+        return resp
+
+    async def manifest_digest(self, repository: str, reference: str) -> Optional[str]:
+        url = f"{self.url}/v2/{repository}/manifests/{reference}"
+        async with await self._request(
+            "HEAD", repository, url, {"Accept": _MANIFEST_ACCEPT}
+        ) as resp:
+            if resp.status == 404:
+                return None
+            if resp.status != 200:
+                raise UpstreamError(resp.status)
+            return resp.headers.get("Docker-Content-Digest")
+
+    async def has_blob(self, repository: str, digest: str) -> bool:
+        url = f"{self.url}/v2/{repository}/blobs/{digest}"
+        async with await self._request("HEAD", repository, url) as resp:
+            if resp.status not in (200, 404):
+                raise UpstreamError(resp.status)
+            return resp.status == 200
+
+    async def copy_blob(self, repository: str, digest: str, size: int) -> str:
+        url = f"{self.url}/v2/{repository}/blobs/uploads/"
+        async with await self._request("POST", repository, url) as resp:
+            if resp.status != 202:
+                raise UpstreamError(resp.status)
+            location = urljoin(url, resp.headers["Location"])
+
+        separator = "&" if "?" in location else "?"
+        # Authenticated by the POST above, so a streamed body is sent once
+        async with await self._request(
+            "PUT", repository, f"{location}{separator}digest={digest}",
+            {"Content-Length": str(size), "Content-Type": "application/octet-stream"},
+            data=self.source.get_blob_stream(digest),
+            retry_auth=False,
+        ) as resp:
+            if resp.status not in (201, 204):
+                raise UpstreamError(resp.status)
+        return "streamed"
+
+    async def put_manifest(
+        self, repository: str, reference: str, content: bytes, media_type: str
+    ) -> None:
+        url = f"{self.url}/v2/{repository}/manifests/{reference}"
+        async with await self._request(
+            "PUT", repository, url, {"Content-Type": media_type}, data=content
+        ) as resp:
+            if resp.status not in (200, 201):
+                raise UpstreamError(resp.status)
+
+
+def _make_target(config: ReplicationTarget, source: S3Storage) -> _Target:
+    if config.type == "s3":
+        return S3Target(config, source)
+    return RegistryTarget(config, source)
+
+
+# =============================================================================
+# Replicator
+# =============================================================================
+
+
+class Replicator:
+    """Queues manifest events and replicates them to every matching target."""
+
+    def __init__(self, storage: S3Storage, config: ReplicationConfig):
+        self.storage = storage
+        self.config = config
+        self.targets = {t.name: _make_target(t, storage) for t in config.targets}
+        self._queue: asyncio.Queue[tuple[str, str, str]] = asyncio.Queue(
+            maxsize=config.queue_size
+        )
+        # Latest event per (target, repository, reference); a tag pushed
+        # again before it was replicated is only replicated once
+        self._pending: dict[tuple[str, str, str], ReplicationEvent] = {}
+        self._blob_slots = asyncio.Semaphore(max(config.concurrency, 1))
+
+    def enqueue(self, repository: str, reference: str, digest: str) -> None:
+        """Queue a pushed manifest for every target replicating its repository."""
+        for target in self.targets.values():
+            if target.matches(repository):
+                self._enqueue(target, ReplicationEvent(repository, reference, digest))
+
+    def _enqueue(self, target: _Target, event: ReplicationEvent) -> None:
+        key = (target.name, event.repository, event.reference)
+        queued = self._pending.get(key)
+        if queued is not None:
+            queued.digest = event.digest
+            return
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            REPLICATION_EVENTS.labels(target.name, "dropped").inc()
+            logger.warning(
+                f"Replication queue full, leaving {event.repository}:{event.reference} "
+                f"for {target.name} to the next reconcile"
+            )
+            return
+        self._pending[key] = event
+        REPLICATION_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def run(self) -> None:
+        """Run replication workers and the periodic reconcile until cancelled."""
+        workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(max(self.config.concurrency, 1))
+        ]
+        try:
+            if self.config.reconcile_interval_seconds <= 0:
+                await asyncio.gather(*workers)
+            while True:
+                try:
+                    queued = await self.reconcile()
+                    if queued:
+                        logger.info(f"Reconcile queued {queued} manifests for replication")
+                except Exception as e:
+                    logger.error(f"Replication reconcile failed: {e}")
+                await asyncio.sleep(self.config.reconcile_interval_seconds)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            for target in self.targets.values():
+                await target.close()
+
+    async def reconcile(self) -> int:
+        """Queue every tag whose manifest a target is missing or has stale.
+
+        Returns:
+            Number of events queued
+        """
+        queued = 0
+        for repository in await self.storage.list_repositories():
+            targets = [t for t in self.targets.values() if t.matches(repository)]
+            if not targets:
+                continue
+            for tag in await self.storage.list_tags(repository):
+                result = await self.storage.get_manifest(repository, tag)
+                if result is None:
+                    continue
+                digest = result[1]
+                for target in targets:
+                    try:
+                        current = await target.manifest_digest(repository, tag)
+                    except Exception as e:
+                        logger.warning(f"Cannot check {repository}:{tag} on {target.name}: {e}")
+                        current = None
+                    if current != digest:
+                        self._enqueue(target, ReplicationEvent(repository, tag, digest))
+                        queued += 1
+        return queued
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._queue.get()
+            event = self._pending.pop(key, None)
+            REPLICATION_QUEUE_DEPTH.set(self._queue.qsize())
+            target = self.targets.get(key[0])
+            if event is None or target is None:
+                continue
+            await self._replicate_with_retry(target, event)
+
+    async def _replicate_with_retry(self, target: _Target, event: ReplicationEvent) -> bool:
+        """Replicate an event, backing off exponentially between attempts."""
+        name = f"{event.repository}:{event.reference}"
+        for attempt in range(self.config.max_retries + 1):
+            try:
+                await self.replicate(target, event)
+            except Exception as e:
+                if attempt >= self.config.max_retries:
+                    REPLICATION_EVENTS.labels(target.name, "failed").inc()
+                    logger.error(f"Giving up replicating {name} to {target.name}: {e}")
+                    return False
+                delay = min(2 ** attempt, self.config.max_backoff_seconds)
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(
+                    f"Replicating {name} to {target.name} failed ({e}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            REPLICATION_EVENTS.labels(target.name, "replicated").inc()
+            REPLICATION_LAG.labels(target.name).observe(time.monotonic() - event.queued_at)
+            REPLICATION_LAST_SUCCESS.labels(target.name).set(time.time())
+            return True
+        return False
+
+    async def replicate(self, target: _Target, event: ReplicationEvent) -> None:
+        """Make a target hold a manifest, its blobs and children."""
+        if await target.manifest_digest(event.repository, event.reference) == event.digest:
+            return
+        copied = await self._copy_manifest(target, event.repository, event.digest)
+        if copied is None:
+            logger.info(
+                f"{event.repository}@{event.digest} was deleted before replication"
+            )
+            return
+        content, media_type = copied
+        await target.put_manifest(event.repository, event.reference, content, media_type)
+        logger.info(f"Replicated {event.repository}:{event.reference} to {target.name}")
+
+    async def _copy_manifest(
+        self, target: _Target, repository: str, digest: str
+    ) -> Optional[tuple[bytes, str]]:
+        """Copy everything a manifest references, returning its content."""
+        result = await self.storage.get_manifest(repository, digest)
+        if result is None:
+            return None
+        content = result[0]
+        document = json.loads(content)
+
+        for child in document.get("manifests") or []:
+            child_digest = child["digest"]
+            if await target.manifest_digest(repository, child_digest) == child_digest:
+                continue
+            copied = await self._copy_manifest(target, repository, child_digest)
+            if copied is None:
+                raise LookupError(f"Child manifest {child_digest} missing from source")
+            await target.put_manifest(repository, child_digest, *copied)
+
+        blobs = [document["config"]["digest"]] if "config" in document else []
+        blobs += [layer["digest"] for layer in document.get("layers") or []]
+        await asyncio.gather(*[self._copy_blob(target, repository, d) for d in blobs])
+
+        return content, document.get("mediaType") or OCI_MANIFEST_MEDIA_TYPE
+
+    async def _copy_blob(self, target: _Target, repository: str, digest: str) -> None:
+        async with self._blob_slots:
+            if await target.has_blob(repository, digest):
+                REPLICATION_BLOBS.labels(target.name, "present").inc()
+                return
+            size = await self.storage.get_blob_size(digest)
+            if size is None:
+                raise LookupError(f"Blob {digest} missing from source")
+            mode = await target.copy_blob(repository, digest, size)
+            REPLICATION_BLOBS.labels(target.name, mode).inc()
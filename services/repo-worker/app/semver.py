@@ -0,0 +1,35 @@
+"""Semantic version ordering for chart versions."""
+
+import re
+
+_SEMVER = re.compile(
+    r"^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+)
+
+
+def semver_key(version: str) -> tuple:
+    """Sort key ordering versions by semver precedence.
+
+    ``1.9.0 < 1.10.0`` and ``1.0.0-rc.1 < 1.0.0``. Strings that are not
+    versions sort before all valid versions, alphabetically.
+    """
+    match = _SEMVER.match(version)
+    if not match:
+        return (0, version)
+
+    major, minor, patch, prerelease = match.groups()
+    core = (int(major), int(minor or 0), int(patch or 0))
+    if prerelease is None:
+        # A release outranks any of its pre-releases
+        return (1, core, 1, ())
+
+    identifiers = tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part)
+        for part in prerelease.split(".")
+    )
+    return (1, core, 0, identifiers)
+
+
+def sort_versions(versions: list[str], newest_first: bool = False) -> list[str]:
+    """Sort versions by semver precedence."""
+    return sorted(versions, key=semver_key, reverse=newest_first)
@@ -0,0 +1,201 @@
+"""Adaptive concurrency limits for S3 calls.
+
+Every S3 API call made through an instrumented session takes a slot in
+one of three pools (read, write, list) before it is sent. Each pool's
+limit follows AIMD, like TCP congestion control:
+
+- a call finishing while the pool was saturated raises the limit by
+  1/limit, i.e. by about one per round of calls
+- a 503 SlowDown / 429 response (including ones botocore retried), or a
+  response slower than the pool's latency target, multiplies the limit by
+  ``backoff_ratio``, at most once per round trip
+
+Calls over the limit wait in FIFO order, so throughput settles just below
+the store's capacity instead of every caller retrying in lockstep.
+
+Slots are taken and returned from botocore ``before-call`` /
+``after-call`` hooks, so paginators and multipart uploads are covered
+without touching call sites. For streamed GETs the slot covers the call
+up to the response headers, not reading the body.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from app.config import S3ConcurrencyConfig, S3PoolLimit
+from app.metrics import S3_CONCURRENCY_LIMIT, S3_IN_FLIGHT, S3_QUEUE_TIME, S3_THROTTLED
+
+logger = logging.getLogger(__name__)
+
+S3_POOLS = ("read", "write", "list")
+
+_LIST_OPERATIONS = {
+    "ListObjects",
+    "ListObjectsV2",
+    "ListObjectVersions",
+    "ListMultipartUploads",
+    "ListParts",
+    "ListBuckets",
+}
+
+_THROTTLE_STATUSES = (429, 503)
+
+# Key the slot is kept under in the botocore request context
+_CONTEXT_KEY = "repo_worker_permit"
+
+
+def operation_pool(operation: str) -> str:
+    """Get the pool an S3 operation is limited in."""
+    if operation in _LIST_OPERATIONS:
+        return "list"
+    if operation.startswith(("Get", "Head")):
+        return "read"
+    return "write"
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit with a FIFO wait queue."""
+
+    def __init__(self, name: str, limits: S3PoolLimit, backoff_ratio: float):
+        self.name = name
+        self.limits = limits
+        self.backoff_ratio = backoff_ratio
+        self.limit = float(limits.initial)
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        S3_CONCURRENCY_LIMIT.labels(name).set(self.limit)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _admit(self) -> None:
+        self.in_flight += 1
+        S3_IN_FLIGHT.labels(self.name).set(self.in_flight)
+
+    async def acquire(self) -> None:
+        """Wait for a slot."""
+        if self._has_capacity() and not self._waiters:
+            self._admit()
+            S3_QUEUE_TIME.labels(self.name).observe(0)
+            return
+
+        queued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was handed to us just as we gave up
+                self._release()
+            elif future in self._waiters:
+                self._waiters.remove(future)
+            raise
+        finally:
+            S3_QUEUE_TIME.labels(self.name).observe(time.monotonic() - queued)
+
+    def release(self, started: float, throttled: bool) -> None:
+        """Free a slot and adapt the limit to how the call went.
+
+        Args:
+            started: ``time.monotonic()`` when the call was sent
+            throttled: Whether the store signalled overload
+        """
+        now = time.monotonic()
+        saturated = not self._has_capacity() or bool(self._waiters)
+        target = self.limits.latency_target_ms / 1000
+        congested = throttled or (target > 0 and now - started > target)
+
+        if congested:
+            # Calls sent before the last decrease saw the old limit
+            if started >= self._last_decrease:
+                self.limit = max(float(self.limits.min), self.limit * self.backoff_ratio)
+                self._last_decrease = now
+                logger.debug(f"S3 {self.name} limit decreased to {int(self.limit)}")
+        elif saturated:
+            self.limit = min(float(self.limits.max), self.limit + 1 / self.limit)
+        S3_CONCURRENCY_LIMIT.labels(self.name).set(self.limit)
+
+        self._release()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        S3_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        while self._waiters and self._has_capacity():
+            future = self._waiters.popleft()
+            if not future.done():
+                self._admit()
+                future.set_result(None)
+
+
+class _Permit:
+    """A slot held by one S3 call, returned exactly once."""
+
+    def __init__(self, pool: AdaptiveLimit):
+        self.pool = pool
+        self.started = time.monotonic()
+        self.throttled = False
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.pool.release(self.started, self.throttled)
+
+    def __del__(self):
+        # A call cancelled mid-flight emits no after-call event; its
+        # request context (and this permit) is dropped instead.
+        self.release()
+
+
+class S3Limiter:
+    """Read, write and list pools shared by all clients of a session."""
+
+    def __init__(self, config: S3ConcurrencyConfig):
+        self.config = config
+        self.pools = {
+            name: AdaptiveLimit(name, config.pools[name], config.backoff_ratio)
+            for name in S3_POOLS
+        }
+
+    def instrument(self, session) -> None:
+        """Register the limiting hooks on an aiobotocore session.
+
+        Register before the metrics hooks so S3 latency excludes queueing.
+        """
+        session.register("before-call.s3", self._before_call)
+        session.register("needs-retry.s3", self._needs_retry)
+        session.register("after-call.s3", self._after_call)
+        session.register("after-call-error.s3", self._after_call_error)
+
+    async def _before_call(self, model, context, **kwargs) -> None:
+        pool = self.pools[operation_pool(model.name)]
+        await pool.acquire()
+        context[_CONTEXT_KEY] = _Permit(pool)
+
+    def _needs_retry(self, response, request_dict, **kwargs) -> None:
+        """Flag throttled attempts botocore is about to retry."""
+        if response is None:
+            return
+        permit = request_dict.get("context", {}).get(_CONTEXT_KEY)
+        if permit is not None and response[0].status_code in _THROTTLE_STATUSES:
+            if not permit.throttled:
+                S3_THROTTLED.labels(permit.pool.name).inc()
+            permit.throttled = True
+
+    def _after_call(self, http_response, context, **kwargs) -> None:
+        permit = context.pop(_CONTEXT_KEY, None)
+        if permit is None:
+            return
+        if http_response.status_code in _THROTTLE_STATUSES and not permit.throttled:
+            S3_THROTTLED.labels(permit.pool.name).inc()
+            permit.throttled = True
+        permit.release()
+
+    def _after_call_error(self, context, **kwargs) -> None:
+        permit = context.pop(_CONTEXT_KEY, None)
+        if permit is not None:
+            permit.release()
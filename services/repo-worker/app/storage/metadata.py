@@ -0,0 +1,342 @@
+"""Embedded metadata store for small registry objects.
+
+Keeps tag links, repository membership, chart versions (with extracted
+Chart.yaml metadata) and proxy cache entries in a local SQLite database
+in WAL mode, so metadata reads and listings take microseconds instead of
+an S3 round-trip or a ``list_objects_v2`` scan.
+
+S3 remains the source of truth: S3Storage writes through to this store
+after every successful object write, and the store can be rebuilt from
+the bucket at any time::
+
+    python -m app.storage.metadata rebuild
+
+Each replica keeps its own database and answers tag reads and listings
+from it. Its own writes are visible at once; tags and charts pushed to
+other replicas appear after the next resync, every
+``resync_interval_seconds`` (on by default; 0 only suits a single
+replica).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from app.storage.s3 import S3Storage
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    repository TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (repository, tag)
+);
+CREATE TABLE IF NOT EXISTS repositories (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS charts (
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    metadata TEXT,
+    PRIMARY KEY (name, version)
+);
+CREATE TABLE IF NOT EXISTS proxy_cache (
+    key TEXT PRIMARY KEY,
+    content BLOB NOT NULL,
+    content_type TEXT NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class MetadataStore:
+    """SQLite-backed write-through store for registry metadata."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # Writes made while a rebuild lists the bucket, replayed over its result
+        self._replay: Optional[list[tuple[str, tuple]]] = None
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._db.close()
+
+    def _write(self, sql: str, params: tuple) -> None:
+        """Execute a write that a running rebuild must not undo."""
+        self._db.execute(sql, params)
+        if self._replay is not None:
+            self._replay.append((sql, params))
+
+    def is_ready(self) -> bool:
+        """Check if the store has been populated from the bucket.
+
+        Listings are only served from the store once it is complete;
+        until then callers fall back to S3.
+        """
+        return self.rebuilt_at() is not None
+
+    def rebuilt_at(self) -> Optional[float]:
+        """Time of the last rebuild from the bucket, or None if never rebuilt."""
+        row = self._db.execute(
+            "SELECT value FROM state WHERE key = 'rebuilt_at'"
+        ).fetchone()
+        return float(row[0]) if row else None
+
+    # =========================================================================
+    # Tags and repositories
+    # =========================================================================
+
+    def get_tag(self, repository: str, tag: str) -> Optional[str]:
+        """Resolve a tag to its manifest digest."""
+        row = self._db.execute(
+            "SELECT digest FROM tags WHERE repository = ? AND tag = ?",
+            (repository, tag),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_tag(self, repository: str, tag: str, digest: str) -> None:
+        """Record a tag -> digest link."""
+        self._write(
+            "INSERT OR REPLACE INTO tags VALUES (?, ?, ?)", (repository, tag, digest)
+        )
+
+    def delete_tag(self, repository: str, tag: str) -> None:
+        """Remove a tag link."""
+        self._write(
+            "DELETE FROM tags WHERE repository = ? AND tag = ?", (repository, tag)
+        )
+
+    def list_tags(self, repository: str) -> list[str]:
+        """List all tags for a repository."""
+        rows = self._db.execute(
+            "SELECT tag FROM tags WHERE repository = ? ORDER BY tag", (repository,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def add_repository(self, name: str) -> None:
+        """Record repository membership."""
+        self._write("INSERT OR IGNORE INTO repositories VALUES (?)", (name,))
+
+    def list_repositories(self) -> list[str]:
+        """List all repositories."""
+        rows = self._db.execute("SELECT name FROM repositories ORDER BY name").fetchall()
+        return [row[0] for row in rows]
+
+    # =========================================================================
+    # Helm charts
+    # =========================================================================
+
+    def put_chart(self, name: str, version: str, metadata: Optional[dict]) -> None:
+        """Record a chart version, keeping known metadata if none is given."""
+        self._write(
+            "INSERT INTO charts VALUES (?, ?, ?) ON CONFLICT (name, version) "
+            "DO UPDATE SET metadata = COALESCE(excluded.metadata, charts.metadata)",
+            (name, version, json.dumps(metadata) if metadata is not None else None),
+        )
+
+    def get_chart_metadata(self, name: str, version: str) -> Optional[dict]:
+        """Get extracted Chart.yaml metadata for a chart version."""
+        row = self._db.execute(
+            "SELECT metadata FROM charts WHERE name = ? AND version = ?",
+            (name, version),
+        ).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def delete_chart(self, name: str, version: str) -> None:
+        """Remove a chart version."""
+        self._write(
+            "DELETE FROM charts WHERE name = ? AND version = ?", (name, version)
+        )
+
+    def list_charts(self) -> dict[str, list[str]]:
+        """List all charts and their versions."""
+        charts: dict[str, list[str]] = {}
+        for name, version in self._db.execute(
+            "SELECT name, version FROM charts ORDER BY name, version"
+        ):
+            charts.setdefault(name, []).append(version)
+        return charts
+
+    # =========================================================================
+    # Proxy cache
+    # =========================================================================
+
+    def get_cache_entry(self, key: str) -> Optional[tuple[bytes, str, dict[str, str]]]:
+        """Get a proxied manifest with its cache metadata."""
+        row = self._db.execute(
+            "SELECT content, content_type, meta FROM proxy_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0]), row[1], json.loads(row[2])
+
+    def put_cache_entry(
+        self, key: str, content: bytes, content_type: str, meta: dict[str, str]
+    ) -> None:
+        """Store a proxied manifest with its cache metadata."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO proxy_cache VALUES (?, ?, ?, ?)",
+            (key, content, content_type, json.dumps(meta)),
+        )
+
+    def update_cache_meta(self, key: str, meta: dict[str, str]) -> None:
+        """Replace metadata of an existing proxy cache entry."""
+        self._db.execute(
+            "UPDATE proxy_cache SET meta = ? WHERE key = ?", (json.dumps(meta), key)
+        )
+
+    # =========================================================================
+    # Rebuild from bucket
+    # =========================================================================
+
+    async def rebuild(self, storage: "S3Storage") -> None:
+        """Repopulate tags, repositories and charts from the bucket.
+
+        Proxy cache entries and chart metadata are backfilled lazily on
+        first read instead of being fetched here. Tags and charts written
+        while the bucket is being listed are applied again over the
+        listing, so a concurrent push is not lost.
+        """
+        self._replay = []
+        try:
+            await self._rebuild(storage)
+        finally:
+            self._replay = None
+
+    async def _rebuild(self, storage: "S3Storage") -> None:
+        started = time.time()
+        tag_links: list[tuple[str, str, str]] = []
+        repositories: set[str] = set()
+        chart_versions: list[tuple[str, str]] = []
+
+        async for key in storage.list_keys("repositories/"):
+            parsed = _parse_manifest_key(key)
+            if parsed is None:
+                continue
+            repository, tag = parsed
+            repositories.add(repository)
+            if tag is not None:
+                tag_links.append((repository, tag, key))
+
+        semaphore = asyncio.Semaphore(16)
+
+        async def resolve(repository: str, tag: str, key: str):
+            async with semaphore:
+                digest = await storage.read_object(key)
+            return repository, tag, digest.decode().strip() if digest else None
+
+        resolved = await asyncio.gather(*[resolve(*link) for link in tag_links])
+
+        for name, versions in (await storage.list_charts(use_metadata_store=False)).items():
+            chart_versions.extend((name, version) for version in versions)
+
+        self._db.execute("BEGIN")
+        try:
+            self._db.execute("DELETE FROM tags")
+            self._db.execute("DELETE FROM repositories")
+            self._db.executemany(
+                "INSERT INTO tags VALUES (?, ?, ?)",
+                [(r, t, d) for r, t, d in resolved if d],
+            )
+            self._db.executemany(
+                "INSERT INTO repositories VALUES (?)", [(r,) for r in repositories]
+            )
+            existing = set(self._db.execute("SELECT name, version FROM charts"))
+            self._db.executemany(
+                "DELETE FROM charts WHERE name = ? AND version = ?",
+                existing - set(chart_versions),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO charts (name, version) VALUES (?, ?)",
+                chart_versions,
+            )
+            for sql, params in self._replay:
+                self._db.execute(sql, params)
+            self._db.execute(
+                "INSERT OR REPLACE INTO state VALUES ('rebuilt_at', ?)", (str(time.time()),)
+            )
+            self._db.execute("COMMIT")
+        except sqlite3.Error:
+            self._db.execute("ROLLBACK")
+            raise
+
+        logger.info(
+            f"Metadata store rebuilt in {time.time() - started:.1f}s: "
+            f"{len(repositories)} repositories, {len(tag_links)} tags, "
+            f"{len(chart_versions)} chart versions"
+        )
+
+
+async def resync_loop(store: MetadataStore, storage: "S3Storage", interval: int) -> None:
+    """Periodically rebuild the store so changes made by other replicas appear.
+
+    The first rebuild is due ``interval`` after the last one, so a store
+    kept on disk across a restart is brought up to date straight away.
+    """
+    while True:
+        rebuilt_at = store.rebuilt_at() or 0.0
+        await asyncio.sleep(max(0.0, rebuilt_at + interval - time.time()))
+        try:
+            await store.rebuild(storage)
+        except Exception as e:
+            logger.error(f"Metadata store resync failed: {e}")
+
+
+def _parse_manifest_key(key: str) -> Optional[tuple[str, Optional[str]]]:
+    """Parse a repositories/ key into (repository, tag or None).
+
+    Returns None for keys that are not under a repository's _manifests tree.
+    """
+    rest = key[len("repositories/"):]
+    if "/_manifests/" not in rest:
+        return None
+    repository, tail = rest.split("/_manifests/", 1)
+    if repository.startswith("_proxy/"):
+        return None
+    if tail.startswith("tags/") and tail.endswith("/link"):
+        return repository, tail[len("tags/"):-len("/link")]
+    return repository, None
+
+
+async def _rebuild_main() -> None:
+    """Rebuild the configured metadata store from the bucket."""
+    from app.config import Config
+    from app.storage.s3 import S3Storage
+
+    config_path = os.getenv("CONFIG_PATH")
+    if config_path and os.path.exists(config_path):
+        config = Config.from_yaml(config_path)
+    else:
+        config = Config.from_env()
+
+    store = MetadataStore(config.metadata_store.path)
+    try:
+        await store.rebuild(S3Storage(config.s3))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python -m app.storage.metadata rebuild", file=sys.stderr)
+        sys.exit(2)
+    asyncio.run(_rebuild_main())
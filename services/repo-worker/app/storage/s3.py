@@ -7,16 +7,33 @@ import asyncio
 import hashlib
 import json
 import logging
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-from typing import AsyncIterator, Optional
+from typing import AsyncIterator, BinaryIO, Optional
 
 from aiobotocore.session import get_session
 from botocore.exceptions import ClientError
 
 from app.config import S3Config
+from app.metrics import instrument_s3_session
+from app.semver import sort_versions
+from app.storage.limiter import S3Limiter
+from app.storage.metadata import MetadataStore
+from app.tracing import span, trace_methods
 
 logger = logging.getLogger(__name__)
 
+# Part size for streamed uploads (S3 minimum is 5 MiB)
+_STREAM_PART_SIZE = 8 * 1024 * 1024
+
+# Largest object a single server-side CopyObject may copy, and the part size
+# used to copy anything bigger
+_MAX_COPY_SIZE = 5 * 1024 * 1024 * 1024
+_COPY_PART_SIZE = 1024 * 1024 * 1024
+
+# Object keys this instance recently wrote or saw, trusted by find_missing
+_KNOWN_KEYS_MAX = 10000
+
 # Global storage instance
 _storage: Optional["S3Storage"] = None
 
@@ -34,12 +51,32 @@ def set_storage(storage: "S3Storage") -> None:
     _storage = storage
 
 
+@trace_methods("s3")
 class S3Storage:
-    """S3-compatible storage backend."""
-
-    def __init__(self, config: S3Config):
+    """S3-compatible storage backend.
+
+    If a MetadataStore is attached, small metadata (tag links, repository
+    membership, chart versions, proxy cache entries) is written through to
+    it and read from it, falling back to S3 on misses.
+
+    If an S3Limiter is attached, every call waits for a slot in its
+    adaptive read/write/list pools.
+    """
+
+    def __init__(
+        self,
+        config: S3Config,
+        metadata: Optional[MetadataStore] = None,
+        limiter: Optional[S3Limiter] = None,
+    ):
         self.config = config
+        self.metadata = metadata
+        self.limiter = limiter
+        self._known_keys: OrderedDict[str, None] = OrderedDict()
         self._session = get_session()
+        if limiter is not None:
+            limiter.instrument(self._session)
+        instrument_s3_session(self._session)
 
     @asynccontextmanager
     async def _get_client(self):
@@ -74,10 +111,95 @@ class S3Storage:
                 else:
                     raise
 
+    async def list_keys(self, prefix: str, start_after: str = "") -> AsyncIterator[str]:
+        """Iterate over all object keys under a prefix, in key order."""
+        async with self._get_client() as client:
+            paginator = client.get_paginator("list_objects_v2")
+            extra = {"StartAfter": start_after} if start_after else {}
+            async for page in paginator.paginate(
+                Bucket=self.config.bucket, Prefix=prefix, **extra
+            ):
+                for obj in page.get("Contents", []):
+                    yield obj["Key"]
+
+    async def read_object(self, key: str) -> Optional[bytes]:
+        """Read a small object by key, or None if it does not exist."""
+        async with self._get_client() as client:
+            try:
+                response = await client.get_object(Bucket=self.config.bucket, Key=key)
+                async with response["Body"] as stream:
+                    return await stream.read()
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                    return None
+                raise
+
+    async def write_object(self, key: str, content: bytes, content_type: str) -> None:
+        """Write a small object by key."""
+        async with self._get_client() as client:
+            await client.put_object(
+                Bucket=self.config.bucket, Key=key, Body=content, ContentType=content_type
+            )
+
+    async def delete_object(self, key: str) -> None:
+        """Delete an object by key."""
+        async with self._get_client() as client:
+            await client.delete_object(Bucket=self.config.bucket, Key=key)
+
     # =========================================================================
     # Blob operations (content-addressable storage)
     # =========================================================================
 
+    def _remember(self, key: str) -> None:
+        """Record that an object exists, for find_missing."""
+        self._known_keys[key] = None
+        self._known_keys.move_to_end(key)
+        if len(self._known_keys) > _KNOWN_KEYS_MAX:
+            self._known_keys.popitem(last=False)
+
+    async def _object_exists(self, client, key: str) -> bool:
+        try:
+            await client.head_object(Bucket=self.config.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+
+    async def find_missing(
+        self, name: str, blobs: list[str], manifests: list[str]
+    ) -> list[str]:
+        """Get the digests of referenced blobs and manifests that are not stored.
+
+        Objects this instance recently wrote or found are trusted without a
+        request; the rest are checked with concurrent HEAD requests on one
+        client, so the check costs one round trip however many there are.
+
+        Args:
+            name: Repository the manifests must belong to
+            blobs: Blob digests
+            manifests: Manifest digests (children of an index)
+        """
+        keys = {self._blob_key(digest): digest for digest in blobs}
+        keys.update({
+            f"repositories/{name}/_manifests/revisions/{digest}/content": digest
+            for digest in manifests
+        })
+        unknown = [key for key in keys if key not in self._known_keys]
+        if not unknown:
+            return []
+
+        async with self._get_client() as client:
+            found = await asyncio.gather(*[self._object_exists(client, k) for k in unknown])
+
+        missing = []
+        for key, exists in zip(unknown, found):
+            if exists:
+                self._remember(key)
+            else:
+                missing.append(keys[key])
+        return missing
+
     def _blob_key(self, digest: str) -> str:
         """Get S3 key for a blob by digest."""
         # Format: blobs/sha256/ab/abcdef123...
@@ -89,6 +211,7 @@ class S3Storage:
         async with self._get_client() as client:
             try:
                 await client.head_object(Bucket=self.config.bucket, Key=self._blob_key(digest))
+                self._remember(self._blob_key(digest))
                 return True
             except ClientError as e:
                 if e.response.get("Error", {}).get("Code") == "404":
@@ -140,7 +263,8 @@ class S3Storage:
     async def put_blob(self, digest: str, content: bytes) -> None:
         """Store blob content."""
         # Verify digest matches content
-        computed = f"sha256:{hashlib.sha256(content).hexdigest()}"
+        with span("hash.sha256", size=len(content)):
+            computed = f"sha256:{hashlib.sha256(content).hexdigest()}"
         if digest != computed:
             raise ValueError(f"Digest mismatch: expected {digest}, got {computed}")
 
@@ -151,35 +275,180 @@ class S3Storage:
                 Body=content,
                 ContentType="application/octet-stream",
             )
+        self._remember(self._blob_key(digest))
 
     async def put_blob_stream(
         self, digest: str, stream: AsyncIterator[bytes], size: int
     ) -> None:
-        """Store blob from async stream."""
-        # For streaming uploads, we need to collect chunks and verify
-        chunks = []
+        """Store blob from async stream.
+
+        Blobs larger than one part go up as a multipart upload that is
+        only completed once the streamed content matches the digest, so
+        at most one part is held in memory.
+        """
+        if size <= _STREAM_PART_SIZE:
+            content = b"".join([chunk async for chunk in stream])
+            await self.put_blob(digest, content)
+            return
+
         hasher = hashlib.sha256()
+        upload_id = await self.start_blob_upload(digest)
+        parts: list[tuple[int, str]] = []
+        buffer = bytearray()
+        try:
+            async for chunk in stream:
+                hasher.update(chunk)
+                buffer += chunk
+                while len(buffer) >= _STREAM_PART_SIZE:
+                    number = len(parts) + 1
+                    etag = await self.put_blob_part(
+                        digest, upload_id, number, bytes(buffer[:_STREAM_PART_SIZE])
+                    )
+                    parts.append((number, etag))
+                    del buffer[:_STREAM_PART_SIZE]
+            if buffer or not parts:
+                number = len(parts) + 1
+                parts.append(
+                    (number, await self.put_blob_part(digest, upload_id, number, bytes(buffer)))
+                )
 
-        async for chunk in stream:
-            chunks.append(chunk)
-            hasher.update(chunk)
+            computed = f"sha256:{hasher.hexdigest()}"
+            if digest != computed:
+                raise ValueError(f"Digest mismatch: expected {digest}, got {computed}")
+            await self.complete_blob_upload(digest, upload_id, parts)
+        except BaseException:
+            await self.abort_blob_upload(digest, upload_id)
+            raise
 
-        content = b"".join(chunks)
-        computed = f"sha256:{hasher.hexdigest()}"
+    async def copy_blob_from(self, source: "S3Storage", digest: str, size: int) -> bool:
+        """Copy a blob from another bucket server-side, without downloading it.
 
-        if digest != computed:
-            raise ValueError(f"Digest mismatch: expected {digest}, got {computed}")
+        Only possible when both buckets live on the same S3 service; objects
+        over 5 GiB are copied as a multipart upload of ranged part copies.
 
+        Returns:
+            False if the source is on a different S3 service
+        """
+        if source.config.endpoint != self.config.endpoint:
+            return False
+
+        copy_source = {"Bucket": source.config.bucket, "Key": source._blob_key(digest)}
+        if size <= _MAX_COPY_SIZE:
+            async with self._get_client() as client:
+                await client.copy_object(
+                    Bucket=self.config.bucket,
+                    Key=self._blob_key(digest),
+                    CopySource=copy_source,
+                )
+            return True
+
+        upload_id = await self.start_blob_upload(digest)
+        parts: list[tuple[int, str]] = []
+        try:
+            async with self._get_client() as client:
+                for offset in range(0, size, _COPY_PART_SIZE):
+                    end = min(offset + _COPY_PART_SIZE, size) - 1
+                    response = await client.upload_part_copy(
+                        Bucket=self.config.bucket,
+                        Key=self._blob_key(digest),
+                        UploadId=upload_id,
+                        PartNumber=len(parts) + 1,
+                        CopySource=copy_source,
+                        CopySourceRange=f"bytes={offset}-{end}",
+                    )
+                    parts.append((len(parts) + 1, response["CopyPartResult"]["ETag"]))
+            await self.complete_blob_upload(digest, upload_id, parts)
+        except BaseException:
+            await self.abort_blob_upload(digest, upload_id)
+            raise
+        return True
+
+    async def put_blob_file(self, digest: str, fileobj: BinaryIO) -> None:
+        """Store a blob from a file object whose digest the caller verified.
+
+        Files larger than one part are sent as a multipart upload, so at
+        most two parts are held in memory.
+        """
+        chunk = fileobj.read(_STREAM_PART_SIZE)
+        following = fileobj.read(_STREAM_PART_SIZE)
+        if not following:
+            await self.put_blob(digest, chunk)
+            return
+
+        upload_id = await self.start_blob_upload(digest)
+        parts: list[tuple[int, str]] = []
+        try:
+            while chunk:
+                number = len(parts) + 1
+                etag = await self.put_blob_part(digest, upload_id, number, chunk)
+                parts.append((number, etag))
+                chunk, following = following, fileobj.read(_STREAM_PART_SIZE)
+            await self.complete_blob_upload(digest, upload_id, parts)
+        except BaseException:
+            await self.abort_blob_upload(digest, upload_id)
+            raise
+
+    async def start_blob_upload(self, digest: str) -> str:
+        """Start a multipart upload for a blob. Returns the upload ID.
+
+        The blob only becomes visible once complete_blob_upload is called,
+        so callers can verify the digest before committing.
+        """
         async with self._get_client() as client:
-            await client.put_object(
+            response = await client.create_multipart_upload(
                 Bucket=self.config.bucket,
                 Key=self._blob_key(digest),
-                Body=content,
                 ContentType="application/octet-stream",
             )
+        return response["UploadId"]
+
+    async def put_blob_part(
+        self, digest: str, upload_id: str, part_number: int, content: bytes
+    ) -> str:
+        """Upload one part of a multipart blob upload. Returns the part ETag."""
+        async with self._get_client() as client:
+            response = await client.upload_part(
+                Bucket=self.config.bucket,
+                Key=self._blob_key(digest),
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=content,
+            )
+        return response["ETag"]
+
+    async def complete_blob_upload(
+        self, digest: str, upload_id: str, parts: list[tuple[int, str]]
+    ) -> None:
+        """Complete a multipart blob upload from (part_number, etag) pairs."""
+        async with self._get_client() as client:
+            await client.complete_multipart_upload(
+                Bucket=self.config.bucket,
+                Key=self._blob_key(digest),
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": number, "ETag": etag}
+                        for number, etag in sorted(parts)
+                    ]
+                },
+            )
+        self._remember(self._blob_key(digest))
+
+    async def abort_blob_upload(self, digest: str, upload_id: str) -> None:
+        """Abort a multipart blob upload and discard its parts."""
+        async with self._get_client() as client:
+            try:
+                await client.abort_multipart_upload(
+                    Bucket=self.config.bucket,
+                    Key=self._blob_key(digest),
+                    UploadId=upload_id,
+                )
+            except ClientError as e:
+                logger.warning(f"Failed to abort upload {upload_id} for {digest}: {e}")
 
     async def delete_blob(self, digest: str) -> bool:
         """Delete a blob. Returns True if deleted, False if not found."""
+        self._known_keys.pop(self._blob_key(digest), None)
         async with self._get_client() as client:
             try:
                 await client.delete_object(Bucket=self.config.bucket, Key=self._blob_key(digest))
@@ -189,6 +458,36 @@ class S3Storage:
                     return False
                 raise
 
+    def digest_from_blob_key(self, key: str) -> Optional[str]:
+        """Get the digest a blobs/ key stores, or None for other keys."""
+        parts = key.split("/")
+        if len(parts) != 4 or parts[0] != "blobs":
+            return None
+        return f"{parts[1]}:{parts[3]}"
+
+    async def quarantine_blob(self, digest: str, reason: str) -> str:
+        """Move a blob aside so it is no longer served.
+
+        The object is copied server-side to ``quarantine/<blob key>`` with
+        the reason in its metadata, then deleted from the blob store.
+
+        Returns:
+            The quarantine key
+        """
+        key = self._blob_key(digest)
+        quarantine_key = f"quarantine/{key}"
+        self._known_keys.pop(key, None)
+        async with self._get_client() as client:
+            await client.copy_object(
+                Bucket=self.config.bucket,
+                Key=quarantine_key,
+                CopySource={"Bucket": self.config.bucket, "Key": key},
+                Metadata={"reason": reason[:1024]},
+                MetadataDirective="REPLACE",
+            )
+            await client.delete_object(Bucket=self.config.bucket, Key=key)
+        return quarantine_key
+
     # =========================================================================
     # Manifest operations
     # =========================================================================
@@ -207,38 +506,38 @@ class S3Storage:
     async def get_manifest(self, name: str, reference: str) -> Optional[tuple[bytes, str]]:
         """Get manifest by name and reference (tag or digest).
 
+        Tags are resolved from the metadata store when enabled, like tag
+        listings; a tag it does not know, or one whose manifest is gone,
+        is resolved from its link in S3.
+
         Returns (content, digest) or None if not found.
         """
-        async with self._get_client() as client:
-            # If reference is a tag, resolve to digest first
-            if not reference.startswith("sha256:"):
-                link_key = self._tag_link_key(name, reference)
-                try:
-                    response = await client.get_object(
-                        Bucket=self.config.bucket, Key=link_key
-                    )
-                    async with response["Body"] as stream:
-                        digest = (await stream.read()).decode().strip()
-                except ClientError as e:
-                    if e.response.get("Error", {}).get("Code") == "404":
-                        return None
-                    raise
-            else:
-                digest = reference
-
-            # Get manifest content
-            manifest_key = f"repositories/{name}/_manifests/revisions/{digest}/content"
-            try:
-                response = await client.get_object(
-                    Bucket=self.config.bucket, Key=manifest_key
-                )
-                async with response["Body"] as stream:
-                    content = await stream.read()
-                return content, digest
-            except ClientError as e:
-                if e.response.get("Error", {}).get("Code") == "404":
-                    return None
-                raise
+        if reference.startswith("sha256:"):
+            return await self._get_manifest_content(name, reference)
+
+        if self.metadata is not None:
+            known = self.metadata.get_tag(name, reference)
+            if known is not None:
+                manifest = await self._get_manifest_content(name, known)
+                if manifest is not None:
+                    return manifest
+
+        link = await self.read_object(self._tag_link_key(name, reference))
+        if link is None:
+            if self.metadata is not None:
+                self.metadata.delete_tag(name, reference)
+            return None
+        digest = link.decode().strip()
+        if self.metadata is not None:
+            self.metadata.set_tag(name, reference, digest)
+        return await self._get_manifest_content(name, digest)
+
+    async def _get_manifest_content(self, name: str, digest: str) -> Optional[tuple[bytes, str]]:
+        """Get manifest content by digest as (content, digest)."""
+        content = await self.read_object(
+            f"repositories/{name}/_manifests/revisions/{digest}/content"
+        )
+        return (content, digest) if content is not None else None
 
     async def put_manifest(self, name: str, reference: str, content: bytes) -> str:
         """Store manifest. Returns digest."""
@@ -253,6 +552,7 @@ class S3Storage:
                 Body=content,
                 ContentType="application/vnd.oci.image.manifest.v1+json",
             )
+            self._remember(manifest_key)
 
             # If reference is a tag, create tag -> digest link
             if not reference.startswith("sha256:"):
@@ -264,6 +564,11 @@ class S3Storage:
                     ContentType="text/plain",
                 )
 
+        if self.metadata is not None:
+            self.metadata.add_repository(name)
+            if not reference.startswith("sha256:"):
+                self.metadata.set_tag(name, reference, digest)
+
         return digest
 
     async def delete_manifest(self, name: str, reference: str) -> bool:
@@ -274,9 +579,12 @@ class S3Storage:
                 if not reference.startswith("sha256:"):
                     link_key = self._tag_link_key(name, reference)
                     await client.delete_object(Bucket=self.config.bucket, Key=link_key)
+                    if self.metadata is not None:
+                        self.metadata.delete_tag(name, reference)
                 else:
                     # Delete manifest content
                     manifest_key = f"repositories/{name}/_manifests/revisions/{reference}/content"
+                    self._known_keys.pop(manifest_key, None)
                     await client.delete_object(Bucket=self.config.bucket, Key=manifest_key)
                 return True
             except ClientError as e:
@@ -286,6 +594,9 @@ class S3Storage:
 
     async def list_tags(self, name: str) -> list[str]:
         """List all tags for a repository."""
+        if self.metadata is not None and self.metadata.is_ready():
+            return self.metadata.list_tags(name)
+
         async with self._get_client() as client:
             tags = []
             prefix = f"repositories/{name}/_manifests/tags/"
@@ -306,6 +617,9 @@ class S3Storage:
 
     async def list_repositories(self) -> list[str]:
         """List all repositories."""
+        if self.metadata is not None and self.metadata.is_ready():
+            return self.metadata.list_repositories()
+
         async with self._get_client() as client:
             repos = set()
             prefix = "repositories/"
@@ -338,21 +652,28 @@ class S3Storage:
         return f"charts/{name}/{name}-{version}.tgz"
 
     async def get_chart(self, name: str, version: str) -> Optional[bytes]:
-        """Get Helm chart content."""
-        async with self._get_client() as client:
-            try:
-                response = await client.get_object(
-                    Bucket=self.config.bucket, Key=self._chart_key(name, version)
-                )
-                async with response["Body"] as stream:
-                    return await stream.read()
-            except ClientError as e:
-                if e.response.get("Error", {}).get("Code") == "404":
-                    return None
-                raise
+        """Get Helm chart content.
+
+        Charts stored as OCI artifacts are read from the blob store by the
+        digest recorded in their metadata.
+        """
+        content = await self.read_object(self._chart_key(name, version))
+        if content is not None:
+            return content
 
-    async def put_chart(self, name: str, version: str, content: bytes) -> None:
-        """Store Helm chart."""
+        metadata = await self.get_chart_metadata(name, version)
+        if metadata and metadata.get("digest"):
+            return await self.get_blob(metadata["digest"])
+        return None
+
+    def _chart_metadata_key(self, name: str, version: str) -> str:
+        """Get S3 key for a chart's extracted metadata sidecar."""
+        return f"charts/{name}/{name}-{version}.json"
+
+    async def put_chart(
+        self, name: str, version: str, content: bytes, metadata: Optional[dict] = None
+    ) -> None:
+        """Store Helm chart, with its extracted metadata sidecar if known."""
         async with self._get_client() as client:
             await client.put_object(
                 Bucket=self.config.bucket,
@@ -361,21 +682,76 @@ class S3Storage:
                 ContentType="application/gzip",
             )
 
+        if metadata is not None:
+            await self.put_chart_metadata(name, version, metadata)
+        elif self.metadata is not None:
+            self.metadata.put_chart(name, version, None)
+
+    async def get_chart_metadata(self, name: str, version: str) -> Optional[dict]:
+        """Get extracted chart metadata, or None if it was never recorded.
+
+        Served from the metadata store when enabled, otherwise from the
+        sidecar object written at upload time.
+        """
+        if self.metadata is not None:
+            metadata = self.metadata.get_chart_metadata(name, version)
+            if metadata is not None:
+                return metadata
+
+        content = await self.read_object(self._chart_metadata_key(name, version))
+        if content is None:
+            return None
+        metadata = json.loads(content)
+        if self.metadata is not None:
+            self.metadata.put_chart(name, version, metadata)
+        return metadata
+
+    async def put_chart_metadata(self, name: str, version: str, metadata: dict) -> None:
+        """Record extracted metadata for a chart as a sidecar object."""
+        async with self._get_client() as client:
+            await client.put_object(
+                Bucket=self.config.bucket,
+                Key=self._chart_metadata_key(name, version),
+                Body=json.dumps(metadata).encode(),
+                ContentType="application/json",
+            )
+        if self.metadata is not None:
+            self.metadata.put_chart(name, version, metadata)
+
     async def delete_chart(self, name: str, version: str) -> bool:
-        """Delete Helm chart."""
+        """Delete Helm chart and its metadata sidecar.
+
+        For charts stored as OCI artifacts the version tag is removed; the
+        layer stays in the blob store for garbage collection.
+        """
+        metadata = await self.get_chart_metadata(name, version)
+        if metadata and metadata.get("ociRepository"):
+            await self.delete_manifest(metadata["ociRepository"], version.replace("+", "_"))
+
         async with self._get_client() as client:
             try:
                 await client.delete_object(
                     Bucket=self.config.bucket, Key=self._chart_key(name, version)
                 )
+                await client.delete_object(
+                    Bucket=self.config.bucket, Key=self._chart_metadata_key(name, version)
+                )
+                if self.metadata is not None:
+                    self.metadata.delete_chart(name, version)
                 return True
             except ClientError as e:
                 if e.response.get("Error", {}).get("Code") == "404":
                     return False
                 raise
 
-    async def list_charts(self) -> dict[str, list[str]]:
+    async def list_charts(self, use_metadata_store: bool = True) -> dict[str, list[str]]:
         """List all charts and their versions."""
+        if use_metadata_store and self.metadata is not None and self.metadata.is_ready():
+            return {
+                name: sort_versions(versions)
+                for name, versions in self.metadata.list_charts().items()
+            }
+
         async with self._get_client() as client:
             charts: dict[str, list[str]] = {}
             prefix = "charts/"
@@ -387,55 +763,100 @@ class S3Storage:
                 for obj in page.get("Contents", []):
                     key = obj["Key"]
                     # Extract chart name and version from key
-                    # Format: charts/{name}/{name}-{version}.tgz
+                    # Format: charts/{name}/{name}-{version}.tgz, or only the
+                    # .json sidecar for charts stored as OCI artifacts
                     parts = key[len(prefix):].split("/")
                     if len(parts) == 2:
                         chart_name = parts[0]
                         filename = parts[1]
-                        if filename.endswith(".tgz"):
-                            # Extract version from filename
-                            version = filename[len(chart_name) + 1:-4]  # Remove "{name}-" and ".tgz"
-                            if chart_name not in charts:
-                                charts[chart_name] = []
-                            charts[chart_name].append(version)
+                        for suffix in (".tgz", ".json"):
+                            if filename.endswith(suffix):
+                                # Remove "{name}-" and the suffix
+                                version = filename[len(chart_name) + 1:-len(suffix)]
+                                versions = charts.setdefault(chart_name, [])
+                                if version not in versions:
+                                    versions.append(version)
 
-            # Sort versions
-            for chart_name in charts:
-                charts[chart_name].sort()
-
-            return charts
+            return {name: sort_versions(versions) for name, versions in charts.items()}
 
     # =========================================================================
-    # Cache metadata operations
+    # Proxy cache operations
     # =========================================================================
 
-    async def get_cache_meta(
-        self, upstream: str, name: str, tag: str
-    ) -> Optional[dict]:
-        """Get cache metadata for a proxied image."""
-        key = f"cache/{upstream}/{name}/{tag}/meta.json"
+    def _cache_entry_key(self, upstream: str, name: str, reference: str) -> str:
+        """Get S3 key for a proxied manifest cache entry."""
+        return f"cache/{upstream}/{name}/{reference}/manifest"
+
+    async def get_cache_entry(
+        self, upstream: str, name: str, reference: str
+    ) -> Optional[tuple[bytes, str, dict[str, str]]]:
+        """Get a proxied manifest and its cache metadata in a single read.
+
+        Returns (content, content_type, metadata) or None if not cached.
+        """
+        key = self._cache_entry_key(upstream, name, reference)
+        if self.metadata is not None:
+            cached = self.metadata.get_cache_entry(key)
+            if cached is not None:
+                return cached
+
         async with self._get_client() as client:
             try:
-                response = await client.get_object(
-                    Bucket=self.config.bucket, Key=key
-                )
+                response = await client.get_object(Bucket=self.config.bucket, Key=key)
                 async with response["Body"] as stream:
                     content = await stream.read()
-                return json.loads(content)
+                content_type = response.get("ContentType", "")
+                meta = response.get("Metadata", {})
+                if self.metadata is not None:
+                    self.metadata.put_cache_entry(key, content, content_type, meta)
+                return content, content_type, meta
             except ClientError as e:
-                if e.response.get("Error", {}).get("Code") == "404":
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
                     return None
                 raise
 
-    async def put_cache_meta(
-        self, upstream: str, name: str, tag: str, meta: dict
+    async def put_cache_entry(
+        self,
+        upstream: str,
+        name: str,
+        reference: str,
+        content: bytes,
+        content_type: str,
+        meta: dict[str, str],
     ) -> None:
-        """Store cache metadata for a proxied image."""
-        key = f"cache/{upstream}/{name}/{tag}/meta.json"
+        """Store a proxied manifest together with its cache metadata."""
+        key = self._cache_entry_key(upstream, name, reference)
         async with self._get_client() as client:
             await client.put_object(
                 Bucket=self.config.bucket,
                 Key=key,
-                Body=json.dumps(meta).encode(),
-                ContentType="application/json",
+                Body=content,
+                ContentType=content_type or "application/vnd.oci.image.manifest.v1+json",
+                Metadata=meta,
             )
+
+        if self.metadata is not None:
+            self.metadata.put_cache_entry(key, content, content_type, meta)
+
+    async def update_cache_entry_meta(
+        self,
+        upstream: str,
+        name: str,
+        reference: str,
+        content_type: str,
+        meta: dict[str, str],
+    ) -> None:
+        """Replace cache metadata in place via server-side copy (no re-upload)."""
+        key = self._cache_entry_key(upstream, name, reference)
+        async with self._get_client() as client:
+            await client.copy_object(
+                Bucket=self.config.bucket,
+                Key=key,
+                CopySource={"Bucket": self.config.bucket, "Key": key},
+                ContentType=content_type or "application/vnd.oci.image.manifest.v1+json",
+                Metadata=meta,
+                MetadataDirective="REPLACE",
+            )
+
+        if self.metadata is not None:
+            self.metadata.update_cache_meta(key, meta)
@@ -0,0 +1,304 @@
+"""Background integrity scrubber for stored blobs.
+
+Walks ``blobs/`` in key order, streams each blob and re-hashes it. A blob
+whose content does not match its digest is moved to ``quarantine/`` so
+it is never served again; for blobs the pull-through proxy cached, the
+content is then pulled again from the upstream that served it.
+
+A second phase reads every manifest (local revisions and proxy cache
+entries) and compares descriptor sizes with the stored blobs, catching
+truncated objects and blobs lost from under a manifest.
+
+Reads are paced by a byte budget and hashing by a CPU duty cycle, so a
+pass over a large bucket takes long but never competes with serving.
+Progress is saved to ``_scrubber/cursor`` in the bucket; after a restart
+the pass resumes from the last saved key.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Optional
+
+from app.bandwidth import TokenBucket
+from app.config import ScrubberConfig
+from app.metrics import (
+    SCRUB_BLOBS,
+    SCRUB_BYTES,
+    SCRUB_ERRORS,
+    SCRUB_LAST_PASS,
+    SCRUB_REFETCHES,
+)
+
+if TYPE_CHECKING:
+    from app.proxy.proxy import ProxyHandler
+    from app.storage.s3 import S3Storage
+
+logger = logging.getLogger(__name__)
+
+CURSOR_KEY = "_scrubber/cursor"
+
+# Budget charged for each descriptor HEAD and manifest read
+_REQUEST_COST = 64 * 1024
+
+# Quarantined digests remembered for re-fetching across restarts
+_MAX_QUARANTINED = 10000
+
+
+@dataclass
+class ScrubCursor:
+    """Position of the current pass, persisted between restarts."""
+    phase: str = "blobs"  # blobs, manifests
+    last_key: str = ""
+    started: float = 0.0
+    quarantined: list[str] = field(default_factory=list)
+
+
+class Scrubber:
+    """Re-verifies stored blobs within an I/O and CPU budget."""
+
+    def __init__(
+        self,
+        storage: "S3Storage",
+        config: ScrubberConfig,
+        proxy: Optional["ProxyHandler"] = None,
+    ):
+        self.storage = storage
+        self.config = config
+        self.proxy = proxy
+        rate = max(config.max_mbps, 0.1) * 1024 * 1024 / 8
+        self._bucket = TokenBucket(rate, rate)
+        self._cpu_percent = min(max(config.cpu_percent, 1), 100)
+        self.cursor = ScrubCursor()
+        self._cursor_saved = 0.0
+
+    async def run(self) -> None:
+        """Scrub forever, pausing between passes."""
+        while True:
+            try:
+                await self.scrub_pass()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scrub pass failed: {e}")
+            await asyncio.sleep(self.config.pass_interval_hours * 3600)
+
+    async def scrub_pass(self) -> None:
+        """Run (or resume) one full pass over blobs and then manifests."""
+        self.cursor = await self._load_cursor()
+        if not self.cursor.started:
+            self.cursor.started = time.time()
+        logger.info(
+            f"Scrub pass resuming in {self.cursor.phase} after "
+            f"{self.cursor.last_key or 'the start'}"
+        )
+
+        if self.cursor.phase == "blobs":
+            async for key in self.storage.list_keys("blobs/", self.cursor.last_key):
+                digest = self.storage.digest_from_blob_key(key)
+                if digest is not None:
+                    await self.scrub_blob(digest)
+                self.cursor.last_key = key
+                await self._maybe_save_cursor()
+            self.cursor.phase, self.cursor.last_key = "manifests", ""
+            await self._save_cursor()
+
+        if self.config.check_descriptors:
+            # Prefixes in key order, so the cursor says which are done
+            for prefix in ("cache/", "repositories/"):
+                last_key = self.cursor.last_key
+                if last_key > prefix and not last_key.startswith(prefix):
+                    continue
+                start = last_key if last_key.startswith(prefix) else ""
+                async for key in self.storage.list_keys(prefix, start):
+                    await self._check_manifest_key(key)
+                    self.cursor.last_key = key
+                    await self._maybe_save_cursor()
+
+        logger.info(
+            f"Scrub pass finished in {time.time() - self.cursor.started:.0f}s, "
+            f"{len(self.cursor.quarantined)} blobs quarantined"
+        )
+        self.cursor = ScrubCursor()
+        await self._save_cursor()
+        SCRUB_LAST_PASS.set_to_current_time()
+
+    # =========================================================================
+    # Blob verification
+    # =========================================================================
+
+    async def scrub_blob(self, digest: str) -> bool:
+        """Re-hash a stored blob, quarantining it on a mismatch.
+
+        Returns:
+            False if the blob was quarantined, True otherwise
+        """
+        algorithm, expected = digest.split(":", 1)
+        try:
+            hasher = hashlib.new(algorithm)
+        except ValueError:
+            return True
+
+        try:
+            async for chunk in self.storage.get_blob_stream(digest):
+                await self._throttle(len(chunk))
+                started = time.thread_time()
+                hasher.update(chunk)
+                await self._duty_cycle(time.thread_time() - started)
+                SCRUB_BYTES.inc(len(chunk))
+        except Exception as e:
+            logger.warning(f"Scrub could not read {digest}: {e}")
+            SCRUB_BLOBS.labels("read_error").inc()
+            return True
+
+        if hasher.hexdigest() == expected:
+            SCRUB_BLOBS.labels("ok").inc()
+            return True
+
+        # A blob deleted while it was listed reads as empty
+        if await self.storage.get_blob_size(digest) is None:
+            SCRUB_BLOBS.labels("vanished").inc()
+            return True
+
+        SCRUB_ERRORS.labels("digest_mismatch").inc()
+        await self._quarantine(digest, f"content hashes to {algorithm}:{hasher.hexdigest()}")
+        return False
+
+    async def _quarantine(self, digest: str, reason: str) -> None:
+        """Move a corrupt blob aside and remember it for re-fetching."""
+        key = await self.storage.quarantine_blob(digest, reason)
+        logger.error(f"Quarantined {digest} to {key}: {reason}")
+        SCRUB_BLOBS.labels("quarantined").inc()
+        if digest not in self.cursor.quarantined:
+            self.cursor.quarantined.append(digest)
+            del self.cursor.quarantined[:-_MAX_QUARANTINED]
+        await self._save_cursor()
+
+    async def _throttle(self, amount: int) -> None:
+        """Wait off the I/O budget for ``amount`` bytes."""
+        delay = self._bucket.reserve(amount)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _duty_cycle(self, busy: float) -> None:
+        """Idle long enough that hashing stays within the CPU share."""
+        if self._cpu_percent < 100 and busy > 0:
+            await asyncio.sleep(busy * (100 / self._cpu_percent - 1))
+
+    # =========================================================================
+    # Manifest descriptors
+    # =========================================================================
+
+    async def _check_manifest_key(self, key: str) -> None:
+        """Check one manifest object, if ``key`` is one."""
+        if key.startswith("repositories/"):
+            if "/_manifests/revisions/" not in key or not key.endswith("/content"):
+                return
+            source = None
+        else:
+            source = _parse_cache_key(key)
+            if source is None:
+                return
+
+        await self._throttle(_REQUEST_COST)
+        content = await self.storage.read_object(key)
+        if content is None:
+            return
+        try:
+            manifest = json.loads(content)
+        except ValueError:
+            return
+        if not isinstance(manifest, dict):
+            return
+
+        descriptors = list(manifest.get("layers") or [])
+        if isinstance(manifest.get("config"), dict):
+            descriptors.append(manifest["config"])
+
+        for descriptor in descriptors:
+            if not isinstance(descriptor, dict) or "digest" not in descriptor:
+                continue
+            digest = descriptor["digest"]
+            if source is not None and digest in self.cursor.quarantined:
+                await self._refetch(source, digest)
+                continue
+            await self._check_descriptor(key, digest, descriptor.get("size"), local=source is None)
+
+    async def _check_descriptor(
+        self, key: str, digest: str, size: Optional[int], local: bool
+    ) -> None:
+        """Compare a descriptor's size with the stored blob."""
+        await self._throttle(_REQUEST_COST)
+        stored = await self.storage.get_blob_size(digest)
+        if stored is None:
+            # Proxy blobs are only stored once pulled
+            if local:
+                SCRUB_ERRORS.labels("missing_blob").inc()
+                logger.error(f"{key} references missing blob {digest}")
+            return
+        if size is None or stored == size:
+            return
+
+        SCRUB_ERRORS.labels("size_mismatch").inc()
+        logger.error(f"{key} lists {digest} as {size} bytes, stored blob is {stored}")
+        await self.scrub_blob(digest)
+
+    async def _refetch(self, source: tuple[str, str], digest: str) -> None:
+        """Pull a quarantined proxy blob again from its upstream."""
+        if self.proxy is None or not self.config.refetch_proxy:
+            return
+        if await self.storage.get_blob_size(digest) is not None:
+            self.cursor.quarantined.remove(digest)
+            return
+
+        upstream, image = source
+        try:
+            cached = await self.proxy.cache_blob(upstream, image, digest)
+        except Exception as e:
+            logger.warning(f"Re-fetch of {digest} from {upstream} failed: {e}")
+            cached = False
+        if not cached:
+            SCRUB_REFETCHES.labels("failed").inc()
+            return
+
+        SCRUB_REFETCHES.labels("ok").inc()
+        logger.info(f"Re-fetched quarantined {digest} from {upstream}/{image}")
+        self.cursor.quarantined.remove(digest)
+
+    # =========================================================================
+    # Cursor persistence
+    # =========================================================================
+
+    async def _load_cursor(self) -> ScrubCursor:
+        content = await self.storage.read_object(CURSOR_KEY)
+        if content is None:
+            return ScrubCursor()
+        try:
+            return ScrubCursor(**json.loads(content))
+        except (ValueError, TypeError):
+            logger.warning("Ignoring unreadable scrub cursor")
+            return ScrubCursor()
+
+    async def _save_cursor(self) -> None:
+        await self.storage.write_object(
+            CURSOR_KEY, json.dumps(asdict(self.cursor)).encode(), "application/json"
+        )
+        self._cursor_saved = time.monotonic()
+
+    async def _maybe_save_cursor(self) -> None:
+        if time.monotonic() - self._cursor_saved >= self.config.cursor_save_seconds:
+            await self._save_cursor()
+
+
+def _parse_cache_key(key: str) -> Optional[tuple[str, str]]:
+    """Parse a proxy cache entry key into (upstream, image).
+
+    Returns None for other keys under cache/ (e.g. Helm index entries).
+    """
+    parts = key.split("/")
+    if len(parts) < 5 or parts[-1] != "manifest" or parts[1].startswith("_"):
+        return None
+    return parts[1], "/".join(parts[2:-2])
@@ -0,0 +1,282 @@
+"""Optional OpenTelemetry tracing.
+
+Spans cover each HTTP route, every public ``S3Storage`` and
+``UpstreamRegistry`` call (token exchange included) and CPU-bound steps
+such as hashing and tar extraction, so a slow pull shows which of them
+took the time. The W3C ``traceparent`` header is read from incoming
+requests and sent on upstream and peer requests; sampling follows the
+parent's decision, otherwise ``sample_ratio``.
+
+Exporters:
+
+- ``file``: one JSON span per line in ``file_path``, for local analysis
+- ``memory``: kept in process, read back with ``finished_spans()``
+- ``otlp``: OTLP/HTTP to ``otlp_endpoint`` (needs the OTLP exporter)
+
+Tracing needs the ``opentelemetry-sdk`` package. When it is disabled
+every hook is a check of one global: ``span()`` returns a shared no-op
+context manager and traced methods call straight through.
+"""
+
+import contextlib
+import functools
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Optional, Sequence
+
+try:
+    from opentelemetry import context as otel_context, propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        SimpleSpanProcessor,
+        SpanExportResult,
+    )
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:  # Optional: only needed when tracing is enabled
+    trace = None
+
+from app.config import TracingConfig
+
+logger = logging.getLogger(__name__)
+
+_NOOP = contextlib.nullcontext()
+
+# Active tracer (None when tracing is disabled)
+_tracer = None
+_provider = None
+_memory_exporter = None
+
+
+def enabled() -> bool:
+    """Whether spans are being recorded."""
+    return _tracer is not None
+
+
+class JsonLinesExporter:
+    """Span exporter appending finished spans to a file, one JSON per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence) -> "SpanExportResult":
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning(f"Writing spans to {self.path} failed: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+    def shutdown(self) -> None:
+        pass
+
+
+def setup_tracing(config: TracingConfig) -> bool:
+    """Start recording spans if tracing is enabled and available.
+
+    Returns:
+        True if tracing is active
+    """
+    global _tracer, _provider, _memory_exporter
+    if not config.enabled:
+        return False
+    if trace is None:
+        logger.warning("Tracing enabled but opentelemetry-sdk is not installed")
+        return False
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": config.service_name}),
+        sampler=ParentBased(TraceIdRatioBased(config.sample_ratio)),
+    )
+    if config.exporter == "memory":
+        _memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(_memory_exporter))
+    elif config.exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                OTLPSpanExporter,
+            )
+        except ImportError:
+            logger.warning("OTLP exporter requires opentelemetry-exporter-otlp-proto-http")
+            return False
+        provider.add_span_processor(
+            BatchSpanProcessor(OTLPSpanExporter(endpoint=config.otlp_endpoint or None))
+        )
+    else:
+        provider.add_span_processor(BatchSpanProcessor(JsonLinesExporter(config.file_path)))
+
+    _provider = provider
+    _tracer = provider.get_tracer("repo-worker")
+    logger.info(
+        f"Tracing enabled: exporter={config.exporter}, sample_ratio={config.sample_ratio}"
+    )
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans and stop recording."""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = None
+
+
+def finished_spans() -> list:
+    """Spans recorded by the memory exporter."""
+    return list(_memory_exporter.get_finished_spans()) if _memory_exporter else []
+
+
+# =============================================================================
+# Spans
+# =============================================================================
+
+
+def span(name: str, **attributes: Any):
+    """Context manager recording a span around a block of code."""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def traced(name: str, attributes: Optional[Callable[[Any], dict]] = None):
+    """Decorate a coroutine or async generator method to record a span.
+
+    ``attributes`` is called with the instance to label the span, e.g.
+    with the upstream name.
+    """
+    def decorate(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return func(*args, **kwargs)
+                return _traced_generator(
+                    name, attributes(args[0]) if attributes else {}, func(*args, **kwargs)
+                )
+            return generator_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return await func(*args, **kwargs)
+            with _tracer.start_as_current_span(
+                name, attributes=attributes(args[0]) if attributes else None
+            ):
+                return await func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+async def _traced_generator(name: str, attributes: dict, generator):
+    # Not made current: a generator may be resumed from another context,
+    # which could not detach it
+    current = _tracer.start_span(name, attributes=attributes)
+    try:
+        async for item in generator:
+            yield item
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        current.record_exception(e)
+        current.set_status(trace.StatusCode.ERROR)
+        raise
+    finally:
+        await generator.aclose()
+        current.end()
+
+
+def trace_methods(prefix: str, attributes: Optional[Callable[[Any], dict]] = None):
+    """Class decorator recording a span for every public async method."""
+    def decorate(cls):
+        for method_name, method in list(vars(cls).items()):
+            if method_name.startswith("_"):
+                continue
+            if inspect.iscoroutinefunction(method) or inspect.isasyncgenfunction(method):
+                setattr(cls, method_name, traced(f"{prefix}.{method_name}", attributes)(method))
+        return cls
+
+    return decorate
+
+
+# =============================================================================
+# Propagation
+# =============================================================================
+
+
+def start_request_span(name: str, method: str, headers) -> Optional[tuple]:
+    """Start the server span of an HTTP request, continuing a ``traceparent``.
+
+    Returns:
+        (span, context token) to pass to ``end_request_span``, or None
+    """
+    if _tracer is None:
+        return None
+    parent = propagate.extract(headers)
+    current = _tracer.start_span(
+        f"{method} {name}",
+        context=parent,
+        kind=trace.SpanKind.SERVER,
+        attributes={"http.request.method": method, "http.route": name},
+    )
+    token = otel_context.attach(trace.set_span_in_context(current, parent))
+    return current, token
+
+
+def end_request_span(started: tuple, status: Optional[int], error=None) -> None:
+    """End a span started by ``start_request_span``."""
+    current, token = started
+    if status is not None:
+        current.set_attribute("http.response.status_code", status)
+        if status >= 500:
+            current.set_status(trace.StatusCode.ERROR)
+    if error is not None:
+        current.record_exception(error)
+        current.set_status(trace.StatusCode.ERROR)
+    current.end()
+    otel_context.detach(token)
+
+
+def client_trace_configs() -> list:
+    """aiohttp trace configs recording client spans and sending ``traceparent``."""
+    if _tracer is None:
+        return []
+    import aiohttp
+
+    async def on_request_start(session, ctx, params):
+        ctx.span = _tracer.start_span(
+            f"{params.method} {params.url.host}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={
+                "http.request.method": params.method,
+                "server.address": params.url.host or "",
+                "url.path": params.url.path,
+            },
+        )
+        propagate.inject(params.headers, context=trace.set_span_in_context(ctx.span))
+
+    async def on_request_end(session, ctx, params):
+        ctx.span.set_attribute("http.response.status_code", params.response.status)
+        if params.response.status >= 500:
+            ctx.span.set_status(trace.StatusCode.ERROR)
+        ctx.span.end()
+
+    async def on_request_exception(session, ctx, params):
+        ctx.span.record_exception(params.exception)
+        ctx.span.set_status(trace.StatusCode.ERROR)
+        ctx.span.end()
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return [trace_config]
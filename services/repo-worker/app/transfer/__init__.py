@@ -0,0 +1,5 @@
+"""Air-gapped transfer of images as OCI image-layout bundles."""
+
+from app.transfer.routes import transfer_bp
+
+__all__ = ["transfer_bp"]
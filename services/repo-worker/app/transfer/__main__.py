@@ -0,0 +1,90 @@
+"""Export and import OCI layout bundles directly against the configured bucket.
+
+    python -m app.transfer export -o bundle.tar.zst --compression zstd team/app:v1 team/lib
+    python -m app.transfer import bundle.tar.zst [--repository team/app]
+
+Uses the same configuration as the service (CONFIG_PATH or environment),
+so bundles move at disk and S3 speed without going through the HTTP API.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from typing import AsyncIterator
+
+from app.config import Config
+from app.storage.s3 import S3Storage
+from app.transfer.layout import (
+    COMPRESSIONS,
+    LayoutError,
+    compress_stream,
+    import_layout,
+    plan_export,
+    stream_layout,
+)
+
+logger = logging.getLogger(__name__)
+
+_READ_SIZE = 1024 * 1024
+
+
+def _load_storage() -> S3Storage:
+    config_path = os.getenv("CONFIG_PATH")
+    if config_path and os.path.exists(config_path):
+        config = Config.from_yaml(config_path)
+    else:
+        config = Config.from_env()
+    return S3Storage(config.s3)
+
+
+async def _export(args: argparse.Namespace) -> None:
+    storage = _load_storage()
+    plan = await plan_export(storage, args.refs)
+    logger.info(f"Exporting {len(plan.index)} images, {len(plan.blobs)} blobs ({plan.size} bytes)")
+    with open(args.output, "wb") as f:
+        async for chunk in compress_stream(stream_layout(storage, plan), args.compression):
+            await asyncio.to_thread(f.write, chunk)
+
+
+async def _read_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, _READ_SIZE):
+            yield chunk
+
+
+async def _import(args: argparse.Namespace) -> None:
+    result = await import_layout(_load_storage(), _read_file(args.bundle), args.repository)
+    for repository, reference, digest in result.images:
+        logger.info(f"Imported {repository}:{reference} ({digest})")
+    logger.info(
+        f"{result.blobs_written} blobs written ({result.bytes_written} bytes), "
+        f"{result.blobs_skipped} already present"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.transfer")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Write repositories to a bundle")
+    export.add_argument("refs", nargs="+", help="repo, repo:tag or repo@digest")
+    export.add_argument("-o", "--output", required=True)
+    export.add_argument("--compression", choices=COMPRESSIONS, default="none")
+
+    imports = commands.add_parser("import", help="Load a bundle into storage")
+    imports.add_argument("bundle")
+    imports.add_argument("--repository", default="", help="For images the bundle does not name")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_export(args) if args.command == "export" else _import(args))
+    except LayoutError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""Streaming OCI image-layout bundles for air-gapped transfers.
+
+A bundle is an OCI image layout as a tar stream, optionally zstd- or
+gzip-compressed:
+
+    oci-layout
+    blobs/sha256/<hex>     manifests, configs and layers, each exactly once
+    index.json             one entry per exported tag
+
+Export resolves every manifest up front (so a missing blob fails the
+request before any bytes are sent), then streams each blob straight from
+storage into the tar. Import parses the tar as it arrives and writes each
+blob with a multipart upload whose parts are sent in parallel and which is
+only completed once the sha256 matches, so memory stays at a few parts no
+matter how large the bundle is. Tags are created from index.json once all
+blobs are in.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import tarfile
+import zlib
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from app.helm.charts import OCI_MANIFEST_MEDIA_TYPE, record_oci_chart
+from app.storage.s3 import S3Storage
+from app.tracing import traced
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for zstd bundles
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Annotations on index.json entries
+REF_NAME_ANNOTATION = "org.opencontainers.image.ref.name"
+IMAGE_NAME_ANNOTATION = "io.containerd.image.name"
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+_BLOCK = 512
+_PART_SIZE = 8 * 1024 * 1024
+_IMPORT_CONCURRENCY = 4  # Parts of one blob uploaded at once
+_MAX_INDEX_SIZE = 16 * 1024 * 1024
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class LayoutError(Exception):
+    """An export cannot be built or an imported bundle is invalid."""
+
+
+def parse_reference(reference: str) -> tuple[str, Optional[str]]:
+    """Split ``repo``, ``repo:tag`` or ``repo@sha256:...`` into (repo, ref)."""
+    if "@" in reference:
+        repository, digest = reference.split("@", 1)
+        return repository, digest
+    repository, _, tag = reference.rpartition(":")
+    if not repository or "/" in tag:
+        return reference, None
+    return repository, tag
+
+
+# =============================================================================
+# Export
+# =============================================================================
+
+
+@dataclass
+class ExportPlan:
+    """Everything an export will write, resolved before streaming starts."""
+    index: list[dict] = field(default_factory=list)
+    manifests: dict[str, bytes] = field(default_factory=dict)  # digest -> content
+    blobs: dict[str, int] = field(default_factory=dict)  # digest -> size
+
+    @property
+    def size(self) -> int:
+        """Total bytes of blob content in the bundle."""
+        return sum(len(m) for m in self.manifests.values()) + sum(self.blobs.values())
+
+
+async def plan_export(storage: S3Storage, references: list[str]) -> ExportPlan:
+    """Resolve references (all tags of a repository if none given).
+
+    Raises:
+        LayoutError: If a reference, manifest or blob does not exist
+    """
+    plan = ExportPlan()
+    for reference in references:
+        repository, ref = parse_reference(reference)
+        refs = [ref] if ref else await storage.list_tags(repository)
+        if not refs:
+            raise LayoutError(f"{repository} has no tags")
+        for ref in refs:
+            result = await storage.get_manifest(repository, ref)
+            if result is None:
+                raise LayoutError(f"{repository}:{ref} not found")
+            content, digest = result
+            media_type = await _add_manifest(storage, plan, repository, digest, content)
+            annotations = {IMAGE_NAME_ANNOTATION: f"{repository}@{digest}"}
+            if not ref.startswith("sha256:"):
+                annotations = {
+                    REF_NAME_ANNOTATION: ref,
+                    IMAGE_NAME_ANNOTATION: f"{repository}:{ref}",
+                }
+            plan.index.append({
+                "mediaType": media_type,
+                "digest": digest,
+                "size": len(content),
+                "annotations": annotations,
+            })
+
+    missing = [digest for digest, size in plan.blobs.items() if size is None]
+    if missing:
+        raise LayoutError(f"{len(missing)} blobs missing from storage, e.g. {missing[0]}")
+    return plan
+
+
+async def _add_manifest(
+    storage: S3Storage, plan: ExportPlan, repository: str, digest: str, content: bytes
+) -> str:
+    """Add a manifest, its children and its blobs to a plan. Returns its media type."""
+    document = json.loads(content)
+    if digest not in plan.manifests:
+        plan.manifests[digest] = content
+
+        for child in document.get("manifests") or []:
+            result = await storage.get_manifest(repository, child["digest"])
+            if result is None:
+                raise LayoutError(f"{repository}@{child['digest']} not found")
+            await _add_manifest(storage, plan, repository, child["digest"], result[0])
+
+        blobs = [document["config"]["digest"]] if "config" in document else []
+        blobs += [layer["digest"] for layer in document.get("layers") or []]
+        blobs = [b for b in blobs if b not in plan.blobs and b not in plan.manifests]
+        sizes = await asyncio.gather(*[storage.get_blob_size(b) for b in blobs])
+        plan.blobs.update(zip(blobs, sizes))
+    return document.get("mediaType") or OCI_MANIFEST_MEDIA_TYPE
+
+
+_OCI_LAYOUT = json.dumps({"imageLayoutVersion": "1.0.0"}).encode()
+
+
+def _blob_name(digest: str) -> str:
+    return f"blobs/sha256/{digest.split(':', 1)[1]}"
+
+
+def _index_document(plan: ExportPlan) -> bytes:
+    return json.dumps({
+        "schemaVersion": 2,
+        "mediaType": "application/vnd.oci.image.index.v1+json",
+        "manifests": plan.index,
+    }).encode()
+
+
+def _tar_header(name: str, size: int) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT)
+
+
+def _tar_padding(size: int) -> bytes:
+    return b"\0" * (-size % _BLOCK)
+
+
+def _tar_entry(name: str, content: bytes) -> bytes:
+    return _tar_header(name, len(content)) + content + _tar_padding(len(content))
+
+
+def layout_size(plan: ExportPlan) -> int:
+    """Exact size of the uncompressed tar stream_layout yields for a plan."""
+    entries = [("oci-layout", len(_OCI_LAYOUT)), ("index.json", len(_index_document(plan)))]
+    entries += [(_blob_name(d), len(c)) for d, c in plan.manifests.items()]
+    entries += [(_blob_name(d), size) for d, size in plan.blobs.items()]
+    return sum(
+        len(_tar_header(name, size)) + size + len(_tar_padding(size))
+        for name, size in entries
+    ) + _BLOCK * 2
+
+
+async def stream_layout(storage: S3Storage, plan: ExportPlan) -> AsyncIterator[bytes]:
+    """Yield a plan as an uncompressed OCI layout tar stream."""
+    yield _tar_entry("oci-layout", _OCI_LAYOUT)
+
+    for digest, content in plan.manifests.items():
+        yield _tar_entry(_blob_name(digest), content)
+
+    for digest, size in plan.blobs.items():
+        yield _tar_header(_blob_name(digest), size)
+        sent = 0
+        async for chunk in storage.get_blob_stream(digest):
+            sent += len(chunk)
+            yield chunk
+        if sent != size:
+            # Headers are already out; a short entry would corrupt the tar
+            raise LayoutError(f"Blob {digest} changed size during export")
+        yield _tar_padding(size)
+
+    yield _tar_entry("index.json", _index_document(plan))
+    yield b"\0" * (_BLOCK * 2)
+
+
+def check_compression(compression: str) -> None:
+    """Check a compression can be used before a stream is started.
+
+    Raises:
+        LayoutError: If it is unknown, or zstd without zstandard installed
+    """
+    if compression not in COMPRESSIONS:
+        raise LayoutError(f"Unknown compression {compression}, use one of {COMPRESSIONS}")
+    if compression == "zstd" and zstandard is None:
+        raise LayoutError("zstd compression requires the zstandard package")
+
+
+async def compress_stream(
+    stream: AsyncIterator[bytes], compression: str
+) -> AsyncIterator[bytes]:
+    """Compress a byte stream with gzip or zstd ("none" passes it through)."""
+    check_compression(compression)
+    if compression == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    elif compression == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        async for chunk in stream:
+            yield chunk
+        return
+
+    async for chunk in stream:
+        compressed = await asyncio.to_thread(compressor.compress, chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+# =============================================================================
+# Import
+# =============================================================================
+
+
+@dataclass
+class ImportResult:
+    """Summary of an imported bundle."""
+    blobs_written: int = 0
+    blobs_skipped: int = 0  # Already present in storage
+    bytes_written: int = 0
+    images: list[tuple[str, str, str]] = field(default_factory=list)  # repo, ref, digest
+
+
+class _StreamReader:
+    """Exact-size reads over an async byte stream, decompressing if needed."""
+
+    def __init__(self, stream: AsyncIterator[bytes]):
+        self._stream = stream.__aiter__()
+        self._buffer = bytearray()
+        self._decompressor = None
+        self._started = False
+        self._eof = False
+
+    async def _fill(self) -> bool:
+        """Append more decompressed data to the buffer; False at end of stream."""
+        while not self._eof:
+            try:
+                chunk = await self._stream.__anext__()
+            except StopAsyncIteration:
+                self._eof = True
+                if self._decompressor is not None and hasattr(self._decompressor, "flush"):
+                    self._buffer += self._decompressor.flush()
+                return False
+            if not self._started:
+                self._started = True
+                self._decompressor = self._detect(chunk)
+            if self._decompressor is not None:
+                chunk = await asyncio.to_thread(self._decompressor.decompress, chunk)
+            if chunk:
+                self._buffer += chunk
+                return True
+        return False
+
+    @staticmethod
+    def _detect(chunk: bytes):
+        if chunk.startswith(_ZSTD_MAGIC):
+            if zstandard is None:
+                raise LayoutError("zstd bundles require the zstandard package")
+            return zstandard.ZstdDecompressor().decompressobj()
+        if chunk.startswith(_GZIP_MAGIC):
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return None
+
+    async def read(self, size: int) -> bytes:
+        """Read exactly ``size`` bytes.
+
+        Raises:
+            LayoutError: If the stream ends first
+        """
+        while len(self._buffer) < size:
+            if not await self._fill():
+                raise LayoutError("Bundle ended unexpectedly")
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    async def at_end(self) -> bool:
+        """Check if the stream has no more data."""
+        return not self._buffer and not await self._fill()
+
+
+def _parse_pax(data: bytes) -> dict[str, str]:
+    """Parse PAX extended header records ("<len> key=value\\n")."""
+    records = {}
+    while data:
+        length_field = data.partition(b" ")[0]
+        length = int(length_field)
+        record = data[len(length_field) + 1:length].rstrip(b"\n")
+        key, _, value = record.partition(b"=")
+        records[key.decode()] = value.decode("utf-8", "surrogateescape")
+        data = data[length:]
+    return records
+
+
+@traced("layout.import")
+async def import_layout(
+    storage: S3Storage, stream: AsyncIterator[bytes], repository: str = ""
+) -> ImportResult:
+    """Import an OCI layout bundle from a (possibly compressed) tar stream.
+
+    Args:
+        storage: Storage backend
+        stream: Bundle bytes
+        repository: Repository for index entries without an image name
+            annotation (required for bundles from other tools)
+
+    Raises:
+        LayoutError: If the bundle is malformed or a blob fails verification
+    """
+    reader = _StreamReader(stream)
+    result = ImportResult()
+    index: Optional[bytes] = None
+    long_name: Optional[str] = None
+
+    while not await reader.at_end():
+        block = await reader.read(_BLOCK)
+        if block == b"\0" * _BLOCK:
+            break
+        try:
+            info = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+        except tarfile.HeaderError as e:
+            raise LayoutError(f"Invalid tar header: {e}") from None
+        padding = -info.size % _BLOCK
+
+        if info.type in (tarfile.XHDTYPE, tarfile.GNUTYPE_LONGNAME):
+            data = await reader.read(info.size)
+            await reader.read(padding)
+            if info.type == tarfile.XHDTYPE:
+                long_name = _parse_pax(data).get("path", long_name)
+            else:
+                long_name = data.rstrip(b"\0").decode("utf-8", "surrogateescape")
+            continue
+
+        name = (long_name or info.name).removeprefix("./")
+        long_name = None
+
+        if info.isfile() and name.startswith("blobs/sha256/"):
+            digest = f"sha256:{name.rsplit('/', 1)[-1]}"
+            if await storage.blob_exists(digest):
+                await _skip(reader, info.size)
+                result.blobs_skipped += 1
+            else:
+                await _write_blob(storage, reader, digest, info.size)
+                result.blobs_written += 1
+                result.bytes_written += info.size
+        elif info.isfile() and name == "index.json":
+            if info.size > _MAX_INDEX_SIZE:
+                raise LayoutError("index.json is too large")
+            index = await reader.read(info.size)
+        else:
+            await _skip(reader, info.size if info.isfile() else 0)
+        await reader.read(padding)
+
+    if index is None:
+        raise LayoutError("Bundle has no index.json")
+    for entry in json.loads(index).get("manifests") or []:
+        result.images.append(await _tag_image(storage, entry, repository))
+    return result
+
+
+async def _skip(reader: _StreamReader, size: int) -> None:
+    while size > 0:
+        size -= len(await reader.read(min(size, _PART_SIZE)))
+
+
+@traced("layout.write_blob")
+async def _write_blob(
+    storage: S3Storage, reader: _StreamReader, digest: str, size: int
+) -> None:
+    """Stream one blob into storage, verifying it before it becomes visible."""
+    if size <= _PART_SIZE:
+        try:
+            await storage.put_blob(digest, await reader.read(size))
+        except ValueError as e:
+            raise LayoutError(str(e)) from None
+        return
+
+    hasher = hashlib.sha256()
+    upload_id = await storage.start_blob_upload(digest)
+    uploads: dict[int, asyncio.Task] = {}
+    try:
+        for number, offset in enumerate(range(0, size, _PART_SIZE), start=1):
+            in_flight = [t for t in uploads.values() if not t.done()]
+            if len(in_flight) >= _IMPORT_CONCURRENCY:
+                await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            data = await reader.read(min(_PART_SIZE, size - offset))
+            hasher.update(data)
+            uploads[number] = asyncio.create_task(
+                storage.put_blob_part(digest, upload_id, number, data)
+            )
+        etags = await asyncio.gather(*uploads.values())
+
+        computed = f"sha256:{hasher.hexdigest()}"
+        if computed != digest:
+            raise LayoutError(f"Digest mismatch: expected {digest}, got {computed}")
+        await storage.complete_blob_upload(digest, upload_id, list(zip(uploads, etags)))
+    except BaseException:
+        for task in uploads.values():
+            task.cancel()
+        await asyncio.gather(*uploads.values(), return_exceptions=True)
+        await storage.abort_blob_upload(digest, upload_id)
+        raise
+
+
+async def _tag_image(
+    storage: S3Storage, entry: dict, repository: str
+) -> tuple[str, str, str]:
+    """Create the manifests (children first) and tag for an index entry."""
+    annotations = entry.get("annotations") or {}
+    name = annotations.get(IMAGE_NAME_ANNOTATION, "")
+    if name:
+        target, ref = parse_reference(name)
+    else:
+        target, ref = repository, annotations.get(REF_NAME_ANNOTATION)
+    if not target:
+        raise LayoutError(f"No repository for {entry.get('digest')}; pass one explicitly")
+
+    digest = entry["digest"]
+    content = await _put_manifest_tree(storage, target, digest)
+    if ref and not ref.startswith("sha256:"):
+        await storage.put_manifest(target, ref, content)
+    await record_oci_chart(storage, target, content)
+    return target, ref or digest, digest
+
+
+async def _put_manifest_tree(storage: S3Storage, repository: str, digest: str) -> bytes:
+    content = await storage.get_blob(digest)
+    if content is None:
+        raise LayoutError(f"Manifest {digest} is missing from the bundle")
+    for child in json.loads(content).get("manifests") or []:
+        await _put_manifest_tree(storage, repository, child["digest"])
+    await storage.put_manifest(repository, digest, content)
+    return content
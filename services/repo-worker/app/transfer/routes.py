@@ -0,0 +1,122 @@
+"""Bundle export and import API routes."""
+
+import logging
+
+from quart import Blueprint, Request, Response, request
+
+from app.auth.middleware import auth_required
+from app.replication import get_replicator
+from app.storage.s3 import get_storage
+from app.transfer.layout import (
+    LayoutError,
+    check_compression,
+    compress_stream,
+    import_layout,
+    layout_size,
+    parse_reference,
+    plan_export,
+    stream_layout,
+)
+
+logger = logging.getLogger(__name__)
+
+transfer_bp = Blueprint("transfer", __name__, url_prefix="/api/v1/transfer")
+
+_EXTENSIONS = {"none": "tar", "gzip": "tar.gz", "zstd": "tar.zst"}
+
+IMPORT_PATH = "/api/v1/transfer/import"
+
+
+class TransferRequest(Request):
+    """Request class lifting the body limits for streamed bundle imports.
+
+    Bundles can be far larger than MAX_CONTENT_LENGTH and take longer
+    than BODY_TIMEOUT to upload; they are streamed, never buffered, so
+    neither limit fits. Quart fixes both when it creates the request, so
+    they are set here rather than in the view.
+    """
+
+    def __init__(self, method, scheme, path, *args, **kwargs):
+        if path.rstrip("/") == IMPORT_PATH:
+            kwargs["max_content_length"] = None
+            kwargs["body_timeout"] = None
+        super().__init__(method, scheme, path, *args, **kwargs)
+
+
+@transfer_bp.route("/export", methods=["GET"])
+@auth_required(require_push=True)
+async def export_layout():
+    """Stream repositories as an OCI image-layout tarball.
+
+    Query parameters:
+        ref: ``repo``, ``repo:tag`` or ``repo@digest`` (repeatable; a bare
+            repository exports all of its tags)
+        compression: none (default), gzip or zstd
+    """
+    references = request.args.getlist("ref")
+    compression = request.args.get("compression", "none")
+    if not references:
+        return {"error": "at least one ref is required"}, 400
+    try:
+        check_compression(compression)
+        plan = await plan_export(get_storage(), references)
+    except LayoutError as e:
+        return {"error": str(e)}, 400
+
+    logger.info(
+        f"Exporting {len(plan.index)} images, {len(plan.blobs)} blobs "
+        f"({plan.size} bytes before compression)"
+    )
+    headers = {
+        "Content-Disposition": (
+            f'attachment; filename="bundle.{_EXTENSIONS[compression]}"'
+        ),
+    }
+    if compression == "none":
+        # Tar framing is deterministic, so the exact size is known up front
+        headers["Content-Length"] = str(layout_size(plan))
+
+    body = compress_stream(stream_layout(get_storage(), plan), compression)
+    response = Response(body, status=200, content_type="application/x-tar", headers=headers)
+    # Large bundles take far longer than RESPONSE_TIMEOUT to send
+    response.timeout = None
+    return response
+
+
+@transfer_bp.route("/import", methods=["POST"])
+@auth_required()
+async def import_bundle():
+    """Import an OCI image-layout tarball (plain, gzip or zstd).
+
+    Query parameters:
+        repository: Repository for images the bundle does not name
+    """
+    repository = request.args.get("repository", "")
+    if repository and parse_reference(repository)[1]:
+        return {"error": "repository must not include a tag"}, 400
+
+    storage = get_storage()
+    try:
+        result = await import_layout(storage, request.body, repository)
+    except LayoutError as e:
+        logger.warning(f"Rejected bundle import: {e}")
+        return {"error": str(e)}, 400
+
+    replicator = get_replicator()
+    if replicator is not None:
+        for repo, ref, digest in result.images:
+            replicator.enqueue(repo, ref, digest)
+
+    logger.info(
+        f"Imported {len(result.images)} images: {result.blobs_written} blobs written, "
+        f"{result.blobs_skipped} already present"
+    )
+    return {
+        "images": [
+            f"{repo}@{ref}" if ref.startswith("sha256:") else f"{repo}:{ref}"
+            for repo, ref, _ in result.images
+        ],
+        "blobs_written": result.blobs_written,
+        "blobs_skipped": result.blobs_skipped,
+        "bytes_written": result.bytes_written,
+    }, 200
@@ -6,7 +6,14 @@ import asyncio
 import logging
 
 from app import create_app
+from app.analytics.collector import CacheAnalytics, set_analytics
 from app.config import Config
+from app.helm.proxy import HelmProxy, set_helm_proxy
+from app.pins.pinset import PinSet, set_pins
+from app.proxy.proxy import ProxyHandler, get_proxy, set_proxy
+from app.replication import Replicator, set_replicator
+from app.storage.limiter import S3Limiter
+from app.storage.metadata import MetadataStore
 from app.storage.s3 import S3Storage, set_storage
 
 logger = logging.getLogger(__name__)
@@ -14,7 +21,15 @@ logger = logging.getLogger(__name__)
 
 async def init_storage(config: Config) -> None:
     """Initialize S3 storage and create bucket if needed."""
-    storage = S3Storage(config.s3)
+    metadata = None
+    if config.metadata_store.enabled:
+        metadata = MetadataStore(config.metadata_store.path)
+
+    limiter = None
+    if config.s3_concurrency.enabled:
+        limiter = S3Limiter(config.s3_concurrency)
+
+    storage = S3Storage(config.s3, metadata=metadata, limiter=limiter)
     set_storage(storage)
 
     # Ensure bucket exists
@@ -25,6 +40,25 @@ async def init_storage(config: Config) -> None:
         logger.error(f"Failed to initialize S3 storage: {e}")
         raise
 
+    if metadata is not None and config.metadata_store.rebuild_on_start:
+        if not metadata.is_ready():
+            logger.info("Populating metadata store from bucket")
+            await metadata.rebuild(storage)
+
+    # Pull-through proxy shares the same storage backend
+    if config.cache.enabled:
+        set_proxy(ProxyHandler(storage, config))
+    if config.cache.enabled and config.analytics.enabled:
+        set_analytics(CacheAnalytics(storage, config.analytics))
+    if config.helm.proxy_enabled:
+        set_helm_proxy(HelmProxy(storage, config))
+
+    if config.replication.enabled and config.replication.targets:
+        set_replicator(Replicator(storage, config.replication))
+
+    if config.pins.enabled:
+        set_pins(PinSet(storage, config.pins, config.auth.flask_backend_url, get_proxy()))
+
 
 def main():
     """Run the application."""
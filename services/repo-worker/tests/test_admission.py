@@ -0,0 +1,130 @@
+"""Tests for admission control and load shedding."""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app import create_app
+from app.admission import AdmissionController, Overloaded, route_class
+from app.config import AdmissionClassLimit, AdmissionConfig, Config
+
+
+def _config(**classes) -> AdmissionConfig:
+    limits = {
+        name: AdmissionClassLimit(concurrency=1, queue=1)
+        for name in ("manifest", "catalog", "helm_index", "blob_read", "blob_write")
+    }
+    limits.update(classes)
+    return AdmissionConfig(enabled=True, max_wait_seconds=0.2, classes=limits)
+
+
+def test_route_class():
+    """Test endpoints map to route classes and health checks are unlimited."""
+    assert route_class("registry.get_manifest") == "manifest"
+    assert route_class("registry.get_blob") == "blob_read"
+    assert route_class("healthz") is None
+
+
+@pytest.mark.asyncio
+async def test_queue_full_rejected_immediately():
+    """Test a full class queue sheds with 429."""
+    admission = AdmissionController(_config())
+    await admission.acquire("blob_read")
+    waiter = asyncio.create_task(admission.acquire("blob_read"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded) as excinfo:
+        await admission.acquire("blob_read")
+
+    assert excinfo.value.status == 429
+    admission.release("blob_read")
+    await waiter
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_rejected():
+    """Test a request queued past max_wait_seconds sheds with 503."""
+    admission = AdmissionController(_config())
+    await admission.acquire("catalog")
+
+    with pytest.raises(Overloaded) as excinfo:
+        await admission.acquire("catalog")
+
+    assert excinfo.value.status == 503
+
+
+@pytest.mark.asyncio
+async def test_manifests_admitted_before_blobs():
+    """Test freed global capacity goes to queued manifests first."""
+    config = _config(
+        manifest=AdmissionClassLimit(concurrency=4, queue=4),
+        blob_read=AdmissionClassLimit(concurrency=4, queue=4),
+    )
+    config.max_concurrent = 1
+    config.max_wait_seconds = 1
+    admission = AdmissionController(config)
+    await admission.acquire("blob_read")
+
+    order = []
+
+    async def request(name):
+        await admission.acquire(name)
+        order.append(name)
+
+    blob = asyncio.create_task(request("blob_read"))
+    await asyncio.sleep(0)
+    manifest = asyncio.create_task(request("manifest"))
+    await asyncio.sleep(0)
+
+    admission.release("blob_read")
+    await manifest
+    admission.release("manifest")
+    await blob
+
+    assert order == ["manifest", "blob_read"]
+
+
+@pytest.mark.asyncio
+async def test_shed_response_has_retry_after(monkeypatch):
+    """Test shed requests get a fast 429 with Retry-After."""
+    storage = AsyncMock()
+    storage.list_repositories = AsyncMock(return_value=[])
+    monkeypatch.setattr("app.registry.routes.get_storage", lambda: storage)
+
+    config = Config()
+    config.admission = _config(catalog=AdmissionClassLimit(concurrency=1, queue=0))
+    app = create_app(config)
+    admission = app.extensions["admission"]
+    await admission.acquire("catalog")
+
+    response = await app.test_client().get("/v2/_catalog")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_streamed_blob_holds_slot_until_sent(monkeypatch):
+    """Test a blob_read slot is released after the body, not at teardown."""
+    config = Config()
+    config.admission = _config()
+    app = create_app(config)
+    admission = app.extensions["admission"]
+    active_while_streaming = []
+
+    async def stream(digest):
+        for chunk in (b"ab", b"c"):
+            active_while_streaming.append(admission._active["blob_read"])
+            yield chunk
+
+    storage = AsyncMock()
+    storage.get_blob_size = AsyncMock(return_value=3)
+    storage.get_blob_stream = stream
+    monkeypatch.setattr("app.registry.routes.get_storage", lambda: storage)
+
+    response = await app.test_client().get("/v2/team/app/blobs/sha256:" + "a" * 64)
+
+    assert await response.get_data() == b"abc"
+    assert active_while_streaming == [1, 1]
+    assert admission._active["blob_read"] == 0
@@ -0,0 +1,101 @@
+"""Tests for pull-through cache analytics."""
+
+import json
+import time
+
+import pytest
+from unittest.mock import MagicMock
+
+from app.analytics.collector import ANALYTICS_PREFIX, OTHER_IMAGES, CacheAnalytics
+from app.config import AnalyticsConfig
+
+
+class FakeStorage:
+    """In-memory stand-in for the object operations analytics use."""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+
+    async def write_object(self, key, content, content_type):
+        self.objects[key] = content
+
+    async def read_object(self, key):
+        return self.objects.get(key)
+
+    async def delete_object(self, key):
+        self.objects.pop(key, None)
+
+    async def list_keys(self, prefix, start_after=""):
+        for key in sorted(self.objects):
+            if key.startswith(prefix):
+                yield key
+
+
+@pytest.fixture
+def storage():
+    return FakeStorage()
+
+
+def test_lookups_counted_per_image():
+    """Test hits, misses and bytes are split by where they came from."""
+    analytics = CacheAnalytics(MagicMock(), AnalyticsConfig())
+
+    analytics.record("dockerhub", "library/nginx", "manifest", True, 100)
+    analytics.record("dockerhub", "library/nginx", "blob", False, 1000)
+    analytics.record("dockerhub", "library/nginx", "blob", False, 500, source="peer")
+
+    pulls, hits, misses, cache_bytes, upstream_bytes, peer_bytes = (
+        analytics._stats["dockerhub"]["library/nginx"]
+    )
+    assert (pulls, hits, misses) == (1, 1, 2)
+    assert (cache_bytes, upstream_bytes, peer_bytes) == (100, 1000, 500)
+
+
+def test_image_count_bounded():
+    """Test images beyond max_images are folded into one row."""
+    analytics = CacheAnalytics(MagicMock(), AnalyticsConfig(max_images=2))
+
+    for image in ("a", "b", "c", "d"):
+        analytics.record("quay", image, "manifest", True)
+
+    assert sorted(analytics._stats["quay"]) == [OTHER_IMAGES, "a", "b"]
+    assert analytics._stats["quay"][OTHER_IMAGES][0] == 2
+
+
+@pytest.mark.asyncio
+async def test_report_merges_instances(storage):
+    """Test totals of other replicas are added to this one's."""
+    analytics = CacheAnalytics(storage, AnalyticsConfig())
+    analytics.record("dockerhub", "library/nginx", "manifest", True, 100)
+    analytics.record("ghcr", "org/app", "manifest", False, 50)
+    other = analytics._day
+    storage.objects[f"{ANALYTICS_PREFIX}{other}/replica-2.json"] = json.dumps({
+        "day": other,
+        "upstreams": {"dockerhub": {"library/redis": [3, 3, 0, 900, 0, 0]}},
+    }).encode()
+
+    report = await analytics.report(days=1, top=1)
+
+    assert report["instance_days"] == 2
+    assert report["totals"]["pulls"] == 5
+    dockerhub = next(u for u in report["upstreams"] if u["upstream"] == "dockerhub")
+    assert dockerhub["hit_ratio"] == 1.0
+    assert report["top_images"]["by_pulls"][0]["image"] == "library/redis"
+    assert len(report["top_images"]["by_bytes"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_day_rollover_prunes_old_days(storage):
+    """Test a new day starts empty and days past retention are deleted."""
+    analytics = CacheAnalytics(storage, AnalyticsConfig(retention_days=30))
+    yesterday = time.strftime("%Y-%m-%d", time.gmtime(time.time() - 86400))
+    storage.objects[f"{ANALYTICS_PREFIX}2000-01-01/old.json"] = b"{}"
+    analytics._day = yesterday
+    analytics.record("dockerhub", "library/nginx", "manifest", True)
+
+    await analytics.flush()
+
+    assert analytics._stats == {}
+    assert sorted(storage.objects) == [
+        f"{ANALYTICS_PREFIX}{yesterday}/{analytics.instance}.json"
+    ]
@@ -0,0 +1,52 @@
+"""Tests for the verified-token cache."""
+
+import time
+
+from app.auth.cache import TokenCache
+from app.auth.jwt import TokenPayload
+
+
+def _payload(exp: float) -> TokenPayload:
+    return TokenPayload(user_id=1, email="dev@example.com", roles=[], exp=int(exp), iat=0)
+
+
+class TestTokenCache:
+    """Tests for TokenCache class."""
+
+    def test_hit_after_store(self):
+        """Test a verified header is served from cache."""
+        cache = TokenCache()
+        payload = _payload(time.time() + 300)
+        cache.store("Bearer abc", payload)
+
+        assert cache.lookup("Bearer abc") == (True, payload)
+        assert cache.lookup("Bearer other") == (False, None)
+
+    def test_entry_expires_with_token(self):
+        """Test entries are not served past the token's exp."""
+        cache = TokenCache()
+        cache.store("Bearer abc", _payload(time.time() - 1))
+
+        assert cache.lookup("Bearer abc") == (False, None)
+
+    def test_rejection_cached_briefly(self):
+        """Test failed verifications are remembered for the failure TTL."""
+        cache = TokenCache(failure_ttl=5)
+        cache.store("Bearer bad", None)
+        assert cache.lookup("Bearer bad") == (True, None)
+
+        cache = TokenCache(failure_ttl=0)
+        cache.store("Bearer bad", None)
+        assert cache.lookup("Bearer bad") == (False, None)
+
+    def test_bounded_entries(self):
+        """Test least recently used headers are evicted."""
+        cache = TokenCache(max_entries=2)
+        exp = time.time() + 300
+        cache.store("Bearer a", _payload(exp))
+        cache.store("Bearer b", _payload(exp))
+        cache.lookup("Bearer a")
+        cache.store("Bearer c", _payload(exp))
+
+        assert cache.lookup("Bearer a")[0] is True
+        assert cache.lookup("Bearer b")[0] is False
@@ -0,0 +1,88 @@
+"""Tests for blob download bandwidth shaping."""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app import create_app
+from app.bandwidth import BandwidthShaper, Client, FairLink, TokenBucket, iter_bytes
+from app.config import BandwidthClass, BandwidthConfig, Config
+
+
+def test_token_bucket_waits_off_deficit():
+    """Test reserving beyond the burst returns the time to wait."""
+    bucket = TokenBucket(rate=1000, capacity=1000)
+
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(500) == pytest.approx(0.5, abs=0.01)
+
+
+def test_classify_first_match():
+    """Test clients join the first matching class, else the catch-all."""
+    shaper = BandwidthShaper(BandwidthConfig(classes=[
+        BandwidthClass(name="nodes", user_agents=["containerd/*"]),
+        BandwidthClass(name="ci", cidrs=["10.20.0.0/16"], roles=["ci"]),
+        BandwidthClass(name="default"),
+    ]))
+
+    assert shaper.classify(Client("ip:1", user_agent="containerd/1.7.2")).name == "nodes"
+    assert shaper.classify(Client("ip:2", address="10.20.3.4")).name == "ci"
+    assert shaper.classify(Client("user:3", roles=("ci",))).name == "ci"
+    assert shaper.classify(Client("ip:4", address="192.168.0.1")).name == "default"
+
+
+@pytest.mark.asyncio
+async def test_fair_link_shares_by_weight():
+    """Test a contended link serves classes in proportion to weight."""
+    link = FairLink(rate=10_000_000)
+    order = []
+
+    async def send(name, weight):
+        for _ in range(4):
+            await link.transmit(name, weight, 1000)
+            order.append(name)
+
+    await asyncio.gather(send("ci", 1), send("nodes", 3))
+
+    # The heavier class finishes its chunks well before the lighter one
+    assert order[:4].count("nodes") >= 3
+
+
+@pytest.mark.asyncio
+async def test_blob_streamed_through_shaper(monkeypatch):
+    """Test blob GETs stream from storage in shaper-sized chunks."""
+    storage = AsyncMock()
+    storage.get_blob_size = AsyncMock(return_value=3000)
+    storage.get_blob_stream = lambda digest: iter_bytes(b"x" * 3000, 3000)
+    monkeypatch.setattr("app.registry.routes.get_storage", lambda: storage)
+
+    config = Config()
+    config.bandwidth = BandwidthConfig(enabled=True, chunk_kb=1)
+    app = create_app(config)
+
+    response = await app.test_client().get("/v2/myapp/blobs/sha256:abc")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Length"] == "3000"
+    assert await response.get_data() == b"x" * 3000
+    storage.get_blob.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_shaped_blob_has_no_response_timeout(monkeypatch):
+    """Test slow shaped downloads are not cut off by RESPONSE_TIMEOUT."""
+    storage = AsyncMock()
+    storage.get_blob_size = AsyncMock(return_value=3000)
+    storage.get_blob_stream = lambda digest: iter_bytes(b"x" * 3000, 3000)
+    monkeypatch.setattr("app.registry.routes.get_storage", lambda: storage)
+
+    config = Config()
+    config.bandwidth = BandwidthConfig(enabled=True, chunk_kb=1)
+    app = create_app(config)
+
+    async with app.test_request_context("/v2/myapp/blobs/sha256:abc"):
+        response = await app.make_response(await app.dispatch_request())
+
+    assert response.status_code == 200
+    assert response.timeout is None
@@ -0,0 +1,127 @@
+"""Tests for chart metadata extraction and charts stored as OCI artifacts."""
+
+import hashlib
+import io
+import json
+import tarfile
+
+import yaml
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.helm.charts import (
+    HELM_CHART_MEDIA_TYPE,
+    chart_layer_digest,
+    extract_chart_metadata,
+    publish_chart,
+    record_oci_chart,
+)
+
+
+def _build_chart(files: dict[str, bytes]) -> bytes:
+    """Build a gzipped chart tarball from {path: content}."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for path, content in files.items():
+            info = tarfile.TarInfo(path)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def test_extracts_sidecar_fields():
+    """Test Chart.yaml, values schema, README and digest are extracted."""
+    content = _build_chart({
+        "mychart/Chart.yaml": yaml.dump({"name": "mychart", "version": "1.2.3"}).encode(),
+        "mychart/README.md": b"# mychart",
+        "mychart/templates/deployment.yaml": b"kind: Deployment",
+        "mychart/values.schema.json": json.dumps({"type": "object"}).encode(),
+    })
+
+    metadata = extract_chart_metadata(io.BytesIO(content))
+
+    assert metadata["name"] == "mychart"
+    assert metadata["version"] == "1.2.3"
+    assert metadata["readme"] == "# mychart"
+    assert metadata["valuesSchema"] == {"type": "object"}
+    assert metadata["digest"] == f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+def test_digest_covers_whole_archive_after_early_stop():
+    """Test the digest is of the full upload even when scanning stops early."""
+    content = _build_chart({
+        "mychart/Chart.yaml": yaml.dump({"name": "mychart", "version": "1.0.0"}).encode(),
+        "mychart/README.md": b"readme",
+        "mychart/values.schema.json": b"{}",
+        "mychart/templates/big.yaml": b"x" * (2 * 1024 * 1024),
+    })
+
+    metadata = extract_chart_metadata(io.BytesIO(content))
+
+    assert metadata["digest"] == f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+def test_invalid_archive():
+    """Test non-chart uploads yield no metadata."""
+    assert extract_chart_metadata(io.BytesIO(b"not a tarball")) is None
+
+
+@pytest.mark.asyncio
+async def test_publish_chart_as_oci_artifact():
+    """Test uploaded charts land in the blob store under a chart manifest."""
+    content = _build_chart({
+        "mychart/Chart.yaml": yaml.dump({"name": "mychart", "version": "1.0.0+build.1"}).encode(),
+    })
+    fileobj = io.BytesIO(content)
+    metadata = extract_chart_metadata(fileobj)
+    storage = AsyncMock()
+    storage.blob_exists = AsyncMock(return_value=False)
+
+    repository = await publish_chart(storage, metadata, fileobj)
+
+    assert repository == "charts/mychart"
+    storage.put_blob_file.assert_called_once()
+    assert storage.put_blob_file.call_args[0][0] == metadata["digest"]
+    name, tag, manifest = storage.put_manifest.call_args[0]
+    assert (name, tag) == ("charts/mychart", "1.0.0_build.1")
+    assert chart_layer_digest(manifest) == metadata["digest"]
+    record = storage.put_chart_metadata.call_args[0][2]
+    assert record["ociRepository"] == "charts/mychart"
+
+
+@pytest.mark.asyncio
+async def test_duplicate_chart_bytes_stored_once():
+    """Test identical chart bytes are not uploaded again."""
+    content = _build_chart({
+        "mychart/Chart.yaml": yaml.dump({"name": "mychart", "version": "1.0.0"}).encode(),
+    })
+    fileobj = io.BytesIO(content)
+    storage = AsyncMock()
+    storage.blob_exists = AsyncMock(return_value=True)
+
+    await publish_chart(storage, extract_chart_metadata(fileobj), fileobj)
+
+    storage.put_blob_file.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_record_oci_push():
+    """Test a `helm push` manifest is recorded for the classic index."""
+    content = _build_chart({
+        "nginx/Chart.yaml": yaml.dump({"name": "nginx", "version": "2.0.0"}).encode(),
+    })
+    digest = f"sha256:{hashlib.sha256(content).hexdigest()}"
+    manifest = json.dumps({
+        "schemaVersion": 2,
+        "config": {"mediaType": "application/vnd.cncf.helm.config.v1+json"},
+        "layers": [{"mediaType": HELM_CHART_MEDIA_TYPE, "digest": digest}],
+    }).encode()
+    storage = AsyncMock()
+    storage.get_blob = AsyncMock(return_value=content)
+
+    assert await record_oci_chart(storage, "team/nginx", manifest) is True
+    name, version, record = storage.put_chart_metadata.call_args[0]
+    assert (name, version, record["ociRepository"]) == ("nginx", "2.0.0", "team/nginx")
+
+    assert await record_oci_chart(storage, "library/nginx", b'{"config": {}}') is False
@@ -0,0 +1,88 @@
+"""Tests for ETag / If-None-Match handling on registry and chart content."""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app import create_app
+from app.config import Config
+
+DIGEST = "sha256:" + "a" * 64
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Patch registry and Helm routes onto a mock storage."""
+    storage = AsyncMock()
+    storage.get_manifest = AsyncMock(return_value=(b'{"schemaVersion": 2}', DIGEST))
+    storage.get_blob = AsyncMock(return_value=b"layer")
+    storage.blob_exists = AsyncMock(return_value=True)
+    storage.get_chart = AsyncMock(return_value=b"chart-bytes")
+    storage.get_chart_metadata = AsyncMock(return_value=None)
+    monkeypatch.setattr("app.registry.routes.get_storage", lambda: storage)
+    monkeypatch.setattr("app.helm.routes.get_storage", lambda: storage)
+    return storage
+
+
+@pytest.fixture
+def client(storage):
+    """Create test client."""
+    return create_app(Config()).test_client()
+
+
+@pytest.mark.asyncio
+async def test_digest_manifest_is_immutable(client):
+    """Test manifests fetched by digest are cacheable forever."""
+    response = await client.get(f"/v2/library/nginx/manifests/{DIGEST}")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{DIGEST}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+@pytest.mark.asyncio
+async def test_tag_manifest_not_modified(client):
+    """Test a tag whose digest the client already has returns 304."""
+    response = await client.get(
+        "/v2/library/nginx/manifests/latest", headers={"If-None-Match": f'"{DIGEST}"'}
+    )
+
+    assert response.status_code == 304
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert await response.get_data() == b""
+
+
+@pytest.mark.asyncio
+async def test_blob_not_modified_skips_read(client, storage):
+    """Test a conditional blob GET never reads the blob."""
+    response = await client.get(
+        f"/v2/library/nginx/blobs/{DIGEST}", headers={"If-None-Match": f'"{DIGEST}"'}
+    )
+
+    assert response.status_code == 304
+    storage.get_blob.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_chart_download_revalidation(client):
+    """Test chart downloads carry an ETag and honour If-None-Match."""
+    first = await client.get("/charts/mychart-1.0.0.tgz")
+    etag = first.headers["ETag"]
+
+    second = await client.get("/charts/mychart-1.0.0.tgz", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_chart_etag_from_recorded_digest(client, storage, monkeypatch):
+    """Test a chart with recorded metadata is never hashed for its ETag."""
+    storage.get_chart_metadata = AsyncMock(return_value={"digest": DIGEST})
+    hashlib = MagicMock()
+    monkeypatch.setattr("app.helm.routes.hashlib", hashlib)
+
+    response = await client.get("/charts/mychart-1.0.0.tgz")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{DIGEST}"'
+    hashlib.sha256.assert_not_called()
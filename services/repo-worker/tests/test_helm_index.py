@@ -0,0 +1,53 @@
+"""Tests for semver ordering and per-chart Helm indexes."""
+
+import pytest
+import yaml
+from unittest.mock import AsyncMock
+
+from app import create_app
+from app.config import Config
+from app.semver import sort_versions
+
+
+def test_sort_versions_semver():
+    """Test versions sort by semver precedence, not lexically."""
+    versions = ["1.10.0", "1.9.0", "1.0.0", "1.0.0-rc.1", "1.0.0-alpha", "v2.0.0"]
+
+    assert sort_versions(versions) == [
+        "1.0.0-alpha", "1.0.0-rc.1", "1.0.0", "1.9.0", "1.10.0", "v2.0.0",
+    ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Create test client over mock storage holding twelve chart versions."""
+    storage = AsyncMock()
+    storage.list_charts = AsyncMock(
+        return_value={"mychart": [f"1.{minor}.0" for minor in range(12)]}
+    )
+    storage.get_chart_metadata = AsyncMock(return_value={"description": "test"})
+    monkeypatch.setattr("app.helm.routes.get_storage", lambda: storage)
+
+    config = Config()
+    config.helm.index_max_versions = 3
+    return create_app(config).test_client()
+
+
+@pytest.mark.asyncio
+async def test_main_index_limited_to_latest(client):
+    """Test index.yaml only publishes the newest versions."""
+    response = await client.get("/index.yaml")
+    index = yaml.safe_load(await response.get_data(as_text=True))
+
+    versions = [entry["version"] for entry in index["entries"]["mychart"]]
+    assert versions == ["1.11.0", "1.10.0", "1.9.0"]
+
+
+@pytest.mark.asyncio
+async def test_chart_index_full_history(client):
+    """Test the per-chart index lists every version."""
+    response = await client.get("/index/mychart.yaml")
+    index = yaml.safe_load(await response.get_data(as_text=True))
+
+    assert len(index["entries"]["mychart"]) == 12
+    assert (await client.get("/index/missing.yaml")).status_code == 404
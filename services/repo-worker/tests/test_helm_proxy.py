@@ -0,0 +1,137 @@
+"""Tests for the Helm pull-through proxy."""
+
+import asyncio
+import json
+
+import aiohttp
+import pytest
+import yaml
+from unittest.mock import AsyncMock
+
+from app import create_app
+from app.config import Config, HelmUpstream
+from app.helm.proxy import HelmProxy, rewrite_index
+
+INDEX = yaml.dump({
+    "apiVersion": "v1",
+    "entries": {
+        "nginx": [
+            {"version": "15.0.0", "digest": "ab" * 32, "urls": ["nginx-15.0.0.tgz"]},
+            {
+                "version": "14.0.0",
+                "digest": "cd" * 32,
+                "urls": ["https://github.com/org/charts/releases/download/nginx-14.0.0.tgz"],
+            },
+        ]
+    },
+}).encode()
+
+
+def test_rewrite_index_points_urls_at_proxy():
+    """Test chart URLs become relative proxy URLs, remembering the source."""
+    content, charts = rewrite_index(INDEX, "https://charts.example.com/stable")
+
+    index = yaml.safe_load(content)
+    assert index["entries"]["nginx"][0]["urls"] == ["charts/nginx-15.0.0.tgz"]
+    assert charts["nginx-15.0.0.tgz"] == (
+        "https://charts.example.com/stable/nginx-15.0.0.tgz", "ab" * 32,
+    )
+    assert charts["nginx-14.0.0.tgz"][0].startswith("https://github.com/")
+
+
+@pytest.fixture
+def proxy():
+    """Create a Helm proxy whose storage holds a stale cached index."""
+    content, charts = rewrite_index(INDEX, "https://charts.example.com")
+    entries = {
+        "index.yaml": (content, "application/x-yaml", {"etag": '"v1"', "last-check": "0"}),
+        "charts.json": (json.dumps(charts).encode(), "application/json", {}),
+    }
+    storage = AsyncMock()
+    storage.get_cache_entry = AsyncMock(side_effect=lambda _, __, ref: entries.get(ref))
+    storage.get_blob = AsyncMock(return_value=b"cached-chart")
+
+    config = Config()
+    config.helm.proxy_repositories = [
+        HelmUpstream(name="example", url="https://charts.example.com")
+    ]
+    return HelmProxy(storage, config)
+
+
+@pytest.mark.asyncio
+async def test_stale_index_served_when_upstream_down(proxy, monkeypatch):
+    """Test a stale index is served while revalidation fails."""
+    monkeypatch.setattr(
+        proxy, "_fetch_index", AsyncMock(side_effect=aiohttp.ClientError("down"))
+    )
+
+    content = await proxy.get_index("example")
+    await asyncio.gather(*proxy._refresh_tasks.values())
+
+    assert b"charts/nginx-15.0.0.tgz" in content
+    proxy._fetch_index.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_chart_served_from_blob_cache(proxy):
+    """Test a chart is served by its index digest without an upstream call."""
+    content = await proxy.get_chart("example", "nginx-15.0.0.tgz")
+
+    assert content == b"cached-chart"
+    proxy.storage.get_blob.assert_called_once_with("sha256:" + "ab" * 32)
+    assert await proxy.get_chart("example", "unknown-1.0.0.tgz") is None
+    assert await proxy.get_chart("missing", "nginx-15.0.0.tgz") is None
+
+
+class FakeSession:
+    """Session answering every GET with a chart, recording request headers."""
+
+    def __init__(self, requests: list):
+        self.requests = requests
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def get(self, url, headers):
+        self.requests.append((url, headers))
+        response = AsyncMock(status=200)
+        response.read = AsyncMock(return_value=b"chart")
+        response.raise_for_status = lambda: None
+        response.__aenter__ = AsyncMock(return_value=response)
+        response.__aexit__ = AsyncMock(return_value=False)
+        return response
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url,sent", [
+    ("https://charts.example.com/nginx.tgz", True),
+    ("https://charts.example.com.evil.net/nginx.tgz", False),
+    ("https://charts.example.com@evil/nginx.tgz", False),
+])
+async def test_credentials_only_sent_to_repository_host(proxy, url, sent):
+    """Test a chart URL on another host does not get the repository's credentials."""
+    repo = proxy.repositories["example"]
+    repo.username, repo.password = "robot", "secret"
+    index = await proxy._load_index("example")
+    index.charts["nginx.tgz"] = (url, "")
+    requests = []
+    proxy._session = lambda name: FakeSession(requests)
+
+    assert await proxy.get_chart("example", "nginx.tgz") == b"chart"
+    assert ("Authorization" in requests[0][1]) is sent
+
+
+@pytest.mark.asyncio
+async def test_chart_upstream_failure_is_bad_gateway(proxy, monkeypatch):
+    """Test an unreachable chart upstream answers 502, not 500."""
+    proxy.get_chart = AsyncMock(side_effect=aiohttp.ClientError("down"))
+    monkeypatch.setattr("app.helm.routes.get_helm_proxy", lambda: proxy)
+
+    response = await create_app(Config()).test_client().get(
+        "/helm-proxy/example/charts/nginx-15.0.0.tgz"
+    )
+
+    assert response.status_code == 502
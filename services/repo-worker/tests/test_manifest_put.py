@@ -0,0 +1,108 @@
+"""Tests for referenced blob checks on manifest PUT."""
+
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app import create_app
+from app.config import Config, S3Config
+from app.storage.s3 import S3Storage
+
+CONFIG = "sha256:" + "c" * 64
+LAYER = "sha256:" + "1" * 64
+FOREIGN = "sha256:" + "f" * 64
+CHILD = "sha256:" + "d" * 64
+
+MANIFEST = json.dumps({
+    "schemaVersion": 2,
+    "mediaType": "application/vnd.oci.image.manifest.v1+json",
+    "config": {"digest": CONFIG, "size": 10},
+    "layers": [
+        {"digest": LAYER, "size": 20},
+        {"digest": FOREIGN, "size": 30, "urls": ["https://example.com/layer"]},
+    ],
+}).encode()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Patch registry routes onto a mock storage."""
+    storage = AsyncMock()
+    storage.find_missing = AsyncMock(return_value=[])
+    storage.put_manifest = AsyncMock(return_value="sha256:" + "e" * 64)
+    monkeypatch.setattr("app.registry.routes.get_storage", lambda: storage)
+    monkeypatch.setattr("app.registry.routes.record_oci_chart", AsyncMock())
+    return storage
+
+
+@pytest.fixture
+def client(storage):
+    """Create test client."""
+    return create_app(Config()).test_client()
+
+
+@pytest.mark.asyncio
+async def test_manifest_with_missing_layer_rejected(client, storage):
+    """Test a manifest referencing an unpushed layer is not stored."""
+    storage.find_missing = AsyncMock(return_value=[LAYER])
+
+    response = await client.put("/v2/team/app/manifests/v1", data=MANIFEST)
+
+    assert response.status_code == 400
+    errors = (await response.get_json())["errors"]
+    assert errors == [{
+        "code": "MANIFEST_BLOB_UNKNOWN",
+        "message": "blob unknown to registry",
+        "detail": {"digest": LAYER},
+    }]
+    storage.put_manifest.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_references_checked_in_one_call(client, storage):
+    """Test config and layers are checked together, foreign layers skipped."""
+    response = await client.put("/v2/team/app/manifests/v1", data=MANIFEST)
+
+    assert response.status_code == 201
+    storage.find_missing.assert_called_once_with("team/app", [LAYER, CONFIG], [])
+
+
+@pytest.mark.asyncio
+async def test_index_children_checked(client, storage):
+    """Test an index is checked for its child manifests."""
+    index = json.dumps({"schemaVersion": 2, "manifests": [{"digest": CHILD}]}).encode()
+
+    response = await client.put("/v2/team/app/manifests/v1", data=index)
+
+    assert response.status_code == 201
+    storage.find_missing.assert_called_once_with("team/app", [], [CHILD])
+
+
+@pytest.mark.asyncio
+async def test_invalid_manifest_rejected(client, storage):
+    """Test content that is not a JSON object is rejected."""
+    response = await client.put("/v2/team/app/manifests/v1", data=b"not json")
+
+    assert response.status_code == 400
+    assert (await response.get_json())["errors"][0]["code"] == "MANIFEST_INVALID"
+
+
+@pytest.mark.asyncio
+async def test_recently_written_blobs_need_no_request():
+    """Test blobs this instance just stored are trusted without a HEAD."""
+    storage = S3Storage(S3Config())
+
+    @asynccontextmanager
+    async def fake_client():
+        yield None
+
+    storage._get_client = fake_client
+    storage._object_exists = AsyncMock(side_effect=lambda client, key: False)
+    storage._remember(storage._blob_key(CONFIG))
+
+    missing = await storage.find_missing("team/app", [CONFIG, LAYER], [CHILD])
+
+    assert missing == [LAYER, CHILD]
+    assert storage._object_exists.call_count == 2
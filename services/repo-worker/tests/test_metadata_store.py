@@ -0,0 +1,140 @@
+"""Tests for the embedded metadata store."""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.config import S3Config
+from app.storage.metadata import MetadataStore, _parse_manifest_key, resync_loop
+from app.storage.s3 import S3Storage
+
+
+class TestMetadataStore:
+    """Tests for MetadataStore class."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Create a metadata store in a temporary directory."""
+        store = MetadataStore(str(tmp_path / "metadata.db"))
+        yield store
+        store.close()
+
+    def test_tags(self, store):
+        """Test tag links can be set, resolved, listed and deleted."""
+        store.set_tag("myapp/backend", "v1", "sha256:aaa")
+        store.set_tag("myapp/backend", "latest", "sha256:bbb")
+        store.set_tag("myapp/backend", "latest", "sha256:ccc")
+
+        assert store.get_tag("myapp/backend", "latest") == "sha256:ccc"
+        assert store.list_tags("myapp/backend") == ["latest", "v1"]
+
+        store.delete_tag("myapp/backend", "v1")
+        assert store.get_tag("myapp/backend", "v1") is None
+
+    def test_charts_keep_metadata(self, store):
+        """Test re-recording a chart without metadata keeps known metadata."""
+        store.put_chart("mychart", "1.0.0", {"name": "mychart", "version": "1.0.0"})
+        store.put_chart("mychart", "1.0.0", None)
+
+        assert store.get_chart_metadata("mychart", "1.0.0")["name"] == "mychart"
+        assert store.list_charts() == {"mychart": ["1.0.0"]}
+
+    def test_proxy_cache_entry(self, store):
+        """Test proxy cache entries round-trip bytes and metadata."""
+        store.put_cache_entry("k", b"{}", "application/json", {"digest": "sha256:a"})
+        store.update_cache_meta("k", {"digest": "sha256:b"})
+
+        assert store.get_cache_entry("k") == (b"{}", "application/json", {"digest": "sha256:b"})
+
+    def test_parse_manifest_key(self):
+        """Test repository and tag are parsed from bucket keys."""
+        assert _parse_manifest_key(
+            "repositories/library/nginx/_manifests/tags/latest/link"
+        ) == ("library/nginx", "latest")
+        assert _parse_manifest_key(
+            "repositories/app/_manifests/revisions/sha256:abc/content"
+        ) == ("app", None)
+        assert _parse_manifest_key("repositories/app/_layers/x") is None
+
+    @pytest.mark.asyncio
+    async def test_rebuild(self, store):
+        """Test the store is repopulated from bucket keys."""
+        keys = [
+            "repositories/app/_manifests/revisions/sha256:abc/content",
+            "repositories/app/_manifests/tags/v1/link",
+        ]
+
+        async def list_keys(prefix):
+            for key in keys:
+                yield key
+
+        storage = AsyncMock()
+        storage.list_keys = list_keys
+        storage.read_object = AsyncMock(return_value=b"sha256:abc\n")
+        storage.list_charts = AsyncMock(return_value={"mychart": ["1.0.0"]})
+
+        assert store.is_ready() is False
+        await store.rebuild(storage)
+
+        assert store.is_ready() is True
+        assert store.list_repositories() == ["app"]
+        assert store.get_tag("app", "v1") == "sha256:abc"
+        assert store.list_charts() == {"mychart": ["1.0.0"]}
+
+    @pytest.mark.asyncio
+    async def test_rebuild_keeps_concurrent_writes(self, store):
+        """Test a tag pushed while the bucket is listed survives the rebuild."""
+        async def list_keys(prefix):
+            yield "repositories/app/_manifests/tags/v1/link"
+
+        async def read_object(key):
+            store.set_tag("app", "v1", "sha256:new")
+            store.set_tag("app", "v2", "sha256:new")
+            return b"sha256:old"
+
+        storage = AsyncMock()
+        storage.list_keys = list_keys
+        storage.read_object = read_object
+        storage.list_charts = AsyncMock(return_value={})
+
+        await store.rebuild(storage)
+
+        assert store.get_tag("app", "v1") == "sha256:new"
+        assert store.list_tags("app") == ["v1", "v2"]
+
+    @pytest.mark.asyncio
+    async def test_tag_read_from_store(self, store):
+        """Test a known tag costs one manifest read; a stale one follows S3."""
+        objects = {
+            "repositories/app/_manifests/tags/v1/link": b"sha256:new",
+            "repositories/app/_manifests/revisions/sha256:new/content": b"new",
+        }
+        storage = S3Storage(S3Config(), metadata=store)
+        storage.read_object = AsyncMock(side_effect=objects.get)
+
+        store.set_tag("app", "v1", "sha256:new")
+        assert await storage.get_manifest("app", "v1") == (b"new", "sha256:new")
+        assert storage.read_object.call_count == 1
+
+        # The digest this replica knows was removed by another one
+        store.set_tag("app", "v1", "sha256:old")
+        assert await storage.get_manifest("app", "v1") == (b"new", "sha256:new")
+        assert store.get_tag("app", "v1") == "sha256:new"
+
+        del objects["repositories/app/_manifests/tags/v1/link"]
+        store.delete_tag("app", "v1")
+        assert await storage.get_manifest("app", "v1") is None
+
+    @pytest.mark.asyncio
+    async def test_resync_due_after_restart(self, store):
+        """Test a store kept on disk since long ago is resynced at once."""
+        store._db.execute("INSERT INTO state VALUES ('rebuilt_at', '0')")
+        rebuilt = asyncio.Event()
+        store.rebuild = AsyncMock(side_effect=lambda storage: rebuilt.set())
+
+        task = asyncio.create_task(resync_loop(store, AsyncMock(), 300))
+        try:
+            await asyncio.wait_for(rebuilt.wait(), 1)
+        finally:
+            task.cancel()
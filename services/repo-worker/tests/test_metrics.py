@@ -0,0 +1,43 @@
+"""Tests for Prometheus instrumentation."""
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app import create_app
+from app.config import Config
+from app.metrics import record_proxy_lookup
+
+
+def _sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_request_metrics_use_route_template():
+    """Test request metrics are labelled by route rule, not image name."""
+    app = create_app(Config())
+    labels = {"route": "/v2/", "method": "GET", "status": "200"}
+    before = _sample("repo_worker_http_requests_total", labels)
+
+    client = app.test_client()
+    await client.get("/v2/")
+    response = await client.get("/metrics")
+
+    assert _sample("repo_worker_http_requests_total", labels) == before + 1
+    content = await response.get_data(as_text=True)
+    assert "repo_worker_http_request_duration_seconds" in content
+    assert "library/nginx" not in content
+
+
+def test_proxy_lookup_counts_bytes_by_source():
+    """Test cache hits and misses count bytes against cache and upstream."""
+    cache = {"kind": "blob", "source": "cache"}
+    upstream = {"kind": "blob", "source": "upstream"}
+    before_cache = _sample("repo_worker_proxy_bytes_served_total", cache)
+    before_upstream = _sample("repo_worker_proxy_bytes_served_total", upstream)
+
+    record_proxy_lookup("blob", hit=True, size=100)
+    record_proxy_lookup("blob", hit=False, size=40)
+
+    assert _sample("repo_worker_proxy_bytes_served_total", cache) == before_cache + 100
+    assert _sample("repo_worker_proxy_bytes_served_total", upstream) == before_upstream + 40
@@ -0,0 +1,104 @@
+"""Tests for negative caching of upstream failures."""
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.config import Config, NegativeCacheConfig
+from app.proxy.errors import UpstreamError
+from app.proxy.negative import NegativeCache, status_class
+from app.proxy.proxy import ProxyHandler
+
+
+class TestNegativeCache:
+    """Tests for NegativeCache class."""
+
+    def test_status_class(self):
+        """Test status codes map to bounded classes."""
+        assert status_class(404) == "not_found"
+        assert status_class(401) == "auth"
+        assert status_class(403) == "auth"
+        assert status_class(429) == "throttled"
+        assert status_class(503) == "throttled"
+        assert status_class(200) is None
+        assert status_class(400) is None
+
+    def test_put_and_get(self):
+        """Test recorded failures are returned until they expire."""
+        cache = NegativeCache(NegativeCacheConfig())
+        cache.put("dockerhub", "library/nginx", "nope", 404)
+
+        assert cache.get("dockerhub", "library/nginx", "nope") == 404
+        assert cache.get("dockerhub", "library/nginx", "latest") is None
+
+    def test_zero_ttl_not_cached(self):
+        """Test a zero TTL disables caching for that status class."""
+        cache = NegativeCache(NegativeCacheConfig(throttled_ttl_seconds=0))
+        cache.put("dockerhub", "library/nginx", "latest", 503)
+
+        assert cache.get("dockerhub", "library/nginx", "latest") is None
+
+    def test_non_error_status_not_cached(self):
+        """Test statuses that are not failures are never cached."""
+        cache = NegativeCache(NegativeCacheConfig())
+        cache.put("dockerhub", "library/nginx", "latest", 200)
+
+        assert cache.get("dockerhub", "library/nginx", "latest") is None
+
+    def test_bounded_entries(self):
+        """Test the oldest entries are evicted beyond max_entries."""
+        cache = NegativeCache(NegativeCacheConfig(max_entries=2))
+        cache.put("dockerhub", "a", "1", 404)
+        cache.put("dockerhub", "b", "1", 404)
+        cache.put("dockerhub", "c", "1", 404)
+
+        assert cache.get("dockerhub", "a", "1") is None
+        assert cache.get("dockerhub", "c", "1") == 404
+
+    def test_shared_across_instances(self, tmp_path):
+        """Test entries are visible to other processes via the shared file."""
+        config = NegativeCacheConfig(shared_path=str(tmp_path / "neg.db"))
+        NegativeCache(config).put("ghcr", "owner/repo", "v1", 401)
+
+        assert NegativeCache(config).get("ghcr", "owner/repo", "v1") == 401
+
+    def test_disabled(self):
+        """Test nothing is cached when disabled."""
+        cache = NegativeCache(NegativeCacheConfig(enabled=False))
+        cache.put("dockerhub", "library/nginx", "nope", 404)
+
+        assert cache.get("dockerhub", "library/nginx", "nope") is None
+
+
+class TestProxyNegativeCaching:
+    """Tests for negative caching in ProxyHandler."""
+
+    @pytest.fixture
+    def proxy(self):
+        """Create proxy handler with a mocked upstream and empty cache."""
+        storage = AsyncMock()
+        storage.get_cache_entry = AsyncMock(return_value=None)
+        handler = ProxyHandler(storage, Config())
+        handler._upstream_clients["dockerhub"] = AsyncMock()
+        return handler
+
+    @pytest.mark.asyncio
+    async def test_missing_manifest_suppressed(self, proxy):
+        """Test a repeated pull of a missing tag only reaches upstream once."""
+        upstream = proxy.get_upstream("dockerhub")
+        upstream.get_manifest = AsyncMock(return_value=None)
+
+        for _ in range(3):
+            assert await proxy.get_manifest("dockerhub", "library/typo", "1.0") is None
+
+        upstream.get_manifest.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_upstream_error_suppressed(self, proxy):
+        """Test rate-limit errors are cached and not propagated."""
+        upstream = proxy.get_upstream("dockerhub")
+        upstream.get_manifest = AsyncMock(side_effect=UpstreamError(429))
+
+        assert await proxy.get_manifest("dockerhub", "library/nginx", "1.25") is None
+        assert await proxy.get_manifest("dockerhub", "library/nginx", "1.25") is None
+
+        upstream.get_manifest.assert_called_once()
@@ -0,0 +1,148 @@
+"""Tests for the peer cache cluster."""
+
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.bandwidth import iter_bytes
+from app.config import Config, PeerConfig
+from app.proxy.peers import HashRing, PeerCluster
+from app.proxy.proxy import ProxyHandler
+
+SELF = "http://10.0.0.1:5050"
+OTHER = "http://10.0.0.2:5050"
+
+
+def _digest(i: int) -> str:
+    return f"sha256:{i:064x}"
+
+
+class TestHashRing:
+    """Tests for digest ownership on the ring."""
+
+    def test_keys_spread_across_members(self):
+        """Test every member owns a fair share of digests."""
+        members = [f"http://10.0.0.{i}:5050" for i in range(1, 5)]
+        ring = HashRing(members)
+
+        owners = [ring.owner(_digest(i)) for i in range(4000)]
+
+        for member in members:
+            assert 600 < owners.count(member) < 1400
+
+    def test_adding_member_moves_few_keys(self):
+        """Test a new replica only takes over about 1/N of the digests."""
+        members = [f"http://10.0.0.{i}:5050" for i in range(1, 5)]
+        before = HashRing(members)
+        after = HashRing(members + ["http://10.0.0.5:5050"])
+
+        moved = sum(
+            before.owner(_digest(i)) != after.owner(_digest(i)) for i in range(4000)
+        )
+
+        assert moved < 4000 * 0.3
+        assert HashRing([]).owner(_digest(1)) is None
+
+
+class TestPeerCluster:
+    """Tests for membership and self ownership."""
+
+    def test_owner_is_none_for_own_digests(self):
+        """Test digests this replica owns are not forwarded."""
+        cluster = PeerCluster(PeerConfig(enabled=True, self_url=SELF, peers=[OTHER]))
+
+        owners = {cluster.owner(_digest(i)) for i in range(200)}
+
+        assert owners == {None, OTHER}
+
+    def test_single_replica_owns_everything(self):
+        """Test a replica without peers never forwards."""
+        cluster = PeerCluster(PeerConfig(enabled=True, self_url=SELF))
+
+        assert all(cluster.owner(_digest(i)) is None for i in range(50))
+
+
+class TestProxyWithPeers:
+    """Tests for proxy blob misses in a peer cluster."""
+
+    @pytest.fixture
+    def proxy(self):
+        storage = AsyncMock()
+        storage.get_blob = AsyncMock(return_value=None)
+        storage.get_blob_size = AsyncMock(return_value=None)
+        config = Config()
+        config.peers = PeerConfig(enabled=True, self_url=SELF, peers=[OTHER])
+        handler = ProxyHandler(storage, config)
+        upstream = AsyncMock()
+        upstream.get_blob = AsyncMock(return_value=b"layer-bytes")
+        handler._upstream_clients["dockerhub"] = upstream
+        return handler
+
+    def _owned_by(self, proxy, owner):
+        return next(
+            _digest(i) for i in range(1000)
+            if proxy.peers.owner(_digest(i)) == owner
+        )
+
+    @pytest.mark.asyncio
+    async def test_streams_from_owning_peer(self, proxy):
+        """Test a miss owned by a peer is streamed from it, not the upstream."""
+        digest = self._owned_by(proxy, OTHER)
+        proxy.peers.open_blob = AsyncMock(return_value=(True, (5, iter_bytes(b"peer!"))))
+
+        size, chunks, source = await proxy.open_blob("dockerhub", "library/nginx", digest)
+
+        assert (size, source) == (5, "peer")
+        assert b"".join([c async for c in chunks]) == b"peer!"
+        proxy.get_upstream("dockerhub").get_blob.assert_not_called()
+        proxy.storage.put_blob.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_unreachable_peer_falls_back_to_upstream(self, proxy):
+        """Test an unreachable owner costs a cache copy, not the pull."""
+        digest = self._owned_by(proxy, OTHER)
+        proxy.peers.open_blob = AsyncMock(return_value=(False, None))
+
+        size, _, source = await proxy.open_blob("dockerhub", "library/nginx", digest)
+
+        assert (size, source) == (11, "upstream")
+        proxy.get_upstream("dockerhub").get_blob.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_owned_digest_fetched_once(self, proxy):
+        """Test concurrent misses on the owner share one upstream fetch."""
+        digest = self._owned_by(proxy, None)
+        proxy.peers.open_blob = AsyncMock()
+        release = asyncio.Event()
+
+        async def slow_get_blob(image, d):
+            await release.wait()
+            return b"layer-bytes"
+
+        proxy.get_upstream("dockerhub").get_blob = AsyncMock(side_effect=slow_get_blob)
+
+        waiters = [
+            asyncio.create_task(proxy.get_blob("dockerhub", "library/nginx", digest))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*waiters) == [b"layer-bytes"] * 3
+        proxy.get_upstream("dockerhub").get_blob.assert_called_once()
+        proxy.peers.open_blob.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_peer_request_never_forwarded(self, proxy):
+        """Test a blob a peer asks for is streamed from the upstream here."""
+        digest = self._owned_by(proxy, OTHER)
+        proxy.peers.open_blob = AsyncMock()
+
+        size, chunks, source = await proxy.open_blob(
+            "dockerhub", "library/nginx", digest, forward=False
+        )
+
+        assert (size, source) == (11, "upstream")
+        assert b"".join([c async for c in chunks]) == b"layer-bytes"
+        proxy.peers.open_blob.assert_not_called()
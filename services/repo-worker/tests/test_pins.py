@@ -0,0 +1,118 @@
+"""Tests for the pin set of deployed images."""
+
+import json
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.config import Config, PinConfig, UpstreamRegistry
+from app.pins.pinset import PinSet, split_image_reference
+from app.proxy.cache import CacheEntry
+from app.proxy.proxy import ProxyHandler
+
+CONFIG = "sha256:" + "c" * 64
+LAYER = "sha256:" + "1" * 64
+CACHED = "sha256:" + "2" * 64
+MANIFEST = json.dumps({
+    "schemaVersion": 2,
+    "config": {"digest": CONFIG},
+    "layers": [{"digest": LAYER}, {"digest": CACHED}],
+}).encode()
+
+
+def test_split_image_reference():
+    """Test hosts, tags and digests are split like the container runtime."""
+    assert split_image_reference("nginx") == (None, "nginx", "latest")
+    assert split_image_reference("ghcr.io/org/app:1.2") == ("ghcr.io", "org/app", "1.2")
+    assert split_image_reference("localhost:5000/app@sha256:ab") == (
+        "localhost:5000", "app", "sha256:ab"
+    )
+    assert split_image_reference("org/app") == (None, "org/app", "latest")
+
+
+class TestPinSet:
+    """Tests for resolving pinned references."""
+
+    @pytest.fixture
+    def pins(self):
+        storage = AsyncMock()
+        storage.read_object = AsyncMock(return_value=json.dumps(["registry.local/team/api:v3"]).encode())
+        storage.get_manifest = AsyncMock(return_value=None)
+        storage.find_missing = AsyncMock(
+            side_effect=lambda name, blobs, manifests: [d for d in blobs if d != CACHED]
+        )
+        config = Config()
+        config.builtin_upstreams = [
+            UpstreamRegistry(name="dockerhub", url="https://registry-1.docker.io"),
+            UpstreamRegistry(name="quay", url="https://quay.io"),
+        ]
+        proxy = ProxyHandler(storage, config)
+        proxy.cache.get_entry = AsyncMock(
+            side_effect=lambda upstream, image, ref: CacheEntry(
+                digest="sha256:" + "m" * 64, mutable=False, last_check=0,
+                last_updated=0, content=MANIFEST,
+            ) if (upstream, image, ref) == ("dockerhub", "library/nginx", "1.25") else None
+        )
+        pins = PinSet(
+            storage, PinConfig(enabled=True, registry_hosts=["registry.local"]),
+            "http://flask-backend:5000", proxy,
+        )
+        pins._deployments = {7: ["nginx:1.25", "quay.io/org/missing:1"], 8: ["example.com/x:1"]}
+        return pins
+
+    @pytest.mark.asyncio
+    async def test_resolves_deployed_and_manual_pins(self, pins):
+        """Test deployed images pin their manifest and layers."""
+        await pins.resolve()
+
+        nginx = pins.images["nginx:1.25"]
+        assert nginx.repository == "dockerhub/library/nginx"
+        assert nginx.sources == {"deployment:7"}
+        assert pins.is_pinned(LAYER) and pins.is_pinned(CACHED)
+        assert pins.is_pinned("sha256:" + "m" * 64)
+        assert pins.images["registry.local/team/api:v3"].sources == {"manual"}
+        assert pins.images["example.com/x:1"].repository == ""
+
+    @pytest.mark.asyncio
+    async def test_reports_content_to_warm(self, pins):
+        """Test uncached layers and manifests are reported as missing."""
+        await pins.resolve()
+
+        missing = {image.reference: image.missing for image in pins.missing()}
+        assert missing["nginx:1.25"] == [CONFIG, LAYER]
+        assert missing["quay.io/org/missing:1"] == ["1"]
+        assert missing["registry.local/team/api:v3"] == ["v3"]
+        assert "example.com/x:1" not in missing
+
+    @pytest.mark.asyncio
+    async def test_deleted_deployments_unpinned(self, pins, monkeypatch):
+        """Test a deployment reported deleted drops out of the pin set."""
+        pages = [{
+            "deployments": [{"id": 7, "status": "deleted", "images": []}],
+            "next": {"since": "2026-01-01T00:00:00", "after_id": 7},
+            "has_more": False,
+        }]
+
+        class FakeResponse:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+            def raise_for_status(self):
+                pass
+
+            async def json(self):
+                return pages.pop(0)
+
+        pins._session = AsyncMock()
+        pins._session.closed = False
+        pins._session.get = lambda url, params: FakeResponse()
+
+        assert await pins.sync() == 1
+        await pins.resolve()
+
+        assert "nginx:1.25" not in pins.images
+        assert not pins.is_pinned(LAYER)
+        assert pins._cursor == {"since": "2026-01-01T00:00:00", "after_id": 7}
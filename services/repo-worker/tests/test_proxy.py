@@ -0,0 +1,217 @@
+"""Tests for the pull-through proxy handler."""
+
+import json
+
+import aiohttp
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.config import Config
+from app.proxy.errors import UpstreamError
+from app.proxy.proxy import ProxyHandler
+from app.proxy.upstream import BlobInfo, ManifestResult
+
+
+class TestProxyBlobInfo:
+    """Tests for answering blob HEAD requests via the proxy."""
+
+    @pytest.fixture
+    def mock_storage(self):
+        """Create mock storage with an empty blob cache."""
+        storage = AsyncMock()
+        storage.get_blob_size = AsyncMock(return_value=None)
+        storage.blob_exists = AsyncMock(return_value=False)
+        return storage
+
+    @pytest.fixture
+    def proxy(self, mock_storage):
+        """Create proxy handler with a mocked Docker Hub upstream."""
+        handler = ProxyHandler(mock_storage, Config())
+        upstream = AsyncMock()
+        upstream.head_blob = AsyncMock(
+            return_value=BlobInfo(digest="sha256:abc123", size=1024)
+        )
+        upstream.get_blob = AsyncMock(return_value=b"layer-bytes")
+        handler._upstream_clients["dockerhub"] = upstream
+        return handler
+
+    @pytest.mark.asyncio
+    async def test_blob_info_from_cache(self, proxy, mock_storage):
+        """Test cached blobs are answered without contacting upstream."""
+        mock_storage.get_blob_size.return_value = 2048
+
+        info = await proxy.blob_info("dockerhub", "library/nginx", "sha256:abc123")
+
+        assert info.size == 2048
+        proxy.get_upstream("dockerhub").head_blob.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_blob_info_uses_upstream_head(self, proxy):
+        """Test cache misses use HEAD and never transfer layer bytes."""
+        info = await proxy.blob_info("dockerhub", "library/nginx", "sha256:abc123")
+
+        assert info.size == 1024
+        upstream = proxy.get_upstream("dockerhub")
+        upstream.head_blob.assert_called_once_with("library/nginx", "sha256:abc123")
+        upstream.get_blob.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_blob_exists_missing_upstream(self, proxy):
+        """Test unknown upstreams report the blob as missing."""
+        assert await proxy.blob_exists("unknown", "foo/bar", "sha256:abc123") is False
+
+
+class TestProxyManifestCache:
+    """Tests for single-read proxy manifest cache lookups."""
+
+    @pytest.fixture
+    def mock_storage(self):
+        """Create mock storage holding one immutable cached manifest."""
+        storage = AsyncMock()
+        storage.get_cache_entry = AsyncMock(
+            return_value=(
+                b'{"schemaVersion": 2}',
+                "application/vnd.oci.image.manifest.v1+json",
+                {
+                    "digest": "sha256:abc123",
+                    "mutable": "false",
+                    "last-check": "1700000000.0",
+                    "last-updated": "1700000000.0",
+                },
+            )
+        )
+        return storage
+
+    @pytest.fixture
+    def proxy(self, mock_storage):
+        """Create proxy handler with a mocked Docker Hub upstream."""
+        handler = ProxyHandler(mock_storage, Config())
+        handler._upstream_clients["dockerhub"] = AsyncMock()
+        return handler
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_single_read(self, proxy, mock_storage):
+        """Test a cache hit needs one storage read, then none from memory."""
+        first = await proxy.get_manifest("dockerhub", "library/nginx", "1.25.0")
+        second = await proxy.get_manifest("dockerhub", "library/nginx", "1.25.0")
+
+        assert first == (b'{"schemaVersion": 2}', "sha256:abc123")
+        assert second == first
+        mock_storage.get_cache_entry.assert_called_once()
+        mock_storage.get_manifest.assert_not_called()
+        proxy.get_upstream("dockerhub").get_manifest.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cache_miss_stores_entry(self, proxy, mock_storage):
+        """Test a fetched manifest is stored as one object with metadata."""
+        mock_storage.get_cache_entry.return_value = None
+        upstream = proxy.get_upstream("dockerhub")
+        upstream.get_manifest = AsyncMock(
+            return_value=ManifestResult(
+                content=b"{}", digest="sha256:def456", content_type="application/json"
+            )
+        )
+
+        result = await proxy.get_manifest("dockerhub", "library/nginx", "latest")
+
+        assert result == (b"{}", "sha256:def456")
+        mock_storage.put_cache_entry.assert_called_once()
+        meta = mock_storage.put_cache_entry.call_args[0][5]
+        assert meta["digest"] == "sha256:def456"
+        assert meta["mutable"] == "true"
+
+
+class TestProxyBlobFetch:
+    """Tests for fetching missing blobs from the upstream."""
+
+    @pytest.fixture
+    def proxy(self):
+        """Create a proxy whose segmented downloads take every blob."""
+        storage = AsyncMock()
+        storage.get_blob = AsyncMock(return_value=None)
+        storage.get_blob_size = AsyncMock(return_value=None)
+        handler = ProxyHandler(storage, Config())
+        handler.segmented.config.enabled = True
+        handler.segmented.config.threshold_mb = 0
+        upstream = AsyncMock()
+        upstream.head_blob = AsyncMock(
+            return_value=BlobInfo(digest="sha256:abc123", size=1024)
+        )
+        upstream.stream_blob = MagicMock()
+        handler._upstream_clients["dockerhub"] = upstream
+        return handler
+
+    @pytest.mark.asyncio
+    async def test_segmented_blob_streamed_from_storage(self, proxy):
+        """Test a segmented download is not read back into memory."""
+        proxy.segmented.download = AsyncMock(return_value=True)
+        proxy.storage.get_blob_stream = lambda digest: f"stream:{digest}"
+
+        size, chunks, source = await proxy.open_blob("dockerhub", "library/nginx", "sha256:abc123")
+
+        assert (size, chunks, source) == (1024, "stream:sha256:abc123", "upstream")
+        proxy.storage.get_blob.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_digest_mismatch_is_not_served(self, proxy):
+        """Test corrupt upstream content is reported missing, not raised."""
+        proxy.segmented.download = AsyncMock(side_effect=ValueError("Digest mismatch"))
+        proxy.storage.put_blob_stream = AsyncMock(side_effect=ValueError("Digest mismatch"))
+
+        assert await proxy.open_blob("dockerhub", "library/nginx", "sha256:abc123") is None
+
+    @pytest.mark.asyncio
+    async def test_range_ignored_falls_back_to_one_stream(self, proxy):
+        """Test an upstream without Range support still serves the blob."""
+        proxy.segmented.download = AsyncMock(
+            side_effect=UpstreamError(200, "upstream does not support range requests")
+        )
+        proxy.storage.get_blob_stream = lambda digest: f"stream:{digest}"
+
+        opened = await proxy.open_blob("dockerhub", "library/nginx", "sha256:abc123")
+
+        assert opened == (1024, "stream:sha256:abc123", "upstream")
+        proxy.storage.put_blob_stream.assert_called_once()
+        assert proxy.negative_cache.get("dockerhub", "library/nginx", "sha256:abc123") is None
+
+    @pytest.mark.asyncio
+    async def test_cache_blob_never_buffers(self, proxy):
+        """Test a background fetch streams even blobs below the threshold."""
+        proxy.segmented.config.enabled = False
+
+        assert await proxy.cache_blob("dockerhub", "library/nginx", "sha256:abc123") is True
+        proxy.storage.put_blob_stream.assert_called_once()
+        proxy.get_upstream("dockerhub").get_blob.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_connection_error_is_not_raised(self, proxy):
+        """Test a blob the upstream cannot be reached for is reported missing."""
+        proxy.segmented.download = AsyncMock(side_effect=aiohttp.ClientError("reset"))
+        proxy.storage.put_blob_stream = AsyncMock(side_effect=aiohttp.ClientError("reset"))
+
+        assert await proxy.open_blob("dockerhub", "library/nginx", "sha256:abc123") is None
+
+
+class TestManifestBlobPrefetch:
+    """Tests for caching the blobs of a revalidated manifest."""
+
+    @pytest.mark.asyncio
+    async def test_blobs_streamed_into_storage(self):
+        """Test missing layers are streamed, never buffered whole."""
+        storage = AsyncMock()
+        storage.blob_exists = AsyncMock(side_effect=lambda digest: digest == "sha256:cfg")
+        handler = ProxyHandler(storage, Config())
+        upstream = AsyncMock()
+        upstream.stream_blob = MagicMock(return_value="chunks")
+        manifest = json.dumps({
+            "config": {"digest": "sha256:cfg", "size": 10},
+            "layers": [
+                {"digest": "sha256:big", "size": 3 * 1024 ** 3},
+                {"digest": "sha256:nosize"},
+            ],
+        }).encode()
+
+        await handler._cache_manifest_blobs(upstream, "dockerhub", "library/nginx", manifest)
+
+        storage.put_blob_stream.assert_called_once_with("sha256:big", "chunks", 3 * 1024 ** 3)
+        upstream.get_blob.assert_not_called()
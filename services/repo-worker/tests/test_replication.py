@@ -0,0 +1,164 @@
+"""Tests for asynchronous replication to secondary targets."""
+
+import hashlib
+import json
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.config import ReplicationConfig, ReplicationTarget
+from app.replication import ReplicationEvent, Replicator, _Target
+
+
+def _digest(content: bytes) -> str:
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+class FakeTarget(_Target):
+    """In-memory target recording what was copied."""
+
+    def __init__(self, name="dr", repositories=("*",)):
+        super().__init__(ReplicationTarget(name=name, repositories=list(repositories)))
+        self.blobs: set[str] = set()
+        self.manifests: dict[tuple[str, str], str] = {}
+        self.copied: list[str] = []
+        self.failures = 0
+
+    async def manifest_digest(self, repository, reference):
+        return self.manifests.get((repository, reference))
+
+    async def has_blob(self, repository, digest):
+        return digest in self.blobs
+
+    async def copy_blob(self, repository, digest, size):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("target unavailable")
+        self.blobs.add(digest)
+        self.copied.append(digest)
+        return "streamed"
+
+    async def put_manifest(self, repository, reference, content, media_type):
+        self.copied.append(f"manifest:{reference}")
+        self.manifests[(repository, reference)] = _digest(content)
+
+
+class TestReplicator:
+    """Tests for replicating manifests and their blobs."""
+
+    @pytest.fixture
+    def image(self):
+        config, layer = _digest(b"config"), _digest(b"layer")
+        manifest = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.oci.image.manifest.v1+json",
+            "config": {"digest": config},
+            "layers": [{"digest": layer}],
+        }).encode()
+        index = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.oci.image.index.v1+json",
+            "manifests": [{"digest": _digest(manifest)}],
+        }).encode()
+        return {"config": config, "layer": layer, "manifest": manifest, "index": index}
+
+    @pytest.fixture
+    def storage(self, image):
+        manifests = {
+            _digest(image["manifest"]): image["manifest"],
+            _digest(image["index"]): image["index"],
+            "v1": image["index"],
+        }
+        storage = AsyncMock()
+        storage.get_manifest = AsyncMock(
+            side_effect=lambda repo, ref: (
+                (manifests[ref], _digest(manifests[ref])) if ref in manifests else None
+            )
+        )
+        storage.get_blob_size = AsyncMock(return_value=10)
+        storage.list_repositories = AsyncMock(return_value=["team/app", "other/app"])
+        storage.list_tags = AsyncMock(return_value=["v1"])
+        return storage
+
+    def _replicator(self, storage, target, **overrides):
+        replicator = Replicator(storage, ReplicationConfig(**overrides))
+        replicator.targets = {target.name: target}
+        return replicator
+
+    @pytest.mark.asyncio
+    async def test_copies_only_missing_blobs_then_manifests(self, storage, image):
+        """Test blobs go first, children before the index, present blobs skipped."""
+        target = FakeTarget()
+        target.blobs.add(image["config"])
+        replicator = self._replicator(storage, target)
+
+        await replicator.replicate(
+            target, ReplicationEvent("team/app", "v1", _digest(image["index"]))
+        )
+
+        assert target.copied == [
+            image["layer"],
+            f"manifest:{_digest(image['manifest'])}",
+            "manifest:v1",
+        ]
+        assert target.manifests[("team/app", "v1")] == _digest(image["index"])
+
+    @pytest.mark.asyncio
+    async def test_up_to_date_target_is_skipped(self, storage, image):
+        """Test nothing is transferred when the target already has the tag."""
+        target = FakeTarget()
+        target.manifests[("team/app", "v1")] = _digest(image["index"])
+        replicator = self._replicator(storage, target)
+
+        await replicator.replicate(
+            target, ReplicationEvent("team/app", "v1", _digest(image["index"]))
+        )
+
+        assert target.copied == []
+        storage.get_manifest.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_retries_with_backoff(self, storage, image, monkeypatch):
+        """Test transient target failures are retried after a backoff."""
+        sleeps = []
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+
+        monkeypatch.setattr("app.replication.asyncio.sleep", fake_sleep)
+        target = FakeTarget()
+        target.blobs.add(image["config"])
+        target.failures = 2
+        replicator = self._replicator(storage, target, max_retries=3)
+
+        ok = await replicator._replicate_with_retry(
+            target, ReplicationEvent("team/app", "v1", _digest(image["index"]))
+        )
+
+        assert ok
+        assert len(sleeps) == 2 and sleeps[1] >= sleeps[0]
+        assert ("team/app", "v1") in target.manifests
+
+    @pytest.mark.asyncio
+    async def test_enqueue_filters_and_coalesces(self, storage):
+        """Test only matching targets get events and re-pushes coalesce."""
+        target = FakeTarget(repositories=["team/*"])
+        replicator = self._replicator(storage, target)
+
+        replicator.enqueue("other/app", "v1", "sha256:aaa")
+        replicator.enqueue("team/app", "v1", "sha256:aaa")
+        replicator.enqueue("team/app", "v1", "sha256:bbb")
+
+        assert replicator._queue.qsize() == 1
+        assert replicator._pending[("dr", "team/app", "v1")].digest == "sha256:bbb"
+
+    @pytest.mark.asyncio
+    async def test_reconcile_queues_stale_tags(self, storage, image):
+        """Test reconcile queues tags the target lacks or has at another digest."""
+        target = FakeTarget(repositories=["team/*"])
+        replicator = self._replicator(storage, target)
+
+        assert await replicator.reconcile() == 1
+        target.manifests[("team/app", "v1")] = _digest(image["index"])
+        replicator._pending.clear()
+        assert await replicator.reconcile() == 0
@@ -0,0 +1,111 @@
+"""Tests for adaptive S3 concurrency limits."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import S3ConcurrencyConfig, S3PoolLimit
+from app.storage.limiter import AdaptiveLimit, S3Limiter, operation_pool
+
+
+def _limit(initial=2, min=1, max=10, latency_target_ms=0):
+    return AdaptiveLimit(
+        "read", S3PoolLimit(initial, min, max, latency_target_ms), backoff_ratio=0.5
+    )
+
+
+class TestAdaptiveLimit:
+    """Tests for AIMD limit changes and queueing."""
+
+    @pytest.mark.asyncio
+    async def test_calls_over_limit_wait(self):
+        """Test a call waits until a slot is released."""
+        limit = _limit(initial=1)
+        await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+
+        assert not waiter.done()
+        limit.release(time.monotonic(), throttled=False)
+        await waiter
+        assert limit.in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_grows_while_saturated(self):
+        """Test successful calls raise the limit only when it was reached."""
+        limit = _limit(initial=2)
+        await limit.acquire()
+        limit.release(time.monotonic(), throttled=False)
+        assert limit.limit == 2
+
+        await limit.acquire()
+        await limit.acquire()
+        limit.release(time.monotonic(), throttled=False)
+        assert limit.limit == 2.5
+
+    @pytest.mark.asyncio
+    async def test_throttling_decreases_once_per_round_trip(self):
+        """Test a burst of 503s from one round only halves the limit once."""
+        limit = _limit(initial=8)
+        started = time.monotonic()
+        for _ in range(4):
+            await limit.acquire()
+        for _ in range(4):
+            limit.release(started, throttled=True)
+
+        assert limit.limit == 4
+        await limit.acquire()
+        limit.release(time.monotonic(), throttled=True)
+        assert limit.limit == 2
+
+    @pytest.mark.asyncio
+    async def test_slow_responses_count_as_congestion(self):
+        """Test responses over the latency target shrink the limit."""
+        limit = _limit(initial=8, latency_target_ms=100)
+        await limit.acquire()
+        limit.release(time.monotonic() - 1, throttled=False)
+
+        assert limit.limit == 4
+
+
+class TestS3Limiter:
+    """Tests for the botocore hooks."""
+
+    def test_operation_pools(self):
+        """Test operations map to read, write and list pools."""
+        assert operation_pool("GetObject") == "read"
+        assert operation_pool("HeadObject") == "read"
+        assert operation_pool("ListObjectsV2") == "list"
+        assert operation_pool("UploadPart") == "write"
+        assert operation_pool("DeleteObject") == "write"
+
+    @pytest.mark.asyncio
+    async def test_retried_slowdown_shrinks_pool(self):
+        """Test a 503 botocore retried still counts against the pool."""
+        limiter = S3Limiter(S3ConcurrencyConfig())
+        pool = limiter.pools["write"]
+        context = {}
+
+        await limiter._before_call(model=SimpleNamespace(name="PutObject"), context=context)
+        limiter._needs_retry(
+            response=(SimpleNamespace(status_code=503), {}),
+            request_dict={"context": context},
+        )
+        limiter._after_call(http_response=SimpleNamespace(status_code=200), context=context)
+
+        assert pool.in_flight == 0
+        assert pool.limit == 16 * 0.7
+
+    @pytest.mark.asyncio
+    async def test_failed_call_returns_slot(self):
+        """Test connection errors release the slot without adapting."""
+        limiter = S3Limiter(S3ConcurrencyConfig())
+        context = {}
+
+        await limiter._before_call(model=SimpleNamespace(name="ListObjectsV2"), context=context)
+        assert limiter.pools["list"].in_flight == 1
+        limiter._after_call_error(context=context, exception=ConnectionError())
+
+        assert limiter.pools["list"].in_flight == 0
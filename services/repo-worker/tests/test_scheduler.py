@@ -0,0 +1,89 @@
+"""Tests for the rate-limit-aware upstream scheduler."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.config import UpstreamSchedulerConfig
+from app.proxy.errors import RateLimited
+from app.proxy.scheduler import Priority, UpstreamScheduler
+
+
+class TestUpstreamScheduler:
+    """Tests for UpstreamScheduler class."""
+
+    @pytest.fixture
+    def scheduler(self):
+        """Create scheduler allowing a single concurrent request."""
+        return UpstreamScheduler(
+            "dockerhub",
+            UpstreamSchedulerConfig(
+                max_concurrent=1, low_quota_threshold=5, max_wait_seconds=1
+            ),
+        )
+
+    def test_observe_quota_headers(self, scheduler):
+        """Test quota is parsed from Docker Hub RateLimit headers."""
+        scheduler.observe(
+            200,
+            {"RateLimit-Limit": "100;w=21600", "RateLimit-Remaining": "76;w=21600"},
+        )
+
+        assert scheduler.limit == 100
+        assert scheduler.remaining == 76
+        assert scheduler.quota_low() is False
+
+    def test_low_quota(self, scheduler):
+        """Test quota at the threshold is reported as low."""
+        scheduler.observe(200, {"RateLimit-Remaining": "5;w=21600"})
+
+        assert scheduler.quota_low() is True
+
+    def test_429_retry_after(self, scheduler):
+        """Test 429 responses block the upstream for Retry-After seconds."""
+        scheduler.observe(429, {"Retry-After": "120"})
+
+        assert scheduler.blocked_until >= time.time() + 119
+        assert scheduler.quota_low() is True
+
+    @pytest.mark.asyncio
+    async def test_background_refused_when_low(self, scheduler):
+        """Test background work is deferred while quota is low."""
+        scheduler.observe(200, {"RateLimit-Remaining": "1"})
+
+        with pytest.raises(RateLimited):
+            async with scheduler.slot(Priority.BACKGROUND):
+                pass
+
+        async with scheduler.slot(Priority.MANIFEST):
+            pass
+
+    @pytest.mark.asyncio
+    async def test_foreground_refused_when_blocked_too_long(self, scheduler):
+        """Test client requests fail fast instead of waiting out long backoffs."""
+        scheduler.observe(429, {"Retry-After": "60"})
+
+        with pytest.raises(RateLimited):
+            async with scheduler.slot(Priority.MANIFEST):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self, scheduler):
+        """Test queued manifest requests run before queued blob requests."""
+        order = []
+
+        async def request(priority: Priority, label: str):
+            async with scheduler.slot(priority):
+                order.append(label)
+                await asyncio.sleep(0)
+
+        async with scheduler.slot(Priority.BLOB):
+            tasks = [
+                asyncio.create_task(request(Priority.BLOB, "blob")),
+                asyncio.create_task(request(Priority.MANIFEST, "manifest")),
+            ]
+            await asyncio.sleep(0)
+
+        await asyncio.gather(*tasks)
+        assert order == ["manifest", "blob"]
@@ -0,0 +1,125 @@
+"""Tests for the background integrity scrubber."""
+
+import hashlib
+import json
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.config import ScrubberConfig
+from app.storage.s3 import S3Storage
+from app.storage.scrubber import CURSOR_KEY, Scrubber
+
+
+def _digest(content: bytes) -> str:
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+class MemoryBucket:
+    """Objects held in a dict, keyed like the S3 bucket."""
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.reads: list[str] = []
+
+    _blob_key = S3Storage._blob_key
+    digest_from_blob_key = S3Storage.digest_from_blob_key
+
+    def add_blob(self, content: bytes, digest: str = "") -> str:
+        digest = digest or _digest(content)
+        self.objects[self._blob_key(digest)] = content
+        return digest
+
+    async def list_keys(self, prefix, start_after=""):
+        for key in sorted(self.objects):
+            if key.startswith(prefix) and key > start_after:
+                yield key
+
+    async def read_object(self, key):
+        return self.objects.get(key)
+
+    async def write_object(self, key, content, content_type):
+        self.objects[key] = content
+
+    async def get_blob_stream(self, digest):
+        key = self._blob_key(digest)
+        self.reads.append(digest)
+        content = self.objects.get(key, b"")
+        for offset in range(0, len(content), 5):
+            yield content[offset:offset + 5]
+
+    async def get_blob_size(self, digest):
+        content = self.objects.get(self._blob_key(digest))
+        return None if content is None else len(content)
+
+    async def quarantine_blob(self, digest, reason):
+        key = self._blob_key(digest)
+        self.objects[f"quarantine/{key}"] = self.objects.pop(key)
+        return f"quarantine/{key}"
+
+
+class TestScrubber:
+    """Tests for blob re-hashing, descriptor checks and resuming."""
+
+    @pytest.fixture
+    def bucket(self):
+        return MemoryBucket()
+
+    def _scrubber(self, bucket, proxy=None, **overrides):
+        return Scrubber(bucket, ScrubberConfig(enabled=True, **overrides), proxy)
+
+    @pytest.mark.asyncio
+    async def test_corrupt_blob_is_quarantined(self, bucket):
+        """Test a blob not matching its digest is moved aside, good blobs stay."""
+        good = bucket.add_blob(b"good layer")
+        bad = bucket.add_blob(b"bit rot", digest=_digest(b"original layer"))
+
+        await self._scrubber(bucket).scrub_pass()
+
+        assert bucket.objects[bucket._blob_key(good)] == b"good layer"
+        assert bucket._blob_key(bad) not in bucket.objects
+        assert f"quarantine/{bucket._blob_key(bad)}" in bucket.objects
+        assert json.loads(bucket.objects[CURSOR_KEY])["last_key"] == ""
+
+    @pytest.mark.asyncio
+    async def test_resumes_after_saved_key(self, bucket):
+        """Test a restarted pass skips blobs before the saved cursor."""
+        digests = sorted(bucket.add_blob(f"layer-{i}".encode()) for i in range(3))
+        bucket.objects[CURSOR_KEY] = json.dumps({
+            "phase": "blobs", "last_key": bucket._blob_key(digests[0]),
+        }).encode()
+
+        await self._scrubber(bucket, check_descriptors=False).scrub_pass()
+
+        assert bucket.reads == digests[1:]
+
+    @pytest.mark.asyncio
+    async def test_refetches_quarantined_proxy_blobs(self, bucket):
+        """Test corrupt proxy blobs are pulled again from their upstream."""
+        layer = _digest(b"upstream layer")
+        bucket.add_blob(b"corrupted", digest=layer)
+        bucket.objects["cache/dockerhub/library/nginx/latest/manifest"] = json.dumps({
+            "schemaVersion": 2,
+            "layers": [{"digest": layer, "size": 14}],
+        }).encode()
+        proxy = AsyncMock()
+        proxy.cache_blob = AsyncMock(return_value=True)
+
+        scrubber = self._scrubber(bucket, proxy)
+        await scrubber.scrub_pass()
+
+        proxy.cache_blob.assert_called_once_with("dockerhub", "library/nginx", layer)
+        assert layer not in scrubber.cursor.quarantined
+
+    @pytest.mark.asyncio
+    async def test_descriptor_size_mismatch_rehashes_blob(self, bucket):
+        """Test a local manifest listing the wrong size triggers a re-hash."""
+        layer = bucket.add_blob(b"layer")
+        bucket.objects[
+            "repositories/team/app/_manifests/revisions/sha256:abc/content"
+        ] = json.dumps({"layers": [{"digest": layer, "size": 99}]}).encode()
+
+        await self._scrubber(bucket).scrub_pass()
+
+        assert bucket.reads == [layer, layer]
+        assert bucket._blob_key(layer) in bucket.objects
@@ -0,0 +1,98 @@
+"""Tests for segmented upstream blob downloads."""
+
+import hashlib
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.config import SegmentedDownloadConfig
+from app.proxy.errors import UpstreamError
+from app.proxy.segmented import SegmentedDownloader
+
+SEGMENT = 5 * 1024 * 1024
+
+
+class TestSegmentedDownloader:
+    """Tests for SegmentedDownloader class."""
+
+    @pytest.fixture
+    def blob(self):
+        """Create a blob spanning three segments."""
+        return bytes(range(256)) * (SEGMENT * 2 // 256) + b"tail"
+
+    @pytest.fixture
+    def mock_storage(self):
+        """Create mock storage recording multipart calls."""
+        storage = AsyncMock()
+        storage.start_blob_upload = AsyncMock(return_value="upload-1")
+        storage.put_blob_part = AsyncMock(
+            side_effect=lambda digest, upload_id, number, data: f"etag-{number}"
+        )
+        return storage
+
+    @pytest.fixture
+    def upstream(self, blob):
+        """Create mock upstream serving byte ranges of the blob."""
+        upstream = AsyncMock()
+        upstream.name = "ghcr"
+        upstream.resolve_blob_location = AsyncMock(return_value=("https://cdn", {}))
+        upstream.get_blob_range = AsyncMock(
+            side_effect=lambda location, start, end: blob[start:end + 1]
+        )
+        return upstream
+
+    @pytest.fixture
+    def downloader(self, mock_storage):
+        """Create downloader with minimum-size segments and no retry delay."""
+        return SegmentedDownloader(
+            mock_storage,
+            SegmentedDownloadConfig(
+                enabled=True, threshold_mb=1, segment_size_mb=5, concurrency=2,
+                max_retries=1,
+            ),
+        )
+
+    def test_should_segment(self, downloader):
+        """Test only blobs above the threshold are segmented."""
+        assert downloader.should_segment(2 * 1024 * 1024) is True
+        assert downloader.should_segment(1024) is False
+
+    @pytest.mark.asyncio
+    async def test_download_completes_upload(self, downloader, upstream, mock_storage, blob):
+        """Test segments are uploaded as parts and committed after verification."""
+        digest = f"sha256:{hashlib.sha256(blob).hexdigest()}"
+
+        assert await downloader.download(upstream, "owner/model", digest, len(blob)) is True
+
+        assert upstream.get_blob_range.call_count == 3
+        mock_storage.complete_blob_upload.assert_called_once()
+        parts = mock_storage.complete_blob_upload.call_args[0][2]
+        assert sorted(parts) == [(1, "etag-1"), (2, "etag-2"), (3, "etag-3")]
+        mock_storage.abort_blob_upload.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_digest_mismatch_aborts(self, downloader, upstream, mock_storage, blob):
+        """Test corrupt content aborts the multipart upload."""
+        with pytest.raises(ValueError):
+            await downloader.download(upstream, "owner/model", "sha256:bad", len(blob))
+
+        mock_storage.complete_blob_upload.assert_not_called()
+        mock_storage.abort_blob_upload.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_segment_retried(self, downloader, upstream, mock_storage, blob):
+        """Test a failed segment is retried without refetching the others."""
+        digest = f"sha256:{hashlib.sha256(blob).hexdigest()}"
+        calls = []
+
+        def flaky(location, start, end):
+            calls.append(start)
+            if start == SEGMENT and calls.count(start) == 1:
+                raise UpstreamError(503)
+            return blob[start:end + 1]
+
+        upstream.get_blob_range.side_effect = flaky
+
+        assert await downloader.download(upstream, "owner/model", digest, len(blob)) is True
+        assert calls.count(0) == 1
+        assert calls.count(SEGMENT) == 2
@@ -0,0 +1,106 @@
+"""Tests for optional OpenTelemetry tracing."""
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app import create_app, tracing
+from app.config import Config, TracingConfig
+
+pytest.importorskip("opentelemetry.sdk")
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class Store:
+    """Class traced like S3Storage."""
+
+    async def get(self, key):
+        with tracing.span("hash.sha256", size=3):
+            return key
+
+    async def stream(self):
+        yield b"a"
+        yield b"b"
+
+
+Traced = tracing.trace_methods("store")(Store)
+
+
+@pytest.fixture
+def spans():
+    """Record spans in memory for one test."""
+    tracing.setup_tracing(TracingConfig(enabled=True, exporter="memory"))
+    yield tracing.finished_spans
+    tracing.shutdown_tracing()
+
+
+@pytest.mark.asyncio
+async def test_disabled_records_nothing():
+    """Test traced code runs unchanged while tracing is off."""
+    assert not tracing.enabled()
+    assert tracing.span("noop") is tracing.span("other")
+    assert await Traced().get("k") == "k"
+    assert [chunk async for chunk in Traced().stream()] == [b"a", b"b"]
+
+
+@pytest.mark.asyncio
+async def test_methods_and_blocks_nest(spans):
+    """Test a span inside a traced method is its child."""
+    await Traced().get("k")
+    chunks = [chunk async for chunk in Traced().stream()]
+
+    hashed, get, stream = spans()
+    assert chunks == [b"a", b"b"]
+    assert (hashed.name, get.name, stream.name) == ("hash.sha256", "store.get", "store.stream")
+    assert hashed.parent.span_id == get.context.span_id
+    assert hashed.attributes["size"] == 3
+
+
+@pytest.mark.asyncio
+async def test_request_continues_traceparent():
+    """Test a route span joins the caller's trace."""
+    config = Config()
+    config.tracing = TracingConfig(enabled=True, exporter="memory")
+    client = create_app(config).test_client()
+    try:
+        response = await client.get(
+            "/healthz", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        )
+        spans = tracing.finished_spans()
+    finally:
+        tracing.shutdown_tracing()
+
+    assert response.status_code == 200
+    server = next(s for s in spans if s.name == "GET /healthz")
+    assert format(server.context.trace_id, "032x") == TRACE_ID
+    assert format(server.parent.span_id, "016x") == PARENT_ID
+    assert server.attributes["http.response.status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_client_requests_send_traceparent(spans):
+    """Test outgoing requests carry the current trace."""
+    received = {}
+
+    async def handler(request):
+        received["traceparent"] = request.headers.get("traceparent")
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    async with TestServer(app) as server:
+        with tracing.span("pull"):
+            async with aiohttp.ClientSession(
+                trace_configs=tracing.client_trace_configs()
+            ) as session:
+                async with session.get(server.make_url("/")) as response:
+                    await response.read()
+
+    client = next(s for s in spans() if s.name.startswith("GET "))
+    assert received["traceparent"].startswith(
+        f"00-{format(client.context.trace_id, '032x')}-"
+        f"{format(client.context.span_id, '016x')}-"
+    )
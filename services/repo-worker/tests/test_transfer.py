@@ -0,0 +1,235 @@
+"""Tests for OCI layout bundle export and import."""
+
+import gzip
+import hashlib
+import io
+import json
+import tarfile
+
+import pytest
+
+from app.transfer import layout
+from app.transfer.layout import (
+    LayoutError,
+    compress_stream,
+    import_layout,
+    layout_size,
+    plan_export,
+    stream_layout,
+)
+
+
+def _digest(content: bytes) -> str:
+    return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+
+class MemoryStorage:
+    """Blob and manifest storage held in dicts."""
+
+    def __init__(self):
+        self.blobs: dict[str, bytes] = {}
+        self.manifests: dict[tuple[str, str], str] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+
+    async def blob_exists(self, digest):
+        return digest in self.blobs
+
+    async def get_blob(self, digest):
+        return self.blobs.get(digest)
+
+    async def get_blob_size(self, digest):
+        blob = self.blobs.get(digest)
+        return None if blob is None else len(blob)
+
+    async def get_blob_stream(self, digest):
+        blob = self.blobs[digest]
+        for offset in range(0, len(blob), 7):
+            yield blob[offset:offset + 7]
+
+    async def put_blob(self, digest, content):
+        if _digest(content) != digest:
+            raise ValueError(f"Digest mismatch: expected {digest}")
+        self.blobs[digest] = content
+
+    async def start_blob_upload(self, digest):
+        self.uploads[digest] = {}
+        return digest
+
+    async def put_blob_part(self, digest, upload_id, number, content):
+        self.uploads[upload_id][number] = content
+        return f"etag-{number}"
+
+    async def complete_blob_upload(self, digest, upload_id, parts):
+        assert [etag for _, etag in parts] == [f"etag-{n}" for n, _ in parts]
+        chunks = self.uploads.pop(upload_id)
+        self.blobs[digest] = b"".join(chunks[n] for n in sorted(chunks))
+
+    async def abort_blob_upload(self, digest, upload_id):
+        self.uploads.pop(upload_id, None)
+
+    async def get_manifest(self, name, reference):
+        digest = reference if reference.startswith("sha256:") else self.manifests.get(
+            (name, reference)
+        )
+        if digest is None or digest not in self.blobs:
+            return None
+        return self.blobs[digest], digest
+
+    async def put_manifest(self, name, reference, content):
+        digest = _digest(content)
+        self.blobs[digest] = content
+        if not reference.startswith("sha256:"):
+            self.manifests[(name, reference)] = digest
+        return digest
+
+    async def list_tags(self, name):
+        return sorted(tag for repo, tag in self.manifests if repo == name)
+
+
+def _push_image(storage, repository, tag, layer):
+    config = json.dumps({"architecture": "amd64"}).encode()
+    storage.blobs[_digest(config)] = config
+    storage.blobs[_digest(layer)] = layer
+    manifest = json.dumps({
+        "schemaVersion": 2,
+        "mediaType": "application/vnd.oci.image.manifest.v1+json",
+        "config": {"digest": _digest(config), "size": len(config)},
+        "layers": [{"digest": _digest(layer), "size": len(layer)}],
+    }).encode()
+    storage.blobs[_digest(manifest)] = manifest
+    storage.manifests[(repository, tag)] = _digest(manifest)
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+async def _chunks(data: bytes, size: int = 1000):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+class TestExport:
+    """Tests for exporting bundles."""
+
+    @pytest.mark.asyncio
+    async def test_bundle_is_oci_layout_with_shared_layers_once(self):
+        """Test a valid tar with index.json, each blob exactly once."""
+        storage = MemoryStorage()
+        _push_image(storage, "team/app", "v1", b"shared layer")
+        _push_image(storage, "team/app", "v2", b"shared layer")
+
+        plan = await plan_export(storage, ["team/app"])
+        bundle = await _collect(stream_layout(storage, plan))
+
+        assert len(bundle) == layout_size(plan)
+        with tarfile.open(fileobj=io.BytesIO(bundle)) as tar:
+            names = tar.getnames()
+            index = json.load(tar.extractfile("index.json"))
+        assert names.count(f"blobs/sha256/{_digest(b'shared layer')[7:]}") == 1
+        assert names[0] == "oci-layout" and names[-1] == "index.json"
+        assert sorted(
+            m["annotations"]["org.opencontainers.image.ref.name"] for m in index["manifests"]
+        ) == ["v1", "v2"]
+
+    @pytest.mark.asyncio
+    async def test_missing_blob_fails_before_streaming(self):
+        """Test an incomplete image is rejected up front."""
+        storage = MemoryStorage()
+        _push_image(storage, "team/app", "v1", b"layer")
+        del storage.blobs[_digest(b"layer")]
+
+        with pytest.raises(LayoutError):
+            await plan_export(storage, ["team/app:v1"])
+
+
+class TestImport:
+    """Tests for importing bundles."""
+
+    @pytest.mark.asyncio
+    async def test_round_trip_gzip(self, monkeypatch):
+        """Test a compressed bundle recreates tags, big blobs via parallel parts."""
+        monkeypatch.setattr(layout, "_PART_SIZE", 1024)
+        source = MemoryStorage()
+        big_layer = bytes(range(256)) * 20
+        _push_image(source, "team/app", "v1", big_layer)
+        plan = await plan_export(source, ["team/app:v1"])
+        bundle = await _collect(compress_stream(stream_layout(source, plan), "gzip"))
+        assert gzip.decompress(bundle)[:9] == b"oci-layou"
+
+        target = MemoryStorage()
+        result = await import_layout(target, _chunks(bundle))
+
+        assert [(repo, ref) for repo, ref, _ in result.images] == [("team/app", "v1")]
+        assert target.blobs[_digest(big_layer)] == big_layer
+        assert target.manifests == source.manifests
+        assert result.blobs_written == 3
+
+    @pytest.mark.asyncio
+    async def test_existing_blobs_skipped(self):
+        """Test blobs already in storage are not written again."""
+        source = MemoryStorage()
+        _push_image(source, "team/app", "v1", b"layer")
+        bundle = await _collect(stream_layout(source, await plan_export(source, ["team/app"])))
+
+        target = MemoryStorage()
+        target.blobs[_digest(b"layer")] = b"layer"
+        result = await import_layout(target, _chunks(bundle, 100))
+
+        assert result.blobs_skipped == 1
+        assert result.blobs_written == 2
+
+    @pytest.mark.asyncio
+    async def test_corrupt_blob_rejected(self, monkeypatch):
+        """Test a blob whose content does not match its name is not stored."""
+        monkeypatch.setattr(layout, "_PART_SIZE", 1024)
+        source = MemoryStorage()
+        _push_image(source, "team/app", "v1", b"x" * 5000)
+        bundle = bytearray(
+            await _collect(stream_layout(source, await plan_export(source, ["team/app"])))
+        )
+        position = bundle.index(b"x" * 5000)
+        bundle[position] = ord("y")
+
+        target = MemoryStorage()
+        with pytest.raises(LayoutError, match="Digest mismatch"):
+            await import_layout(target, _chunks(bytes(bundle)))
+        assert _digest(b"x" * 5000) not in target.blobs
+        assert target.uploads == {}
+
+
+class TestRoutes:
+    """Tests for the transfer endpoints' request and response limits."""
+
+    @pytest.fixture
+    def app(self, monkeypatch):
+        from app import create_app
+        from app.config import Config
+
+        config = Config()
+        config.auth.enabled = False
+        storage = MemoryStorage()
+        monkeypatch.setattr("app.transfer.routes.get_storage", lambda: storage)
+        _push_image(storage, "team/app", "v1", b"layer")
+        return create_app(config)
+
+    @pytest.mark.asyncio
+    async def test_import_not_bound_by_max_content_length(self, app):
+        """Test a bundle larger than MAX_CONTENT_LENGTH reaches the importer."""
+        app.config["MAX_CONTENT_LENGTH"] = 1024
+
+        response = await app.test_client().post(
+            "/api/v1/transfer/import", data=b"\0" * 4096
+        )
+
+        assert response.status_code == 400
+        assert "error" in await response.get_json()
+
+    @pytest.mark.asyncio
+    async def test_export_has_no_response_timeout(self, app):
+        """Test long exports are not cut off by RESPONSE_TIMEOUT."""
+        async with app.test_request_context("/api/v1/transfer/export?ref=team/app"):
+            response = await app.make_response(await app.dispatch_request())
+
+        assert response.status_code == 200
+        assert response.timeout is None
@@ -0,0 +1,110 @@
+"""Tests for upstream registries synced from flask-backend."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.config import Config, UpstreamRegistry, UpstreamSyncConfig
+from app.proxy.proxy import ProxyHandler
+from app.proxy.upstream_sync import UpstreamSync, upstream_from_registry
+
+
+def _registry(name, url, **fields):
+    return {"name": name, "url": url, "is_enabled": True, "auth_type": "none", **fields}
+
+
+@pytest.fixture
+def proxy():
+    """Create a proxy with two built-in upstreams."""
+    config = Config()
+    config.builtin_upstreams = [
+        UpstreamRegistry(name="dockerhub", url="https://registry-1.docker.io"),
+        UpstreamRegistry(name="ghcr", url="https://ghcr.io", auth_type="token", token="env"),
+    ]
+    return ProxyHandler(MagicMock(), config)
+
+
+@pytest.fixture
+def sync(proxy):
+    """Create an upstream sync for the proxy."""
+    return UpstreamSync(proxy, UpstreamSyncConfig(enabled=True), "http://backend")
+
+
+def test_registry_entries_mapped():
+    """Test backend entries map to upstream auth settings."""
+    basic = upstream_from_registry(
+        _registry("harbor", "harbor.example.com", auth_type="basic",
+                  auth_username="robot", auth_password="secret")
+    )
+    bearer = upstream_from_registry(
+        _registry("gitlab", "https://registry.gitlab.com", auth_type="bearer",
+                  auth_password="glpat")
+    )
+
+    assert (basic.url, basic.username, basic.password) == (
+        "https://harbor.example.com", "robot", "secret"
+    )
+    assert (bearer.auth_type, bearer.token) == ("token", "glpat")
+    assert upstream_from_registry(_registry("off", "https://x.io", is_enabled=False)) is None
+    assert upstream_from_registry(_registry("ecr", "https://x.io", auth_type="aws")) is None
+
+
+def test_unchanged_upstreams_keep_clients(proxy, sync):
+    """Test re-applying keeps clients, token caches and schedulers."""
+    sync.apply([_registry("harbor", "https://harbor.example.com")], "v1")
+    dockerhub, harbor = proxy.get_upstream("dockerhub"), proxy.get_upstream("harbor")
+    harbor._token_cache["scope"] = ("token", 0.0)
+
+    sync.apply([_registry("harbor", "https://harbor.example.com")], "v2")
+
+    assert proxy.get_upstream("dockerhub") is dockerhub
+    assert proxy.get_upstream("harbor") is harbor
+    assert harbor._token_cache
+    assert proxy.upstream_config_version == "v2"
+    assert proxy.upstream_count == 3
+
+
+def test_credentials_change_updates_client_in_place(proxy, sync):
+    """Test new credentials apply to the existing client and drop its tokens."""
+    sync.apply([_registry("harbor", "https://harbor.example.com")])
+    harbor = proxy.get_upstream("harbor")
+    harbor._token_cache["scope"] = ("token", 0.0)
+
+    added, updated, removed = proxy.apply_upstreams([
+        UpstreamRegistry("harbor", "https://harbor.example.com", "basic", "robot", "secret")
+    ])
+
+    assert (added, updated, removed) == ([], ["harbor"], [])
+    assert proxy.get_upstream("harbor") is harbor
+    assert harbor.auth.password == "secret"
+    assert not harbor._token_cache
+
+
+def test_removed_upstreams_dropped_builtins_kept(proxy, sync):
+    """Test upstreams deleted in the backend go away, built-ins stay."""
+    sync.apply([_registry("harbor", "https://harbor.example.com")])
+    ghcr = proxy.get_upstream("ghcr")
+
+    # A seeded entry without credentials does not override the built-in
+    sync.apply([_registry("ghcr", "https://ghcr.io")])
+
+    assert proxy.get_upstream("harbor") is None
+    assert proxy.get_upstream("ghcr") is ghcr
+    assert ghcr.auth.token == "env"
+
+
+@pytest.mark.asyncio
+async def test_not_modified_skips_apply(sync):
+    """Test a 304 answer to If-None-Match leaves the proxy untouched."""
+    response = MagicMock(status=304)
+    request = MagicMock()
+    request.__aenter__ = AsyncMock(return_value=response)
+    request.__aexit__ = AsyncMock(return_value=False)
+    sync._session = MagicMock(closed=False)
+    sync._session.get = MagicMock(return_value=request)
+    sync._etag = '"abc"'
+    sync.apply = MagicMock()
+
+    assert await sync.poll() is False
+    assert sync._session.get.call_args.kwargs["headers"] == {"If-None-Match": '"abc"'}
+    sync.apply.assert_not_called()